@@ -39,12 +39,11 @@ output is latex
 import glob
 import libAssemblySubset as las
 import libGeneral as lgn
+import libStatsXml as lsx
 from optparse import OptionParser
 import os
 import re
 import sys
-import xml.etree.ElementTree as ET
-import xml.parsers.expat as expat # exception handling for empty xml
 
 class Assembly:
    def __init__( self ):
@@ -127,20 +126,15 @@ def readDir( theDir, options, isScaffolds=True, assembliesDict=None ):
    """
    sFiles = glob.glob( os.path.join( theDir, '*.pathStats.xml'))
    namepat = re.compile( r'^(\S{2,3})\.pathStats\.xml' )
+   sFiles = las.subsetFiles( sFiles, namepat, options )
+   lsx.readStatsXmls( sFiles, options, tags=() )
    if assembliesDict is None:
       assembliesDict = {}
    for f in sFiles:
       name = re.match( namepat, os.path.basename( f )).group( 1 )
-      if 'subsetFile' in vars( options ):
-         if options.subsetFile:
-            if name not in options.assemblySubset:
-               continue
-      try:
-         xmlTree = ET.parse( f )
-      except expat.ExpatError: # broken xml file
+      root = lsx.readStatsXml( f, options, tags=() )
+      if root is None: # broken xml file
          continue
-      xmlTree = ET.parse( f )
-      root=xmlTree.getroot()
       if name not in assembliesDict:
          a = Assembly()
          a.ID = name
@@ -260,9 +254,11 @@ def main():
              '( --statsScaffoldsContigPathDir --statsContigsContigPathDir ) and prints to STDOUT a latex formatted table.' )
    parser = OptionParser( usage=usage )
    initOptions( parser )
+   lsx.initOptions( parser )
    las.initOptions( parser )
    options, args = parser.parse_args()
    checkOptions( args, options, parser )
+   lsx.checkOptions( options, parser )
    las.checkOptions( options, parser )
    
    assembliesList = readDirs( options )
@@ -36,9 +36,11 @@ stats xml file.
 # THE SOFTWARE.
 ##############################
 import libAssemblySubset as las
+import libBuildManifest as lbm
 import libGeneral as lgn
 from libMafGffPlot import Data
 import libPlotting as lpt
+import libStatsXml as lsx
 import matplotlib.lines as lines
 import matplotlib.patches as patches
 import matplotlib.pylab  as pylab
@@ -46,8 +48,8 @@ import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator, FormatStrFormatter, LogLocator, LogFormatter # minor tick marks
 from optparse import OptionParser
 import os
+import re
 import sys
-import xml.etree.ElementTree as ET
 
 class Bucket:
    def __init__( self ):
@@ -104,25 +106,26 @@ def readFiles( options ):
    statsList = []
    xData = []
    options.names = []
-   for f in options.files:
+   files = las.subsetFiles( options.files, re.compile( r'^([^.]*)' ), options )
+   lsx.readStatsXmls( files, options, tags=( 'bucket', ))
+   for f in files:
       name = os.path.basename( f ).split('.')[ 0 ]
-      if options.subsetFile:
-         if name not in options.assemblySubset:
-            continue
       options.names.append( name )
-      xmlTree = ET.parse( f )
-      root=xmlTree.getroot()
+      root = lsx.readStatsXml( f, options, tags=( 'bucket', ))
+      if root is None:
+         sys.stderr.write( 'unable to parse xml file %s\n' % f )
+         sys.exit( 1 )
       fileBucketList = []
       fileXData = []
       for elm in root.findall( 'bucket' ):
          b = Bucket()
-         b.start = int( elm.attrib[ 'from' ] )
-         b.end   = int( elm.attrib[ 'to' ] )
+         b.start = int( elm[ 'from' ] )
+         b.end   = int( elm[ 'to' ] )
          b.mid   = (b.end - b.start) / 2.0 + b.start
-         b.correct = int( elm.attrib[ 'correct' ] )
-         b.samples = int( elm.attrib[ 'samples' ] )
-         b.cumCorrect = int( elm.attrib[ 'cumulative_correct' ] )
-         b.cumSamples = int( elm.attrib[ 'cumulative_samples' ] )
+         b.correct = int( elm[ 'correct' ] )
+         b.samples = int( elm[ 'samples' ] )
+         b.cumCorrect = int( elm[ 'cumulative_correct' ] )
+         b.cumSamples = int( elm[ 'cumulative_samples' ] )
          fileBucketList.append( b )
          fileXData.append( b.mid )
       statsList.append( fileBucketList )
@@ -247,15 +250,16 @@ def main():
    data = Data()
    parser = OptionParser( usage=usage )
    initOptions( parser )
+   lsx.initOptions( parser )
+   lbm.initOptions( parser )
    las.initOptions( parser )
    lpt.initOptions( parser )
    options, args = parser.parse_args()
    checkOptions( args, options, parser )
+   lsx.checkOptions( options, parser )
+   lbm.checkOptions( options, parser )
    las.checkOptions( options, parser )
    lpt.checkOptions( options, parser )
-   if not options.outputRanks:
-      fig, pdf = lpt.initImage( 11., 8.0, options, data ) # 8
-      axDict = establishAxes( fig, options, data )
    
    data.statsList, data.xData = readFiles( options )
    for i in xrange( 0, len( data.statsList )):
@@ -266,7 +270,11 @@ def main():
       ranks = rankFiles( options, data )
       printRanks( ranks, options, data )
       sys.exit(0)
+   if lbm.upToDate( options ):
+      return
       
+   fig, pdf = lpt.initImage( 11., 8.0, options, data ) # 8
+   axDict = establishAxes( fig, options, data )
    drawData( axDict['main'], data.xData, data.statsList, options, data )
    drawLegend( options, data )
    drawAxisLabels( fig, options, data )
@@ -274,6 +282,7 @@ def main():
    establishTicks( axDict['main'], data.xData, options, data )
    
    lpt.writeImage( fig, pdf, options )
+   lbm.recordBuild( options )
 
 if __name__ == '__main__':
    main()
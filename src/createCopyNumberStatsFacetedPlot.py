@@ -37,9 +37,11 @@ from a single copy stats xml file.
 ##############################
 import glob
 import libAssemblySubset as las
+import libBuildManifest as lbm
 import libGeneral as lgn
 from libMafGffPlot import Data
 import libPlotting as lpt
+import libStatsXml as lsx
 import matplotlib.lines as lines
 import matplotlib.patches as patches
 import matplotlib.pylab  as pylab
@@ -47,9 +49,8 @@ from matplotlib.ticker import MultipleLocator, FormatStrFormatter, LogLocator, L
 import numpy
 from optparse import OptionParser
 import os
+import re
 import sys
-import xml.etree.ElementTree as ET
-import xml.parsers.expat as expat # exception handling for empty xml
 
 class CopyNumberStat:
    def __init__( self ):
@@ -223,37 +224,37 @@ def drawData( axDict, sList, options, data ):
 def readFiles( options ):
    ups = glob.glob( os.path.join( options.dir, '*_0.xml'))
    los = glob.glob( os.path.join( options.dir, '*_1000.xml'))
+   namepat = re.compile( r'^([^.]*)' )
+   ups = las.subsetFiles( ups, namepat, options )
+   los = las.subsetFiles( los, namepat, options )
+   lsx.readStatsXmls( ups + los, options,
+                      tags=( 'excessCopyNumberCounts', 'deficientCopyNumberCounts' ))
    stats = {}
    for u in ups:
       c = CopyNumberStat()
       c.name = os.path.basename( u ).split('.')[0]
-      if options.subsetFile:
-         if c.name not in options.assemblySubset:
-            continue
-      try:
-         xmlTree = ET.parse( u )
-      except expat.ExpatError: # empty xml file
+      root = lsx.readStatsXml( u, options,
+                                tags=( 'excessCopyNumberCounts', 'deficientCopyNumberCounts' ))
+      if root is None: # empty xml file
          continue
-      root=xmlTree.getroot()
       elm = root.find( 'excessCopyNumberCounts' )
-      c.excUpper  = float( elm.attrib['totalProportionOfColumns'] )
+      c.excUpper  = float( elm['totalProportionOfColumns'] )
       elm = root.find( 'deficientCopyNumberCounts' )
-      c.defUpper = float( elm.attrib['totalProportionOfColumns'] )
+      c.defUpper = float( elm['totalProportionOfColumns'] )
       c.sumUpper = c.excUpper + c.defUpper
       stats[ c.name ] = c
    for l in los:
       name = os.path.basename( l ).split('.')[0]
       if name not in stats:
          continue
-      try:
-         xmlTree = ET.parse( l )
-      except expat.ExpatError: # empty xml file
+      root = lsx.readStatsXml( l, options,
+                                tags=( 'excessCopyNumberCounts', 'deficientCopyNumberCounts' ))
+      if root is None: # empty xml file
          continue
-      root=xmlTree.getroot()
       elm = root.find( 'excessCopyNumberCounts' )
-      stats[name].excLower  = float( elm.attrib['totalProportionOfColumns'] )
+      stats[name].excLower  = float( elm['totalProportionOfColumns'] )
       elm = root.find( 'deficientCopyNumberCounts' )
-      stats[name].defLower = float( elm.attrib['totalProportionOfColumns'] )
+      stats[name].defLower = float( elm['totalProportionOfColumns'] )
       stats[name].sumLower = stats[name].excLower + stats[name].defLower
    validStats = {}
    for s in stats:
@@ -281,14 +282,16 @@ def main():
    data = Data()
    parser = OptionParser( usage=usage )
    initOptions( parser )
+   lsx.initOptions( parser )
+   lbm.initOptions( parser )
    las.initOptions( parser )
    lpt.initOptions( parser )
    options, args = parser.parse_args()
    checkOptions( args, options, parser )
+   lsx.checkOptions( options, parser )
+   lbm.checkOptions( options, parser )
    las.checkOptions( options, parser )
    lpt.checkOptions( options, parser )
-   if not options.outputRanks:
-      fig, pdf = lpt.initImage( 8.0, 10.0, options, data )
 
    stats = readFiles( options )
    sortedOrder = sorted( stats.values(), key=lambda x: x.sumLower, reverse=False )
@@ -296,7 +299,10 @@ def main():
    if options.outputRanks:
       rankings( sortedOrder, options, data )
       return
+   if lbm.upToDate( options ):
+      return
 
+   fig, pdf = lpt.initImage( 8.0, 10.0, options, data )
    axDict = establishAxes( fig, options, data )
    drawData( axDict, sortedOrder, options, data )
    drawLegend( options, data )
@@ -304,6 +310,7 @@ def main():
    setAxisLimits( axDict, options, data )
    
    lpt.writeImage( fig, pdf, options )
+   lbm.recordBuild( options )
 
 if __name__ == '__main__':
    main()
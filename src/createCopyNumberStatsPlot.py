@@ -42,8 +42,10 @@ The total number of columns within the column are shown at the bottom.
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 ##############################
+import libBuildManifest as lbm
 from libMafGffPlot import Data
 import libPlotting as lpt
+import libStatsXml as lsx
 import matplotlib.lines as lines
 import matplotlib.patches as patches
 import matplotlib.pylab  as pylab
@@ -52,7 +54,6 @@ from matplotlib.ticker import MultipleLocator, FormatStrFormatter, LogLocator, L
 from optparse import OptionParser
 import os
 import sys
-import xml.etree.ElementTree as ET
 
 class copyNumberCategory:
    def __init__( self ):
@@ -106,21 +107,24 @@ def establishAxes( fig, categories, options, data ):
 def readFiles( options ):
    # these lists have one item per input file
    storedCategories = {}
+   lsx.readStatsXmls( options.files, options, tags=( 'copy_number_category', ))
    for f in options.files:
-      xmlTree = ET.parse( f )
-      root=xmlTree.getroot()
+      root = lsx.readStatsXml( f, options, tags=( 'copy_number_category', ))
+      if root is None:
+         sys.stderr.write( 'unable to parse xml file %s\n' % f )
+         sys.exit( 1 )
       for elm in root.findall( 'copy_number_category' ):
-         t = ( int( elm.attrib[ 'minimumHaplotypeCopyNumber' ] ),
-               int( elm.attrib[ 'maximumHaplotypeCopyNumber' ] ))
+         t = ( int( elm[ 'minimumHaplotypeCopyNumber' ] ),
+               int( elm[ 'maximumHaplotypeCopyNumber' ] ))
          if t not in storedCategories:
             storedCategories[ t ] = copyNumberCategory()
             storedCategories[ t ].key = t
          c = storedCategories[ t ]
-         acn = int( elm.attrib[ 'assemblyCopyNumber' ] )
+         acn = int( elm[ 'assemblyCopyNumber' ] )
          if acn in c.assemblyColumnCounts:
             sys.stderr.write( 'dupilicate assemblyCopyNumber= %d found in %s' % ( acn, f ))
             sys.exit( 1 )
-         c.assemblyColumnCounts[ acn ] = int( elm.attrib[ 'columnCount' ] )
+         c.assemblyColumnCounts[ acn ] = int( elm[ 'columnCount' ] )
    return storedCategories
 
 def setAxisLimits( axDict, options, data ):
@@ -219,13 +223,19 @@ def main():
    data = Data()
    parser = OptionParser( usage=usage )
    initOptions( parser )
+   lsx.initOptions( parser )
+   lbm.initOptions( parser )
    lpt.initOptions( parser )
    options, args = parser.parse_args()
    checkOptions( args, options, parser )
+   lsx.checkOptions( options, parser )
+   lbm.checkOptions( options, parser )
    lpt.checkOptions( options, parser )
-   fig, pdf = lpt.initImage( 11.0, 3.25, options, data )
 
    storedCategories = readFiles( options )
+   if lbm.upToDate( options ):
+      return
+   fig, pdf = lpt.initImage( 11.0, 3.25, options, data )
    
    establishGlobalMinMax( storedCategories, options, data )
    axDict = establishAxes( fig, storedCategories, options, data )
@@ -236,6 +246,7 @@ def main():
    setAxisLimits( axDict, options, data )
    
    lpt.writeImage( fig, pdf, options )
+   lbm.recordBuild( options )
 
 if __name__ == '__main__':
    main()
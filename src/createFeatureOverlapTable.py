@@ -39,12 +39,11 @@ output is tab delimited
 import glob
 import libAssemblySubset as las
 import libGeneral as lgn
+import libStatsXml as lsx
 from optparse import OptionParser
 import os
 import re
 import sys
-import xml.etree.ElementTree as ET
-import xml.parsers.expat as expat # exception handling for empty xml
 
 class Assembly:
    """ used to store information for a particular assembly.
@@ -106,14 +105,12 @@ def processDirectory( options ):
    filenames = glob.glob(os.path.join(options.statsScaffoldsFeatureOverlapDir, '*.xml'))
    nameRegex = r'^(\w\d+)\.(.+)\.xml$'
    assemblyPat = re.compile( nameRegex )
+   filenames = las.subsetFiles( filenames, assemblyPat, options )
+   lsx.readStatsXmls( filenames, options, tags=( 'intervals', ))
    assemblyDict = {}
    for f in filenames:
       m = re.match(assemblyPat, os.path.basename( f ))
       assemblyName = m.group(1)
-      if 'subsetFile' in vars( options ):
-         if options.subsetFile:
-            if assemblyName not in options.assemblySubset:
-               continue
       filetype = m.group(2)
       # if m.group(2) != 'contigsOverlapGene':
       #    continue
@@ -123,21 +120,18 @@ def processDirectory( options ):
          a = Assembly()
          a.id = assemblyName
          assemblyDict[ a.id ] = a
-      addData( assemblyDict[ assemblyName ], filetype, f )
+      addData( assemblyDict[ assemblyName ], filetype, f, options )
    return assemblyDict
 
-def addData( assembly, filetype, filename ):
+def addData( assembly, filetype, filename, options ):
    if filetype not in assembly.valuesDict:
       assembly.valuesDict[ filetype ] = {}
-   try:
-      xmlTree = ET.parse( filename )
-   except expat.ExpatError: # broken xml file
+   root = lsx.readStatsXml( filename, options, tags=( 'intervals', ))
+   if root is None: # broken xml file
       return
-   xmlTree = ET.parse( filename )
-   root = xmlTree.getroot()
    for elm in root.findall( 'intervals' ):
-      annot = os.path.basename( elm.attrib['featureFile'] ).split('.')[1].lower()
-      haplotype = int(os.path.split( os.path.dirname (elm.attrib['featureFile']))[1][-1])
+      annot = os.path.basename( elm['featureFile'] ).split('.')[1].lower()
+      haplotype = int(os.path.split( os.path.dirname (elm['featureFile']))[1][-1])
       if annot == 'nxe' or annot == 'nge':
          annot = 'nxe+nge'
          if annot in assembly.valuesDict[ filetype ]:
@@ -149,15 +143,15 @@ def addData( assembly, filetype, filename ):
             it = IntervalsTag()
       else:
          it = IntervalsTag()
-      it.file = elm.attrib['featureFile']
+      it.file = elm['featureFile']
       it.annot = annot
       it.haplotype = haplotype
-      it.complete += int( elm.attrib['complete'] )
-      it.samples += int( elm.attrib['samples'] )
-      if 'baseLength' not in elm.attrib:
+      it.complete += int( elm['complete'] )
+      it.samples += int( elm['samples'] )
+      if 'baseLength' not in elm:
          raise RuntimeError('file %s %s lacks attrib baseLength' % (filename, it.file))
-      it.baseLength += int( elm.attrib['baseLength'])
-      it.totalComplete += int( elm.attrib['totalComplete'])
+      it.baseLength += int( elm['baseLength'])
+      it.totalComplete += int( elm['totalComplete'])
       
       if it.annot not in assembly.valuesDict[ filetype ]:
          assembly.valuesDict[ filetype ][ it.annot ] = { it.haplotype : it }
@@ -261,9 +255,11 @@ def main():
    usage = ('usage: %prog')
    parser = OptionParser( usage = usage )
    initOptions( parser )
+   lsx.initOptions( parser )
    las.initOptions( parser )
    options, args = parser.parse_args()
    checkOptions( args, options, parser )
+   lsx.checkOptions( options, parser )
    las.checkOptions( options, parser )
    
    assembliesDict = processDirectory(options)
@@ -41,11 +41,10 @@ generally, this script is pretty cool.
 # THE SOFTWARE.
 ##############################
 import libGeneral as lgn
+import libStatsXml as lsx
 from optparse import OptionParser
 import os
 import sys
-import xml.etree.ElementTree as ET
-import xml.parsers.expat as expat # exception handling for empty xml
 
 class Team:
    """ Team objects are generated from lines in the infoFile
@@ -455,22 +454,16 @@ def readSubStatsDir( assembliesList, options ):
    for a in assembliesList:
       # lower
       if os.path.exists( os.path.join( options.subStatsDir, a.ID+'.subStats.lower.xml')):
-         try:
-            xmlTree = ET.parse( os.path.join( options.subStatsDir, a.ID+'.subStats.lower.xml') )
-         except expat.ExpatError: # broken xml file
+         root = lsx.readStatsXml( os.path.join( options.subStatsDir, a.ID+'.subStats.lower.xml'), options, tags=() )
+         if root is None: # broken xml file
             continue
-         xmlTree = ET.parse( os.path.join( options.subStatsDir, a.ID+'.subStats.lower.xml') )
-         root=xmlTree.getroot()
          for elm in root.attrib.keys():
             a.subStatsLower[ elm ] = int(float( root.attrib[ elm ]))
       # upper
       if os.path.exists( os.path.join( options.subStatsDir, a.ID+'.subStats.upper.xml')):
-         try:
-            xmlTree = ET.parse( os.path.join( options.subStatsDir, a.ID+'.subStats.upper.xml') )
-         except expat.ExpatError: # broken xml file
+         root = lsx.readStatsXml( os.path.join( options.subStatsDir, a.ID+'.subStats.upper.xml'), options, tags=() )
+         if root is None: # broken xml file
             continue
-         xmlTree = ET.parse( os.path.join( options.subStatsDir, a.ID+'.subStats.upper.xml') )
-         root=xmlTree.getroot()
          for elm in root.attrib.keys():
             a.subStatsUpper[ elm ] = int(float( root.attrib[ elm ]))
 
@@ -520,8 +513,10 @@ def main():
              'to STDOUT a latex formated section of text.')
    parser = OptionParser( usage=usage )
    initOptions( parser )
+   lsx.initOptions( parser )
    options, args = parser.parse_args()
    checkOptions( args, options, parser )
+   lsx.checkOptions( options, parser )
 
    teamsDict = readInfoFile( options )
    assembliesList = readRankFile( teamsDict, options )
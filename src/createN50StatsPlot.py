@@ -37,8 +37,10 @@ create the N50 stats plots.
 from createContigPathStatsTable import readDirs
 import createSortedCoveragesPlot as cscp
 import libAssemblySubset as las
+import libBuildManifest as lbm
 import libGeneral as lgn
 import libPlotting as lpt
+import libStatsXml as lsx
 import matplotlib.lines as lines
 import matplotlib.patches as patches
 import matplotlib.pylab  as pylab
@@ -48,7 +50,6 @@ import numpy
 from optparse import OptionParser
 import os
 import sys
-import xml.etree.ElementTree as ET
 
 class Data:
    """Dummy class to hold data to 
@@ -285,10 +286,14 @@ def main():
    cscp.initOptions( parser )
    las.initOptions( parser )
    lpt.initOptions( parser )
+   lsx.initOptions( parser )
+   lbm.initOptions( parser )
    options, args = parser.parse_args()
    cscp.checkOptions( options, parser )
    las.checkOptions( options, parser )
    lpt.checkOptions( options, parser )
+   lsx.checkOptions( options, parser )
+   lbm.checkOptions( options, parser )
    checkOptions( options, parser )
    
    assembliesList = readDirs( options )
@@ -299,6 +304,8 @@ def main():
    if options.outputRanks:
       rankings( assembliesList, options )
       return
+   if lbm.upToDate( options ):
+      return
 
    fig, pdf = lpt.initImage( 10.0, 8.0, options, data )
    axDict = establishAxis( fig, options, data )
@@ -306,6 +313,7 @@ def main():
    drawData( assembliesList, maxesMax, minsMin, axDict, options )
    
    lpt.writeImage( fig, pdf, options )
+   lbm.recordBuild( options )
 
 if __name__ == '__main__':
    main()
@@ -39,8 +39,10 @@ from createN50StatsPlot import getVals, getIDs
 import createSortedCoveragesPlot as cscp
 import glob
 import libAssemblySubset as las
+import libBuildManifest as lbm
 import libGeneral as lgn
 import libPlotting as lpt
+import libStatsXml as lsx
 import matplotlib.lines as lines
 import matplotlib.patches as patches
 import matplotlib.pylab  as pylab
@@ -51,7 +53,6 @@ from optparse import OptionParser
 import os
 import re
 import sys
-import xml.etree.ElementTree as ET
 
 class Data:
    """Dummy class to hold data to 
@@ -144,19 +145,14 @@ def readPhasingDir( hapNum, options ):
    files = glob.glob( os.path.join( options.statsScaffoldsContigPathPhasingDir, 
                                      '*.hap%d.pathStats.xml' % hapNum))
    namepat = re.compile( r'^(\S{2,3})\.hap\d\.pathStats\.xml' )
+   files = las.subsetFiles( files, namepat, options )
+   lsx.readStatsXmls( files, options, tags=() )
    assembliesDict = {}
    for f in files:
       name = re.match( namepat, os.path.basename( f )).group( 1 )
-      if 'subsetFile' in vars( options ):
-         if options.subsetFile:
-            if name not in options.assemblySubset:
-               continue
-      try:
-         xmlTree = ET.parse( f )
-      except expat.ExpatError: # broken xml file
+      root = lsx.readStatsXml( f, options, tags=() )
+      if root is None: # broken xml file
          continue
-      xmlTree = ET.parse( f )
-      root=xmlTree.getroot()
       if name not in assembliesDict:
          a = Assembly()
          a.ID = name
@@ -303,6 +299,8 @@ def main():
    data = Data()
    parser = OptionParser( usage=usage )
    initOptions( parser )
+   lsx.initOptions( parser )
+   lbm.initOptions( parser )
    cscp.initOptions( parser )
    las.initOptions( parser )
    lpt.initOptions( parser )
@@ -311,6 +309,8 @@ def main():
    las.checkOptions( options, parser )
    lpt.checkOptions( options, parser )
    checkOptions( options, parser )
+   lsx.checkOptions( options, parser )
+   lbm.checkOptions( options, parser )
    
    assembliesList = readData( options )
    assembliesList = sorted( assembliesList, key=lambda x: x.valuesDict[ options.sortOn ], 
@@ -320,6 +320,8 @@ def main():
    if options.outputRanks:
       rankings( assembliesList, options )
       return
+   if lbm.upToDate( options ):
+      return
 
    fig, pdf = lpt.initImage( 10.0, 8.0, options, data )
    axDict = establishAxis( fig, options, data )
@@ -327,6 +329,7 @@ def main():
    drawData( assembliesList, maxesMax, minsMin, axDict, options )
    
    lpt.writeImage( fig, pdf, options )
+   lbm.recordBuild( options )
 
 if __name__ == '__main__':
    main()
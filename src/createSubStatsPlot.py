@@ -35,8 +35,10 @@ dent earl, dearl(a) soe ucsc edu
 ##############################
 import glob
 import libAssemblySubset as las
+import libBuildManifest as lbm
 import libGeneral as lgn
 import libPlotting as lpt
+import libStatsXml as lsx
 import matplotlib.backends.backend_pdf as pltBack
 import matplotlib.lines as lines
 import matplotlib.patches as patches
@@ -49,8 +51,6 @@ import os
 import signal # deal with broken pipes
 import sys
 import re
-import xml.etree.ElementTree as ET
-import xml.parsers.expat as expat # exception handling for empty xml
 
 signal.signal( signal.SIGPIPE, signal.SIG_DFL ) # broken pipes
 
@@ -96,21 +96,18 @@ def readSubStatsDir( assembliesDict, options ):
    upperStatsFiles = glob.glob( os.path.join( options.subStatsDir, '*.subStats.upper.xml') )
    namereg = '^([A-Z0-9]{2,3})\.subStats.*'
    namepat = re.compile( namereg )
+   lowerStatsFiles = las.subsetFiles( lowerStatsFiles, namepat, options )
+   upperStatsFiles = las.subsetFiles( upperStatsFiles, namepat, options )
+   lsx.readStatsXmls( lowerStatsFiles + upperStatsFiles, options, tags=() )
    for l in lowerStatsFiles:
       m = re.match( namepat, os.path.basename( l ))
       if not m:
          sys.stderr.write('unable to match regex "%s" against filename "%s"' % ( namereg, l ))
          sys.exit( 1 )
       ID = m.group( 1 )
-      if options.subsetFile:
-         if ID not in options.assemblySubset:
-            continue
-      try:
-         xmlTree = ET.parse( l )
-      except expat.ExpatError: # broken xml file
+      root = lsx.readStatsXml( l, options, tags=() )
+      if root is None: # broken xml file
          continue
-      xmlTree = ET.parse( l )
-      root=xmlTree.getroot()
       assembliesDict[ ID ] = Assembly()
       assembliesDict[ ID ].ID = ID
       for elm in root.attrib.keys():
@@ -121,18 +118,12 @@ def readSubStatsDir( assembliesDict, options ):
          sys.stderr.write('unable to match regex "%s" against filename "%s"' % ( namepat, u ))
          sys.exit( 1 )
       ID = m.group( 1 )
-      if options.subsetFile:
-         if ID not in options.assemblySubset:
-            continue
       if ID not in assembliesDict:
          sys.stderr.write('unable to locate key %s in assembliesDict.\n')
          sys.exit( 1 )
-      try:
-         xmlTree = ET.parse( u )
-      except expat.ExpatError: # broken xml file
+      root = lsx.readStatsXml( u, options, tags=() )
+      if root is None: # broken xml file
          continue
-      xmlTree = ET.parse( u )
-      root=xmlTree.getroot()
       for elm in root.attrib.keys():
          assembliesDict[ ID ].subStatsUpper[ elm ] = int(float( root.attrib[ elm ]))
    return assembliesDict
@@ -351,17 +342,17 @@ def main():
    data = Data()
    parser = OptionParser( usage=usage )
    initOptions( parser )
+   lsx.initOptions( parser )
+   lbm.initOptions( parser )
    las.initOptions( parser )
    lpt.initOptions( parser )
    options, args = parser.parse_args()
    checkOptions( options, parser )
+   lsx.checkOptions( options, parser )
+   lbm.checkOptions( options, parser )
    las.checkOptions( options, parser )
    lpt.checkOptions( options, parser )
    
-   if not options.outputRanks:
-      fig, pdf = lpt.initImage( 9., 11., options, data )
-      axDict = establishAxes( fig, options, data )
-   
    assembliesDict = {}
    assembliesDict = readSubStatsDir( assembliesDict, options )
    
@@ -373,10 +364,15 @@ def main():
    if options.outputRanks:
       rankings( assembliesDict, sortOrder, options, data )
       return
+   if lbm.upToDate( options ):
+      return
 
+   fig, pdf = lpt.initImage( 9., 11., options, data )
+   axDict = establishAxes( fig, options, data )
    drawData( assembliesDict, sortOrder, axDict, options, data )
    
    lpt.writeImage( fig, pdf, options )
+   lbm.recordBuild( options )
    
 
 if __name__ == '__main__':
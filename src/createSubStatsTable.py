@@ -29,12 +29,11 @@
 ##############################
 import glob
 import libGeneral as lgn
+import libStatsXml as lsx
 from optparse import OptionParser
 import os
 import re
 import sys
-import xml.etree.ElementTree as ET
-import xml.parsers.expat as expat # exception handling for empty xml
 
 class Assembly:
    """ Assembly objects are generated from lines 
@@ -74,6 +73,7 @@ def checkOptions( args, options, parser ):
 def readSubStatsDir( assembliesDict, options ):
    lowerStatsFiles = glob.glob( os.path.join( options.subStatsDir, '*.subStats.lower.xml') )
    upperStatsFiles = glob.glob( os.path.join( options.subStatsDir, '*.subStats.upper.xml') )
+   lsx.readStatsXmls( lowerStatsFiles + upperStatsFiles, options, tags=() )
    
    namereg = '^([A-Z0-9]{2,3})\.subStats.*'
    namepat = re.compile( namereg  )
@@ -85,12 +85,9 @@ def readSubStatsDir( assembliesDict, options ):
       ID = m.group( 1 )
       assembliesDict[ ID ] = Assembly()
       assembliesDict[ ID ].ID = ID
-      try:
-         xmlTree = ET.parse( l )
-      except expat.ExpatError: # broken xml file
+      root = lsx.readStatsXml( l, options, tags=() )
+      if root is None: # broken xml file
          continue
-      xmlTree = ET.parse( l )
-      root=xmlTree.getroot()
       assembliesDict[ ID ] = Assembly()
       assembliesDict[ ID ].ID = ID
       for elm in root.attrib.keys():
@@ -104,12 +101,9 @@ def readSubStatsDir( assembliesDict, options ):
       if ID not in assembliesDict:
          sys.stderr.write('unable to locate key %s in assembliesDict.\n')
          sys.exit( 1 )
-      try:
-         xmlTree = ET.parse( u )
-      except expat.ExpatError: # broken xml file
+      root = lsx.readStatsXml( u, options, tags=() )
+      if root is None: # broken xml file
          continue
-      xmlTree = ET.parse( u )
-      root=xmlTree.getroot()
       for elm in root.attrib.keys():
          assembliesDict[ ID ].subStatsUpper[ elm ] = int(float( root.attrib[ elm ]))
    return assembliesDict
@@ -181,8 +175,10 @@ def main():
              'names as NAME.subStats.[upper|lower].xml and writes to STDOUT a latex formated table.')
    parser = OptionParser( usage=usage )
    initOptions( parser )
+   lsx.initOptions( parser )
    options, args = parser.parse_args()
    checkOptions( args, options, parser )
+   lsx.checkOptions( options, parser )
    
    assembliesDict = {}
    assembliesDict = readSubStatsDir( assembliesDict, options )
@@ -39,6 +39,7 @@ Input and output are via stdin/stdout.
 # THE SOFTWARE.
 ##############################
 import cPickle
+import libFasta as lfa
 import os
 from optparse import OptionParser
 import signal # deal with broken pipes
@@ -80,49 +81,67 @@ def checkOptions( parser, options ):
     if  not options.goForward and not options.goBackward:
         parser.error('You must specify the direction to map with either --goForward or --goBackward.')
 
-def createMap( options ):
+def buildMap( events, options ):
+    """ returns the map from every header in the ( header, chunk ) pairs
+    of events, see libFasta, to a new short header.
+    """
     faMap = {}
     num = 1
     if options.prefix is not None:
         prefix = '%s.' % options.prefix
     else:
         prefix = ''
-    for line in sys.stdin:
-        line=line.strip()
-        if line == '':
+    for header, chunk in events:
+        if chunk is not None:
             continue
-        if line.startswith('>'):
-            if line in faMap:
-                sys.stderr.write( 'duplicate header found: %s.\n' % line )
-                sys.exit( 1 )
-            faMap[ line ] = '>%s%s%06d' % ( prefix, options.label, num )
-            num += 1
-            
+        if header in faMap:
+            sys.stderr.write( 'duplicate header found: %s.\n' % header )
+            sys.exit( 1 )
+        faMap[ header ] = '>%s%s%06d' % ( prefix, options.label, num )
+        num += 1
+    return faMap
+
+def writeMap( faMap, options ):
     FILE = open( options.createMap, 'w' )
     cPickle.dump( faMap, FILE, 0) # 0=ASCII, 1=old binary, 2=python 2.3 binary
     FILE.close()
 
+def createMap( options ):
+    writeMap( buildMap( lfa.readRecords( lfa.openFasta() ), options ), options )
+
 def readMap( options ):
     FILE = open( options.map )
     data = cPickle.load( FILE )
     FILE.close()
     return data
 
-def translate( faMap, options ):
-    for line in sys.stdin:
-        line=line.strip()
-        if line == '':
-            print line
-            continue
-        if line.startswith('>'):
-            if line in faMap:
-                print faMap[ line ]
-            else:
+def loadMap( options ):
+    """ the map read from --map, turned around for --goBackward.
+    """
+    faMap = readMap( options )
+    if options.goBackward:
+        faMap = dict( (v,k) for k, v in faMap.iteritems() )
+    return faMap
+
+def translateRecords( events, faMap, options ):
+    """ yields the ( header, chunk ) pairs of events, see libFasta, with
+    every header replaced by its entry in faMap.
+    """
+    header = None
+    for h, chunk in events:
+        if chunk is None:
+            if h not in faMap:
                 sys.stderr.write( 'unable to find header "%s" in map file "%s"\n' % 
-                                  ( line, options.map) )
+                                  ( h, options.map) )
                 sys.exit( 1 )
+            header = faMap[ h ]
+            yield ( header, None )
         else:
-            print line
+            yield ( header, chunk )
+
+def translate( faMap, options ):
+    lfa.writeLines( translateRecords( lfa.lineEvents( lfa.readLines( lfa.openFasta() )), 
+                                      faMap, options ))
 
 def main():
     usage = ( 'usage: %prog [options]\n\n'
@@ -135,10 +154,7 @@ def main():
     if options.createMap:
         createMap( options )
         return
-    faMap = readMap( options )
-    if options.goBackward:
-        faMap = dict( (v,k) for k, v in faMap.iteritems() )
-    translate( faMap, options )
+    translate( loadMap( options ), options )
 
 if __name__ == '__main__':
    main()
@@ -29,6 +29,7 @@ per line.
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 ##############################
+import libFasta as lfa
 import sys
 import os
 from optparse import OptionParser
@@ -64,16 +65,13 @@ def main():
     curLen = 0
     if options.names:
         print 'Name, [ length ]'
-    for line in sys.stdin:
-        line = line.strip()
-        if line == '':
-            continue
-        if line[0] == '>':
+    for header, chunk in lfa.readRecords( lfa.openFasta() ):
+        if chunk is None:
             reportSeq( curSeq, curLen, options )
             curLen = 0
-            curSeq = line
+            curSeq = header
         else:
-            curLen += len( line )
+            curLen += len( chunk )
     reportSeq( curSeq, curLen, options )
 
 
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+fastaPipeline.py
+
+Runs any of removeEmptyContigs.py, standardizeNumNs.py,
+splitSequenceAtNs.py and fastaHeaderMapper.py as stages of
+one pipeline, in the order they are given on the command
+line. The fasta is read once, handed from stage to stage
+and written once. The output is the same as piping the
+fasta through the tools one after another, e.g.
+
+fastaPipeline.py --removeEmptyContigs \
+   --standardizeNumNs '--expandAt=10' \
+   --splitSequenceAtNs '--splitAt=25 --label=split' < in.fa > out.fa
+
+is the same as
+
+removeEmptyContigs.py < in.fa | standardizeNumNs.py --expandAt=10 | \
+   splitSequenceAtNs.py --splitAt=25 --label=split > out.fa
+
+Each stage takes the same options as its tool, given as
+one quoted string.
+
+Input and output are via stdin/stdout.
+
+"""
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+import fastaHeaderMapper as fhm
+import libFasta as lfa
+from optparse import OptionParser
+import removeEmptyContigs as rec
+import shlex
+import signal # deal with broken pipes
+import splitSequenceAtNs as ssan
+import standardizeNumNs as snn
+
+signal.signal( signal.SIGPIPE, signal.SIG_DFL ) # broken pipes
+
+def addStage( option, opt, value, parser ):
+   """ optparse callback, records the stage and the options string it
+   was given, if any, in the order they appear on the command line.
+   """
+   parser.values.stages.append(( option.dest, value ))
+
+def initOptions( parser ):
+   parser.add_option( '--removeEmptyContigs', dest='removeEmptyContigs',
+                      action='callback', callback=addStage,
+                      help='Add a removeEmptyContigs.py stage.' )
+   parser.add_option( '--standardizeNumNs', dest='standardizeNumNs',
+                      action='callback', callback=addStage, type='string',
+                      help=('Add a standardizeNumNs.py stage, with its options given as one '
+                            'quoted string, e.g. --standardizeNumNs \'--expandAt=10\'.' ))
+   parser.add_option( '--splitSequenceAtNs', dest='splitSequenceAtNs',
+                      action='callback', callback=addStage, type='string',
+                      help=('Add a splitSequenceAtNs.py stage, with its options given as one '
+                            'quoted string, e.g. --splitSequenceAtNs \'--splitAt=25\'.' ))
+   parser.add_option( '--fastaHeaderMapper', dest='fastaHeaderMapper',
+                      action='callback', callback=addStage, type='string',
+                      help=('Add a fastaHeaderMapper.py stage, with its options given as one '
+                            'quoted string, e.g. --fastaHeaderMapper \'--map=m.pickle --goForward\'. '
+                            'A --createMap stage writes no fasta and must be the last stage.' ))
+   parser.set_defaults( stages=[] )
+
+def stageOptions( name, value, parser ):
+   """ parses the options string, value, of stage name with the option
+   parser of the stage's own tool. Returns the parsed options, or None
+   for removeEmptyContigs, which has none.
+   """
+   if name == 'removeEmptyContigs':
+      return None
+   stageParser = OptionParser( prog='%s --%s' % ( parser.get_prog_name(), name ))
+   if name == 'standardizeNumNs':
+      snn.initOptions( stageParser )
+   elif name == 'splitSequenceAtNs':
+      ssan.initOptions( stageParser )
+   elif name == 'fastaHeaderMapper':
+      fhm.initOptions( stageParser )
+   options, args = stageParser.parse_args( shlex.split( value ))
+   if len( args ) > 0:
+      parser.error( 'unrecognized options for --%s: %s' % ( name, ' '.join( args )))
+   if name == 'standardizeNumNs':
+      snn.checkOptions( options, stageParser )
+   elif name == 'splitSequenceAtNs':
+      ssan.checkOptions( options, stageParser )
+   elif name == 'fastaHeaderMapper':
+      fhm.checkOptions( stageParser, options )
+   if getattr( options, 'jobs', 1 ) > 1:
+      stageParser.error( '--jobs is not available within %s.' % parser.get_prog_name() )
+   return options
+
+def checkOptions( options, args, parser ):
+   if len( args ) > 0:
+      parser.error( 'unrecognized arguments: %s' % ' '.join( args ))
+   if len( options.stages ) == 0:
+      parser.error( 'specify at least one stage.' )
+   options.stages = [ ( name, stageOptions( name, value, parser ))
+                      for name, value in options.stages ]
+   for name, stageOpts in options.stages[ :-1 ]:
+      if name == 'fastaHeaderMapper' and stageOpts.createMap is not None:
+         parser.error( 'a --fastaHeaderMapper stage with --createMap must be the last stage.' )
+
+def runPipeline( options ):
+   """ chains the stages in options.stages on the ( header, chunk ) pairs
+   of the fasta on stdin, see libFasta, and writes the result to stdout.
+   The sequence is wrapped, as it is by the tools, when a stage of 
+   standardizeNumNs or splitSequenceAtNs has been run, otherwise lines
+   are written as they were read. Stages before the first of those are
+   handed the fasta a line at a time, so that blank lines are seen.
+   """
+   wrapping = [ stageOpts for name, stageOpts in options.stages
+                if name in ( 'standardizeNumNs', 'splitSequenceAtNs' ) ]
+   lines = options.stages[ 0 ][ 0 ] not in ( 'standardizeNumNs', 'splitSequenceAtNs' )
+   if lines:
+      events = lfa.lineEvents( lfa.readLines( lfa.openFasta() ))
+   else:
+      events = lfa.readRecords( lfa.openFasta() )
+   for name, stageOpts in options.stages:
+      if lines and name in ( 'standardizeNumNs', 'splitSequenceAtNs' ):
+         # blank lines only matter to removeEmptyContigs and the mapper,
+         # the sequence is now read a block at a time.
+         events = lfa.joinChunks( events )
+         lines = False
+      if name == 'removeEmptyContigs':
+         events = rec.keepNonEmpty( events )
+      elif name == 'standardizeNumNs':
+         events = snn.standardizeRecords( events, stageOpts )
+      elif name == 'splitSequenceAtNs':
+         events = ssan.splitRecords( events, stageOpts )
+      elif stageOpts.createMap is not None:
+         fhm.writeMap( fhm.buildMap( events, stageOpts ), stageOpts )
+         return
+      else:
+         events = fhm.translateRecords( events, fhm.loadMap( stageOpts ), stageOpts )
+   if len( wrapping ) > 0:
+      snn.writeWrapped( events, wrapping[ -1 ] )
+   else:
+      lfa.writeLines( events )
+
+def main():
+   usage = ( 'usage: %prog --STAGE [\'STAGE OPTIONS\'] ... < fasta.fa\n\n'
+             '%prog runs removeEmptyContigs.py, standardizeNumNs.py, splitSequenceAtNs.py\n'
+             'and fastaHeaderMapper.py as stages of one pipeline, in the order they are\n'
+             'given, reading the fasta in STDIN once and writing to STDOUT once. Each\n'
+             'stage takes the options of its tool as one quoted string.' )
+   parser = OptionParser( usage=usage )
+   initOptions( parser )
+   options, args = parser.parse_args()
+   checkOptions( options, args, parser )
+   runPipeline( options )
+
+if __name__ == '__main__':
+   main()
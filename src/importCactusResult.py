@@ -65,6 +65,10 @@ def initOptions( parser ):
                      help=('Type of the alignment, either scaffold or contig.'))
    parser.add_option('--name', dest='name', default='R1',
                      help=('Sets the name of the input assembly. default=%default'))
+   parser.add_option('--statsDb', dest='statsDb',
+                     type='string',
+                     help=('sqlite database into which the numeric attributes and distributions '
+                           'of the stats xml files are also imported. Created if it does not exist.'))
 
 
 def checkOptions( options, parser ):
@@ -116,7 +120,8 @@ def populateDirectoryStructure( options ):
    for d in [ 'mafsContigs', 'mafsScaffolds', 'statsScaffoldsAggregateColumns', 
               'statsScaffoldsContigPath', 'statsScaffoldsCopyNumber',
               'statsScaffoldsContiguity', 'statsScaffoldsSubstitutions',
-              'statsContigsContigPath', 'statsScaffoldsContigPathPhasing' ]:
+              'statsContigsContigPath', 'statsScaffoldsContigPathPhasing',
+              'statsScaffoldsFeatureOverlap', 'statsContigsFeatureOverlap' ]:
       d = os.path.join( options.outDir, d )
       if os.path.exists( d ) and not os.path.isdir( d ):
          sys.stderr.write('%s exists but is not a directory!\n' % d )
@@ -138,11 +143,10 @@ def migrate( options ):
                    os.path.join( options.inDir, 'coveragePlots', 'blockLengthsVsCoverageOfAssemblyAndHaplotypes.txt'): os.path.join( options.outDir, 'statsScaffoldsAggregateColumns', '%s.blocks_haplotypes_agg.txt' % options.name ),
                    os.path.join( options.inDir, 'coveragePlots', 'contigPathLengthsVsCoverageOfAssemblyAndHaplotypes.txt'): os.path.join( options.outDir, 'statsScaffoldsAggregateColumns', '%s.contig_path_haplotypes_agg.txt' % options.name ),
                    os.path.join( options.inDir, 'coveragePlots', 'contigLengthsVsCoverageOfAssemblyAndHaplotypes.txt'): os.path.join( options.outDir, 'statsScaffoldsAggregateColumns', '%s.contigs_haplotypes_agg.txt' % options.name ),
-                   os.path.join( options.inDir, 'coveragePlots', 'blockLengthsVsCoverageOfAssemblyAndHaplotypes.txt'): os.path.join( options.outDir, 'statsScaffoldsAggregateColumns', '%s.blocks_haplotypes_agg.txt' % options.name )
-                   os.path.join( options.inDir, 'scaffoldPathsFeatureGeneOverlap.xml': os.path.join( options.outDir, 'statsScaffoldsFeatureOverlap', '%s.scaffoldsOverlapGene.xml' % options.name ))
-                   os.path.join( options.inDir, 'scaffoldPathsFeatureOverlap.xml': os.path.join( options.outDir, 'statsScaffoldsFeatureOverlap', '%s.scaffoldsOverlap.xml' % options.name ))
-                   os.path.join( options.inDir, 'contigPathsFeatureGeneOverlap.xml': os.path.join( options.outDir, 'statsContigsFeatureOverlap', '%s.contigsOverlapGene.xml' % options.name ))
-                   os.path.join( options.inDir, 'contigPathsFeatureOverlap.xml': os.path.join( options.outDir, 'statsContigsFeatureOverlap', '%s.contigsOverlap.xml' % options.name ))
+                   os.path.join( options.inDir, 'scaffoldPathsFeatureGeneOverlap.xml'): os.path.join( options.outDir, 'statsScaffoldsFeatureOverlap', '%s.scaffoldsOverlapGene.xml' % options.name ),
+                   os.path.join( options.inDir, 'scaffoldPathsFeatureOverlap.xml'): os.path.join( options.outDir, 'statsScaffoldsFeatureOverlap', '%s.scaffoldsOverlap.xml' % options.name ),
+                   os.path.join( options.inDir, 'contigPathsFeatureGeneOverlap.xml'): os.path.join( options.outDir, 'statsContigsFeatureOverlap', '%s.contigsOverlapGene.xml' % options.name ),
+                   os.path.join( options.inDir, 'contigPathsFeatureOverlap.xml'): os.path.join( options.outDir, 'statsContigsFeatureOverlap', '%s.contigsOverlap.xml' % options.name )
          }
    elif options.type == 'contig':
       template = { os.path.join( options.inDir, 'annotatedPaths.maf' ): os.path.join( options.outDir, 'mafsContigs', options.name+'.maf' ),
@@ -150,6 +154,26 @@ def migrate( options ):
 
    for src in template:
       shutil.copy( src, template[src] )
+   return template.values()
+
+def importStats( files, options ):
+   """ importStats loads each migrated stats xml into the --statsDb database.
+   The source of a file is its name less the assembly name and .xml,
+   e.g. copyNumber_0 or hap1.pathStats.
+   """
+   import libStatsDb as lsd
+   db = lsd.openStatsDb( options.statsDb )
+   for f in sorted( files ):
+      if not f.endswith( '.xml' ):
+         continue
+      source = os.path.basename( f )[ len( options.name ) + 1 : -len( '.xml' ) ]
+      haplotype = 0
+      m = re.match( lsd.hapPat, source )
+      if m is not None:
+         haplotype = int( m.group( 1 ))
+      if not lsd.importStatsXml( db, f, options.name, options.type, source, haplotype ):
+         sys.stderr.write( 'Warning, unable to parse %s, no stats imported for it.\n' % f )
+   db.close()
 
 def main():
    usage = ( 'usage: %prog --inDir=path/to/input --outDir=path/to/out --type=[contig|scaffold] [options]\n\n'
@@ -157,7 +181,8 @@ def main():
              'and a directory where you are staging the data for analysis ( --outDir )\n'
              'the type of alignment ( --type ), either contig or scaffold, and then migrates the\n'
              'relevant files into the outDir. Use the --name flag to specify the name\n'
-             '(e.g. --name R1) of the assembly in the analysis.' )
+             '(e.g. --name R1) of the assembly in the analysis. With --statsDb the\n'
+             'stats xml files are also imported into a sqlite database.' )
    parser = OptionParser( usage=usage )
    initOptions( parser )
    options, args = parser.parse_args()
@@ -166,7 +191,9 @@ def main():
    populateDirectoryStructure( options )
    verifyNameIsUnique( options )
 
-   migrate( options )
+   files = migrate( options )
+   if options.statsDb is not None:
+      importStats( files, options )
 
 
 if __name__ == '__main__':
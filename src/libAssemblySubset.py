@@ -16,6 +16,10 @@
 #          continue
 #   ...
 #
+# Scripts that read one file per assembly can instead drop the files of
+# the other assemblies up front with subsetFiles(), before anything is
+# read or prefetched.
+#
 ##############################
 # Copyright (C) 2009-2011 by 
 # Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
@@ -63,3 +67,20 @@ def checkOptions( options, parser ):
       d = line.split()
       assembly = d[0]
       options.assemblySubset.add( assembly )
+
+def subsetFiles( files, namepat, options ):
+   """ returns the files whose assembly, the first group of the compiled
+   regex namepat matched against the file's basename, is in the subset.
+   Files whose names do not match are kept, so that the caller reports
+   them as it always has. All files are returned if there is no subset.
+   """
+   import os
+   import re
+   if not getattr( options, 'subsetFile', None ):
+      return files
+   keep = []
+   for f in files:
+      m = re.match( namepat, os.path.basename( f ))
+      if m is None or m.group( 1 ) in options.assemblySubset:
+         keep.append( f )
+   return keep
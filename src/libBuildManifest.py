@@ -0,0 +1,197 @@
+# libBuildManifest.py
+# a library for skipping plots whose inputs have not changed
+#
+# The analysisMakefile rules depend on whole directories, so adding or
+# re-importing one assembly re-runs every script that globs that
+# directory. Each plot script records, in a manifest directory, the
+# content hash of every input it actually read along with its arguments
+# and the hashes of the files it wrote. On the next run the script reads
+# its inputs as usual (cheap with --statsXmlCache), and if nothing it used
+# has changed it touches its outputs, so make is satisfied, and stops
+# before drawing. The outputs are recorded under the names the script
+# wrote, so a rule using this must write straight to its target rather
+# than to a temporary name that it then moves.
+#
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+manifestVersion = 1
+inputsUsed = set() # absolute paths of the inputs read by this process
+
+def initOptions( parser ):
+   parser.add_option( '--buildManifest', dest='buildManifest',
+                      type='string',
+                      help=( 'Directory holding the build manifest. If the inputs this run '
+                             'reads are unchanged since the outputs were last written, '
+                             'the outputs are not regenerated.' ))
+
+def checkOptions( options, parser ):
+   import os
+   if options.buildManifest is None:
+      return
+   if os.path.exists( options.buildManifest ) and not os.path.isdir( options.buildManifest ):
+      parser.error( '--buildManifest %s is not a directory.\n' % options.buildManifest )
+   if not os.path.exists( options.buildManifest ):
+      os.makedirs( options.buildManifest )
+
+def addInput( filename ):
+   """ addInput marks filename as an input of this run.
+   """
+   import os
+   inputsUsed.add( os.path.abspath( filename ))
+
+def fileDigest( filename ):
+   """ returns the md5 hex digest of the contents of filename, or
+   None if filename does not exist.
+   """
+   import hashlib
+   import os
+   if not os.path.exists( filename ):
+      return None
+   m = hashlib.md5()
+   f = open( filename, 'rb' )
+   while True:
+      b = f.read( 1 << 20 )
+      if not b:
+         break
+      m.update( b )
+   f.close()
+   return m.hexdigest()
+
+def outputFiles( options ):
+   """ the files written by libPlotting.writeImage for options.
+   """
+   import os
+   if options.outFormat == 'all':
+      exts = [ '.pdf', '.png', '.eps' ]
+   else:
+      exts = [ '.' + options.outFormat ]
+   return [ os.path.abspath( options.out + e ) for e in exts ]
+
+def moduleFiles():
+   """ the source files of every module the script has imported from its
+   own directory, the lib*.py modules and any other script it borrows
+   functions from.
+   """
+   import os
+   import sys
+   scriptDir = os.path.dirname( os.path.abspath( sys.argv[ 0 ] ))
+   files = set()
+   for m in sys.modules.values():
+      f = getattr( m, '__file__', None )
+      if f is None:
+         continue
+      f = os.path.abspath( f )
+      if os.path.dirname( f ) != scriptDir:
+         continue
+      if f.endswith( '.pyc' ) or f.endswith( '.pyo' ):
+         f = f[ :-1 ]
+      files.add( f )
+   return files
+
+def currentEntry( options ):
+   """ the manifest entry describing this run: the script, its arguments
+   and the digest of every input read so far, including the script
+   itself, the modules it imports from its directory and the 
+   --subsetFile, if any.
+   """
+   import os
+   import sys
+   inputs = set( inputsUsed )
+   inputs.add( os.path.abspath( sys.argv[ 0 ] ))
+   inputs.update( moduleFiles() )
+   if getattr( options, 'subsetFile', None ):
+      inputs.add( os.path.abspath( options.subsetFile ))
+   return { 'version' : manifestVersion,
+            'script'  : os.path.basename( sys.argv[ 0 ] ),
+            'args'    : sys.argv[ 1: ],
+            'inputs'  : dict( ( i, fileDigest( i )) for i in inputs ) }
+
+def entryPath( options ):
+   import hashlib
+   import os
+   key = os.path.abspath( options.out )
+   return os.path.join( options.buildManifest, hashlib.md5( key ).hexdigest() + '.json' )
+
+def readEntry( options ):
+   import json
+   import os
+   p = entryPath( options )
+   if not os.path.exists( p ):
+      return None
+   f = open( p )
+   try:
+      entry = json.load( f )
+   except ValueError:
+      entry = None
+   f.close()
+   return entry
+
+def upToDate( options ):
+   """ upToDate returns True if options.buildManifest holds an entry for
+   options.out that matches this run and every output it recorded is
+   still present and unmodified. In that case the outputs are touched
+   so that make sees them as newer than their prerequisites. Call this
+   after all inputs have been read.
+   """
+   import os
+   if getattr( options, 'buildManifest', None ) is None:
+      return False
+   old = readEntry( options )
+   if old is None:
+      return False
+   new = currentEntry( options )
+   for k in [ 'version', 'script', 'args', 'inputs' ]:
+      if old.get( k ) != new[ k ]:
+         return False
+   outputs = old.get( 'outputs', {} )
+   if sorted( outputs ) != sorted( outputFiles( options )):
+      return False
+   for o in outputs:
+      if fileDigest( o ) != outputs[ o ]:
+         return False
+   for o in outputs:
+      os.utime( o, None )
+   return True
+
+def recordBuild( options ):
+   """ recordBuild writes the manifest entry for this run, call it after
+   the outputs have been written.
+   """
+   import json
+   import libGeneral as lgn
+   import os
+   import tempfile
+   if getattr( options, 'buildManifest', None ) is None:
+      return
+   entry = currentEntry( options )
+   entry[ 'outputs' ] = dict( ( o, fileDigest( o )) for o in outputFiles( options ))
+   fd, tmp = tempfile.mkstemp( dir=options.buildManifest, suffix='.tmp' )
+   f = os.fdopen( fd, 'w' )
+   json.dump( entry, f, sort_keys=True, indent=1 )
+   f.close()
+   lgn.setDefaultFileMode( tmp )
+   os.rename( tmp, entryPath( options ))
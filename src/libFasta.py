@@ -0,0 +1,329 @@
+# libFasta.py
+# a library for reading fasta files in large blocks
+#
+# The stdin filters (standardizeNumNs.py, splitSequenceAtNs.py, 
+# removeEmptyContigs.py, ...) read their input through this library.
+# Input is read a few megabytes at a time and gzip compressed input,
+# recognised by its magic number, is decompressed on the fly. 
+#
+# readLines() gives the lines of the file stripped of surrounding white
+# space, exactly as `for line in sys.stdin: line.strip()' does, for the
+# tools that keep the line structure of their input. readRecords() gives
+# ( header, chunk ) pairs where chunk is a piece of a record's sequence
+# with the line breaks taken out, for the tools that work on sequence.
+# The filters are written as generators from pairs to pairs, so that 
+# fastaPipeline.py can chain them in one process.
+#
+# readShards() cuts the input into pieces of whole records and 
+# writeShards() runs a filter on the pieces in a pool of processes, 
+# which is how the filters' --jobs options work.
+#
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+
+blockSize = 1 << 22
+gzipMagic = '\x1f\x8b'
+lineSpace = ' \t\r\f\v'
+
+class PrefixedStream:
+   """ PrefixedStream reads back the bytes in prefix, which have already 
+   been read from stream, and then carries on reading stream.
+   """
+   def __init__( self, prefix, stream ):
+      self.prefix = prefix
+      self.stream = stream
+   def read( self, size=-1 ):
+      if self.prefix == '':
+         return self.stream.read( size )
+      if size < 0:
+         s = self.prefix + self.stream.read()
+         self.prefix = ''
+         return s
+      s = self.prefix[ :size ]
+      self.prefix = self.prefix[ size: ]
+      if len( s ) < size:
+         s += self.stream.read( size - len( s ))
+      return s
+
+class GzipStream:
+   """ GzipStream decompresses the gzip data read from stream. Unlike
+   gzip.GzipFile it never seeks, so stream may be a pipe. Concatenated
+   gzip members are read one after another.
+   """
+   def __init__( self, stream ):
+      import zlib
+      self.stream = stream
+      self.decompressor = zlib.decompressobj( 16 + zlib.MAX_WBITS )
+      self.buffer = ''
+      self.done = False
+   def fill( self, size ):
+      import zlib
+      while not self.done and ( size < 0 or len( self.buffer ) < size ):
+         data = self.stream.read( blockSize )
+         if data == '':
+            self.buffer += self.decompressor.flush()
+            self.done = True
+            break
+         self.buffer += self.decompressor.decompress( data )
+         while self.decompressor.unused_data != '':
+            rest = self.decompressor.unused_data
+            self.decompressor = zlib.decompressobj( 16 + zlib.MAX_WBITS )
+            self.buffer += self.decompressor.decompress( rest )
+   def read( self, size=-1 ):
+      self.fill( size )
+      if size < 0:
+         size = len( self.buffer )
+      s = self.buffer[ :size ]
+      self.buffer = self.buffer[ size: ]
+      return s
+
+def openFasta( filename=None ):
+   """ returns a stream for the fasta filename, or for stdin if filename
+   is None, that decompresses the input if it is gzip compressed.
+   """
+   import sys
+   if filename is None:
+      stream = sys.stdin
+   else:
+      stream = open( filename, 'rb' )
+   magic = stream.read( len( gzipMagic ))
+   if magic == gzipMagic:
+      return GzipStream( PrefixedStream( magic, stream ))
+   return PrefixedStream( magic, stream )
+
+def readBlocks( stream ):
+   """ yields the contents of stream blockSize bytes at a time, each
+   block cut back to the end of its last complete line. A line longer
+   than blockSize is gathered in pieces and joined once its end is read,
+   so that only each new read is searched for a newline.
+   """
+   pending = []
+   while True:
+      data = stream.read( blockSize )
+      if data == '':
+         break
+      cut = data.rfind( '\n' ) + 1
+      if cut == 0:
+         pending.append( data )
+         continue
+      pending.append( data[ :cut ] )
+      yield ''.join( pending )
+      pending = [ data[ cut: ] ]
+   carry = ''.join( pending )
+   if carry != '':
+      yield carry
+
+def readLines( stream ):
+   """ yields every line of stream, blank ones included, with the
+   surrounding white space stripped.
+   """
+   for block in readBlocks( stream ):
+      lines = block.split( '\n' )
+      if lines[ -1 ] == '':
+         lines.pop()
+      for line in lines:
+         yield line.strip()
+
+def readRecords( stream ):
+   """ yields ( header, None ) for every header line of stream and
+   ( header, chunk ) for the sequence that follows it, where chunk is a
+   non-empty string of sequence with the lines stripped and joined. A
+   record's sequence may come in several chunks. header is the stripped
+   header line, or None for sequence before the first header.
+   """
+   header = None
+   for block in readBlocks( stream ):
+      pos = 0
+      for start, end in headerLines( block ):
+         chunk = sequenceChunk( block[ pos:start ] )
+         if chunk != '':
+            yield ( header, chunk )
+         header = block[ start:end ].strip()
+         yield ( header, None )
+         pos = end
+      chunk = sequenceChunk( block[ pos: ] )
+      if chunk != '':
+         yield ( header, chunk )
+
+def headerLines( block ):
+   """ yields ( start, end ) for each header line of block, a line
+   whose first character other than white space is '>'.
+   """
+   i = block.find( '>' )
+   while i != -1:
+      start = block.rfind( '\n', 0, i ) + 1
+      if start == i or block[ start:i ].strip() == '':
+         end = block.find( '\n', i )
+         if end == -1:
+            end = len( block )
+         yield ( start, end )
+         i = block.find( '>', end )
+      else:
+         i = block.find( '>', i + 1 )
+
+def sequenceChunk( text ):
+   """ joins the lines of sequence in text, stripping each one.
+   """
+   joined = text.translate( None, '\n' + lineSpace )
+   if len( joined ) + text.count( '\n' ) == len( text ):
+      # only newlines were taken out, so there was nothing to strip
+      return joined
+   return ''.join([ line.strip() for line in text.split( '\n' ) ])
+
+def lineEvents( lines ):
+   """ turns the lines from readLines() into ( header, chunk ) pairs like
+   those of readRecords(), one per line, where a blank line is a chunk
+   of ''. The fasta filters pass these pairs from one to the next.
+   """
+   header = None
+   for line in lines:
+      if line.startswith('>'):
+         header = line
+         yield ( header, None )
+      else:
+         yield ( header, line )
+
+def writeLines( events, stream=None ):
+   """ writes ( header, chunk ) pairs to stream, stdout by default, each
+   header and each chunk on a line of its own.
+   """
+   import sys
+   if stream is None:
+      stream = sys.stdout
+   out = []
+   try:
+      for header, chunk in events:
+         if chunk is None:
+            out.append( header )
+         else:
+            out.append( chunk )
+         if len( out ) == 4096:
+            out.append( '' )
+            stream.write( '\n'.join( out ))
+            out = []
+   finally:
+      if out:
+         out.append( '' )
+         stream.write( '\n'.join( out ))
+
+def joinChunks( events ):
+   """ joins the runs of sequence chunks, such as the lines from 
+   lineEvents(), in ( header, chunk ) pairs into chunks of about
+   blockSize characters. Blank chunks, '', are dropped.
+   """
+   header = None
+   chunks = []
+   size = 0
+   for h, chunk in events:
+      if chunk is None or h != header:
+         if chunks:
+            yield ( header, ''.join( chunks ))
+            chunks = []
+            size = 0
+         header = h
+         if chunk is None:
+            yield ( h, None )
+            continue
+      if chunk == '':
+         continue
+      chunks.append( chunk )
+      size += len( chunk )
+      if size >= blockSize:
+         yield ( header, ''.join( chunks ))
+         chunks = []
+         size = 0
+   if chunks:
+      yield ( header, ''.join( chunks ))
+
+def readShards( stream ):
+   """ yields the contents of stream in shards of about blockSize bytes,
+   one for each block from readBlocks(), each cut just before its last 
+   header line so that no record is split between two shards. Every
+   shard but the first starts with a header line. A record longer than
+   a block is kept whole in one larger shard.
+   """
+   pending = []
+   pendingSize = 0
+   for block in readBlocks( stream ):
+      cut = lastHeaderStart( block )
+      if cut != -1 and pendingSize + cut > 0:
+         pending.append( block[ :cut ] )
+         yield ''.join( pending )
+         pending = [ block[ cut: ] ]
+         pendingSize = len( block ) - cut
+      else:
+         pending.append( block )
+         pendingSize += len( block )
+   if pendingSize > 0:
+      yield ''.join( pending )
+
+def lastHeaderStart( block ):
+   """ returns the index of the start of the last header line of block,
+   see headerLines(), or -1 if it has none.
+   """
+   i = block.rfind( '>' )
+   while i != -1:
+      start = block.rfind( '\n', 0, i ) + 1
+      if start == i or block[ start:i ].strip() == '':
+         return start
+      i = block.rfind( '>', 0, i )
+   return -1
+
+def writeShards( jobFunc, jobs, numProcesses, stream=None ):
+   """ calls jobFunc on every job in jobs in a pool of numProcesses
+   processes and writes the text each call returns to stream, stdout by
+   default, in the order of jobs. Only a few jobs per process are 
+   handed out ahead of the one being written, so the input is never 
+   all held in memory. jobFunc returns None if it hit an error, having
+   written the reason to stderr, and then we exit.
+   """
+   import collections
+   import multiprocessing
+   import sys
+   if stream is None:
+      stream = sys.stdout
+   pool = multiprocessing.Pool( processes=numProcesses )
+   pending = collections.deque()
+   try:
+      for job in jobs:
+         pending.append( pool.apply_async( jobFunc, ( job, )))
+         if len( pending ) > 2 * numProcesses:
+            writeShard( pending.popleft().get(), stream )
+      while pending:
+         writeShard( pending.popleft().get(), stream )
+   except:
+      pool.terminate()
+      raise
+   pool.close()
+   pool.join()
+
+def writeShard( text, stream ):
+   import sys
+   if text is None:
+      # the worker has already written the reason to stderr
+      sys.exit( 1 )
+   stream.write( text )
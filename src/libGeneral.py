@@ -67,6 +67,26 @@ def prettyFloat( f, n ):
          s = '%s%s' % ( r[ (len(r) - 1) - j], s )
    return s
 
+newFileMode = None
+def defaultFileMode():
+   """ the mode open() gives a new file, 0666 less the umask. The umask
+   can only be read by setting it, so it is read once and kept.
+   """
+   import os
+   global newFileMode
+   if newFileMode is None:
+      umask = os.umask( 0 )
+      os.umask( umask )
+      newFileMode = 0666 & ~umask
+   return newFileMode
+
+def setDefaultFileMode( path ):
+   """ gives path, e.g. a file from tempfile.mkstemp(), which only its
+   owner can read, the mode open() would have given it.
+   """
+   import os
+   os.chmod( path, defaultFileMode() )
+
 ##############################
 # idMap provides a mapping between the assemly ID numbers used
 # in the filesystem to the names displayed in figures and tables.
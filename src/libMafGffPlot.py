@@ -31,7 +31,7 @@ class Data:
    """
    def __init__( self ):
       self.chroms            = {} # values will be strings
-      self.mafBlocksByChrom  = {} # values will be lists of MafBlock objs
+      self.mafBlocksByChrom  = {} # values will be MafBlockTable objs
       self.gffRecordsByChrom = {} # values will be dicts of key: annot 
                                   # names, value: list of GffRecord objs
 class MafBlock:
@@ -72,6 +72,63 @@ class MafBlock:
       self.refEnd  += self.refStrand
       self.pairEnd += self.pairStrand
 
+class MafBlockTable:
+   """ a MafBlockTable stores the MafBlocks of one chromosome
+   column-wise, one row per block, in a numpy structured array.
+   Only the fields needed to bin and trim are kept. Rows are 
+   appended into fixed size chunks which are joined into a single
+   array the first time blocks() is called, so appending never
+   copies the rows already stored.
+   """
+   fields = [ ( 'refStart', 'i8' ), ( 'refEnd', 'i8' ), ( 'refStrand', 'i1' ),
+              ( 'pairStart', 'i8' ), ( 'pairEnd', 'i8' ), ( 'pairStrand', 'i1' ),
+              ( 'pairTotalLength', 'i8' ), ( 'hpl', 'i8' ), ( 'hplStart', 'i1' ), 
+              ( 'hplEnd', 'i1' ), ( 'spl', 'i8' ) ]
+   def __init__( self, chunkSize=65536 ):
+      import numpy
+      self.chunkSize = chunkSize
+      self.fullChunks = []
+      self.chunk = numpy.zeros( 0, dtype=MafBlockTable.fields )
+      self.used = 0
+   def __len__( self ):
+      return sum([ len( c ) for c in self.fullChunks ]) + self.used
+   def append( self, mb ):
+      """ store the MafBlock mb as a new row.
+      """
+      import numpy
+      if self.used == len( self.chunk ):
+         if self.used > 0:
+            self.fullChunks.append( self.chunk )
+         self.chunk = numpy.zeros( self.chunkSize, dtype=MafBlockTable.fields )
+         self.used = 0
+      self.chunk[ self.used ] = ( mb.refStart, mb.refEnd, mb.refStrand, 
+                                  mb.pairStart, mb.pairEnd, mb.pairStrand,
+                                  mb.pairTotalLength, mb.hpl, mb.hplStart,
+                                  mb.hplEnd, mb.spl )
+      self.used += 1
+   def blocks( self ):
+      """ return all rows as a single structured array. The result is
+      a view, changes to it are changes to the table.
+      """
+      import numpy
+      if len( self.fullChunks ) > 0:
+         self.chunk = numpy.concatenate( self.fullChunks + [ self.chunk[ :self.used ]] )
+         self.used = len( self.chunk )
+         self.fullChunks = []
+      return self.chunk[ :self.used ]
+   def setBlocks( self, blocks ):
+      """ replace the contents of the table with the structured array 
+      blocks, e.g. after sorting or trimming.
+      """
+      self.fullChunks = []
+      self.chunk = blocks
+      self.used = len( blocks )
+   def sortOn( self, field ):
+      """ stable sort of the rows on field.
+      """
+      b = self.blocks()
+      self.setBlocks( b[ b[ field ].argsort( kind='mergesort' ) ] )
+
 class MafLine:
    """ a MafLine object stores the raw input from the maf file
    and is subsequently joined with another MafLine object to 
@@ -85,6 +142,7 @@ class MafLine:
       self.strand = ''
       self.totalLength = -1
       self.sequence = ''
+      self.sequenceLength = -1
       # order > -1 implies this sequence is the comparativeGenome
       # and this is the order the sequence appears in the block from
       # (0..n-1) for a block with n sequences.
@@ -152,20 +210,26 @@ def newMafWigDict( numBins ):
              'blockEdgeMax'      : 0,
              'columnsInBlocks'   : 0 }
 
-def objListToBinnedWiggle( objList, featLen, numBins, filename ):
-   """ obj can be either a GffRecord object or a MafBlock object.
+def objListToBinnedWiggle( objList, featLen, numBins, filename, pyramidBinSize=0 ):
+   """ obj can be either a GffRecord object or a MafBlock object,
+   or objList can be a MafBlockTable.
    featLen is the length of the chromosome.
    returns a numpy vector of length numBins normalized by the maximum
-   possible number of bases per bin.
+   possible number of bases per bin. For MafBlocks a positive 
+   pyramidBinSize also stores the coverage pyramid, see 
+   objListUtility_buildPyramid().
    """
    from libMafGffPlot import GffRecord
    from libMafGffPlot import MafBlock
-   from libMafGffPlot import newMafWigDict
+   from libMafGffPlot import MafBlockTable
+   from libMafGffPlot import objListUtility_mafBlockTableToWiggle
    from libMafGffPlot import objListUtility_xAxis
    import numpy
    import sys
    if objList is None or len( objList ) < 1:
       return None
+   if isinstance( objList, MafBlockTable ):
+      return objListUtility_mafBlockTableToWiggle( objList, featLen, numBins, pyramidBinSize )
    if isinstance( objList[0], GffRecord ):
       """ the Gff return is a single numpy vector of numBins length
       """
@@ -229,157 +293,172 @@ def objListToBinnedWiggle( objList, featLen, numBins, filename ):
       blockEdgeMax      max count
       
       """
-      from libMafGffPlot import objListUtility_addContigPathEdgeErrors
-      from libMafGffPlot import objListUtility_addBlockEdges
-      from libMafGffPlot import objListUtility_normalizeCategories
-      data = newMafWigDict( numBins )
-      
-      # populate xAxis
-      data['xAxis'] = objListUtility_xAxis( featLen, numBins )
+      table = MafBlockTable()
       for mb in objList:
-         # do block edges
-         objListUtility_addBlockEdges( data, mb, featLen, numBins )
-         
-         # do contige path edges and errors
-         objListUtility_addContigPathEdgeErrors( data, mb, featLen, numBins )
-            
-         # do all of the different maf block flavors
-         objListUtility_mafBlockCounts( data, mb, featLen, numBins )
-            
-      # normalize all categories
-      objListUtility_normalizeCategories( data, featLen, numBins )
-        
-      return data
+         table.append( mb )
+      return objListUtility_mafBlockTableToWiggle( table, featLen, numBins, pyramidBinSize )
    # closing the elif isinstance() checks
    else:
       return None
 
-def objListUtility_addContigPathEdgeErrors( data, mb, featLen, numBins ):
+def objListUtility_mafBlockTableToWiggle( table, featLen, numBins, pyramidBinSize=0 ):
    """ Utility function for the MafBlock instance version of 
    libMafGffPlot.objListToBinnedWiggle()
-   """ 
-   from libMafGffPlot import objListUtility_indexToPos
-   import math
-   posSt  = objListUtility_indexToPos( mb.refStart, featLen, numBins )
-   posEnd = objListUtility_indexToPos( mb.refEnd, featLen, numBins )
-   # five prime
-   if mb.hplStart == 0:
-      # edge
-      data['mafCpEdgeCount'][ posSt ] += 1.0
-      if data['mafCpEdgeCount'][ posSt ] > data[ 'mafCpEdgeMax' ]:
-         data[ 'mafCpEdgeMax' ] = data['mafCpEdgeCount'][ posSt ]
-   elif mb.hplStart == 2:
-      # error
-      data['mafCpErrorCount'][ posSt ] += 1.0
-      if data['mafCpErrorCount'][ posSt ] > data[ 'mafCpErrorMax' ]:
-         data[ 'mafCpErrorMax' ] = data['mafCpErrorCount'][ posSt ]
-   elif mb.hplStart == 3:
-      # scaffold gap
-      data['mafCpScafGapCount'][ posSt ] += 1.0
-      if data['mafCpScafGapCount'][ posSt ] > data[ 'mafCpScafGapMax' ]:
-         data[ 'mafCpScafGapMax' ] = data['mafCpScafGapCount'][ posSt ]
-   # three prime
-   if mb.hplEnd == 0:
-      # edge
-      data['mafCpEdgeCount'][ posEnd ] += 1.0
-      if data['mafCpEdgeCount'][ posEnd ] > data[ 'mafCpEdgeMax' ]:
-         data[ 'mafCpEdgeMax' ] = data['mafCpEdgeCount'][ posEnd ]
-   elif mb.hplEnd == 2:
-      # error
-      data['mafCpErrorCount'][ posEnd ] += 1.0
-      if data['mafCpErrorCount'][ posEnd ] > data[ 'mafCpErrorMax' ]:
-         data[ 'mafCpErrorMax' ] = data['mafCpErrorCount'][ posEnd ]
-   elif mb.hplEnd == 3:
-      # scaffold gap
-      data['mafCpScafGapCount'][ posEnd ] += 1.0
-      if data['mafCpScafGapCount'][ posEnd ] > data[ 'mafCpScafGapMax' ]:
-         data[ 'mafCpScafGapMax' ] = data['mafCpScafGapCount'][ posEnd ]
+   table is a MafBlockTable, returns the normalized mafWigDict.
+   """
+   from libMafGffPlot import newMafWigDict
+   from libMafGffPlot import objListUtility_binMafBlockTable
+   from libMafGffPlot import objListUtility_buildPyramid
+   from libMafGffPlot import objListUtility_normalizeCategories
+   from libMafGffPlot import objListUtility_addPyramid
+   from libMafGffPlot import objListUtility_xAxis
+   data = newMafWigDict( numBins )
+   objListUtility_addPyramid( data, featLen, pyramidBinSize )
+   
+   # populate xAxis
+   data['xAxis'] = objListUtility_xAxis( featLen, numBins )
+   # do block edges, contig path edges and errors and all of the 
+   # different maf block flavors in one pass over the block arrays
+   objListUtility_binMafBlockTable( data, table, featLen, numBins )
+   
+   # normalize all categories
+   objListUtility_normalizeCategories( data, featLen, numBins )
+   objListUtility_buildPyramid( data, featLen, pyramidBinSize )
+   return data
 
-def objListUtility_normalizeCategories( data, featLen, numBins ):
+def objListUtility_binMafBlockTable( data, table, featLen, numBins ):
    """ Utility function for the MafBlock instance version of 
    libMafGffPlot.objListToBinnedWiggle()
-   """ 
-   import math
-   import sys
-   maxPossibleCount = math.ceil( float( featLen ) / float( numBins ))
-    
-   for r in [ 'maf', 'maf1e2', 'maf1e3', 'maf1e4', 
-              'maf1e5', 'maf1e6', 'maf1e7', 'mafCpl1e2',
-              'mafCpl1e3', 'mafCpl1e4', 'mafCpl1e5', 
-              'mafCpl1e6', 'mafCpl1e7',
-              'mafCtg1e2', 'mafCtg1e3', 'mafCtg1e4',
-              'mafCtg1e5', 'mafCtg1e6', 'mafCtg1e7', 
-              'mafSpl1e2', 'mafSpl1e3', 'mafSpl1e4', 
-              'mafSpl1e5', 'mafSpl1e6', 'mafSpl1e7' ]:
-
-      # verify data 1
-      if sum( data[ r ] > maxPossibleCount ) > 0:
-         sys.stderr.write('libMafGffPlot.py: Error in normalization step, category \'%s\' has elements '
-                          'greater than max %d (featLen/numBins = %d/%d)\n' 
-                          % ( r, maxPossibleCount, featLen, numBins ))
-         # verify data 2
-         i = -1
-         for d in data[ r ]:
-            i += 1
-            if d > maxPossibleCount:
-               start = math.floor( i * ( float( featLen ) / numBins ))
-               end   = math.floor( (i + 1) * ( float( featLen ) / numBins ))
-               sys.stderr.write('   i=%d [%d,%d] count %d\n' % ( i, start, end, d ))
-               sys.exit(1)
-
-      # normalize
-      data[ r ] /= float( maxPossibleCount )
+   Adds the raw counts of every block in the MafBlockTable, table, 
+   to the mafWigDict data.
+   """
+   from libMafGffPlot import objListUtility_binMafBlockArrays
+   b = table.blocks()
+   objListUtility_binMafBlockArrays( data, b['refStart'], b['refEnd'], b['hpl'], 
+                                     b['hplStart'], b['hplEnd'], b['spl'], 
+                                     b['pairTotalLength'], featLen, numBins )
+   if 'pyrFine' in data:
+      objListUtility_binMafBlockArrays( data['pyrFine'], b['refStart'], b['refEnd'], b['hpl'], 
+                                        b['hplStart'], b['hplEnd'], b['spl'], 
+                                        b['pairTotalLength'], featLen, 
+                                        len( data['pyrFine']['maf'] ))
 
-def objListUtility_addBlockEdges( data, mb, featLen, numBins ):
+def objListUtility_binMafBlockArrays( data, refStart, refEnd, hpl, hplStart, hplEnd, 
+                                      spl, pairTotalLength, featLen, numBins ):
    """ Utility function for the MafBlock instance version of 
    libMafGffPlot.objListToBinnedWiggle()
-   """ 
-   from libMafGffPlot import objListUtility_indexToPos
-   import math
+   Adds the raw (un-normalized) counts of a batch of blocks to the mafWigDict
+   data. The blocks are given as parallel numpy arrays, one element per block,
+   in positive strand coordinates with refStart <= refEnd. This can be called 
+   repeatedly on the same data with successive batches.
+   A block only has partial coverage of the bins holding its two ends, the bins
+   in between are whole and are counted with a difference array and a prefix sum,
+   so the cost depends on the number of blocks plus the number of bins and not
+   on the number of bases in the blocks.
+   """
+   from libMafGffPlot import objListUtility_binStarts
+   from libMafGffPlot import objListUtility_indicesToPos
+   from libMafGffPlot import objListUtility_levelCounts
+   import numpy
    import sys
-   for r in [ mb.refStart, mb.refEnd ]:
-      if r > featLen:
+   if len( refStart ) < 1:
+      return
+   for r in [ refStart, refEnd ]:
+      if r.max() > featLen:
          sys.stderr.write('libMafGffPlot.py: Error in block edge step, a position is '
                           'greater than the feature length, %d > %d.\n' 
-                          % (r, featLen))
+                          % ( r.max(), featLen ))
          sys.exit(1)
+      if r.min() < 1:
+         sys.stderr.write('libMafGffPlot.py: Error in block edge step, a position, %d, '
+                          'is less than 1\n' % r.min() )
+         sys.exit(1)
+   posSt  = objListUtility_indicesToPos( refStart, featLen, numBins )
+   posEnd = objListUtility_indicesToPos( refEnd, featLen, numBins )
+
+   # block edges
+   data['blockEdgeCount'] += numpy.bincount( numpy.concatenate(( posSt, posEnd )), 
+                                             minlength=numBins )
+   # contig path edges (0), errors (2) and scaffold gaps (3), five prime then three prime
+   for code, key in [ ( 0, 'mafCpEdge' ), ( 2, 'mafCpError' ), ( 3, 'mafCpScafGap' ) ]:
+      data[ key + 'Count' ] += numpy.bincount( numpy.concatenate(( posSt[ hplStart == code ], 
+                                                                   posEnd[ hplEnd == code ] )),
+                                               minlength=numBins )
+   for key in [ 'blockEdge', 'mafCpEdge', 'mafCpError', 'mafCpScafGap' ]:
+      m = data[ key + 'Count' ].max()
+      if m > data[ key + 'Max' ]:
+         data[ key + 'Max' ] = m
+
+   # the number of bases each block has in its first bin and in its last bin,
+   # and the range of whole bins in between.
+   binStarts = objListUtility_binStarts( featLen, numBins )
+   binWidths = binStarts[ 1: ] - binStarts[ :-1 ]
+   oneBin = posSt == posEnd
+   firstCount = numpy.where( oneBin, refEnd - refStart + 1, binStarts[ posSt + 1 ] - refStart )
+   lastCount  = numpy.where( oneBin, 0, refEnd - binStarts[ posEnd ] + 1 )
+   wholeFrom  = posSt + 1
+   wholeTo    = numpy.maximum( posEnd, wholeFrom )
+   
+   length = refEnd - ( refStart + 1 )
+   for base, values in [ ( 'maf', length ), ( 'mafSpl', spl ), 
+                         ( 'mafCtg', pairTotalLength ), ( 'mafCpl', hpl ) ]:
+      # a block's level is the number of thresholds, 1e2 .. 1e7, that it meets
+      levels = numpy.zeros( len( refStart ), dtype=numpy.int64 )
+      for i in xrange( 2, 8 ):
+         levels += values >= 10 ** i
+      counts = objListUtility_levelCounts( levels, posSt, posEnd, firstCount, lastCount, 
+                                           wholeFrom, wholeTo, binWidths, numBins )
+      if base == 'maf':
+         # every block, regardless of level
+         data['maf'] += counts[ 0 ]
+      for i in xrange( 2, 8 ):
+         data[ '%s1e%d' % ( base, i ) ] += counts[ i - 1 ]
 
-      p = objListUtility_indexToPos( r, featLen, numBins )
-      if p < 0:
-         sys.stderr.write('libMafGffPlot.py: Error in block edge step, a position, %d, is less than 0\n' % p )
-      elif p >= len( data['blockEdgeCount'] ):
-         sys.stderr.write('a position, %d, is greater than or '
-                          'equal to len(data[\'blockEdgeCount\']) %d [%d-%d]\n' 
-                          % (p, len(data['blockEdgeCount']), mb.refStart, mb.refEnd))
-      data['blockEdgeCount'][ p ] += 1.0
-      if data['blockEdgeCount'][ p ] > data[ 'blockEdgeMax' ]:
-         data[ 'blockEdgeMax' ] = data['blockEdgeCount'][ p ]
-
-def objListUtility_mafBlockCounts( data, mb, featLen, numBins ):
+def objListUtility_levelCounts( levels, posSt, posEnd, firstCount, lastCount, 
+                                wholeFrom, wholeTo, binWidths, numBins ):
+   """ Utility function for objListUtility_binMafBlockArrays().
+   Returns a 7 x numBins array where row k holds the number of bases
+   in each bin covered by blocks whose level is k or greater.
+   """
+   import numpy
+   numLevels = 7
+   partial = ( numpy.bincount( levels * numBins + posSt, weights=firstCount, 
+                               minlength=numLevels * numBins ) +
+               numpy.bincount( levels * numBins + posEnd, weights=lastCount, 
+                               minlength=numLevels * numBins ))
+   diff = ( numpy.bincount( levels * ( numBins + 1 ) + wholeFrom, 
+                            minlength=numLevels * ( numBins + 1 )) -
+            numpy.bincount( levels * ( numBins + 1 ) + wholeTo, 
+                            minlength=numLevels * ( numBins + 1 )))
+   whole = numpy.cumsum( diff.reshape( numLevels, numBins + 1 ), axis=1 )[ :, :numBins ]
+   counts = partial.reshape( numLevels, numBins ) + whole * binWidths
+   # accumulate from the top level down so that row k holds levels >= k
+   return numpy.cumsum( counts[ ::-1 ], axis=0 )[ ::-1 ]
+
+def objListUtility_normalizeCategories( data, featLen, numBins ):
    """ Utility function for the MafBlock instance version of 
    libMafGffPlot.objListToBinnedWiggle()
-   This is by far the most costly routine in the objList creation process
    """ 
-   from libMafGffPlot import objListUtility_rangeToPos
-   import numpy
-   length = mb.refEnd - ( mb.refStart + 1 )
-   
-   # tough to follow index hack to get around the fact that numpy will not use
-   # += 1 for a list of indices that contain repeats.
-   pos = objListUtility_rangeToPos( mb.refStart, mb.refEnd, featLen, numBins )
-   plo, phi = pos.min(), pos.max()
-   pbins = numpy.bincount( pos - plo )
-   data['maf'][ plo:phi + 1 ] += pbins
+   import libMafValidation as lmv
+   import math
+   import sys
+   maxPossibleCount = math.ceil( float( featLen ) / float( numBins ))
    
-   for i in xrange( 2, 8 ):
-      if length >= 10 ** i:
-         data[ 'maf1e%d' % i ][ plo:phi+1 ] += pbins
-      if mb.spl >= 10 ** i:
-         data[ 'mafSpl1e%d' % i ][ plo:phi+1 ] += pbins
-      if mb.pairTotalLength >= 10 ** i:
-         data[ 'mafCtg1e%d' % i ][ plo:phi+1 ] += pbins
-      if mb.hpl >= 10 ** i:
-         data[ 'mafCpl1e%d' % i ][ plo:phi+1 ] += pbins
+   # verify data
+   bad = lmv.checkCeiling( data, lmv.coverageTracks, maxPossibleCount )
+   if bad is not None:
+      r, i = bad
+      sys.stderr.write('libMafGffPlot.py: Error in normalization step, category \'%s\' has elements '
+                       'greater than max %d (featLen/numBins = %d/%d)\n' 
+                       % ( r, maxPossibleCount, featLen, numBins ))
+      start = math.floor( i * ( float( featLen ) / numBins ))
+      end   = math.floor( (i + 1) * ( float( featLen ) / numBins ))
+      sys.stderr.write('   i=%d [%d,%d] count %d\n' % ( i, start, end, data[ r ][ i ] ))
+      sys.exit(1)
+
+   # normalize
+   for r in lmv.coverageTracks:
+      data[ r ] /= float( maxPossibleCount )
 
 def objListUtility_xAxis( featLen, numBins ):
     """ Utility function for the MafBlock instance version of 
@@ -407,6 +486,43 @@ def objListUtility_indexToPos( p, featLen, numBins ):
     # return the index in a length numBins array
     return math.floor( z )
 
+def objListUtility_indicesToPos( p, featLen, numBins ):
+   """ Utility function for the MafBlock instance version of 
+   libMafGffPlot.objListToBinnedWiggle()
+   numpy array version of objListUtility_indexToPos(), the arithmetic is
+   done in the same order so that both map a position to the same bin.
+   """ 
+   import numpy
+   z  = p - 1.0
+   z /= featLen
+   z *= float( numBins )
+   return ( numpy.floor( z ) ).astype( numpy.int64 )
+
+def objListUtility_binStarts( featLen, numBins ):
+   """ Utility function for the MafBlock instance version of 
+   libMafGffPlot.objListToBinnedWiggle()
+   Returns an array of length numBins + 1 where element b is the first
+   position in [1, featLen] that objListUtility_indicesToPos() maps to 
+   bin b, and the last element is featLen + 1. Bin b therefore holds 
+   element b + 1 minus element b bases.
+   """
+   from libMafGffPlot import objListUtility_indicesToPos
+   import numpy
+   b = numpy.arange( numBins + 1, dtype=numpy.int64 )
+   # exact answer in real arithmetic, then nudged to agree with the floating point mapping
+   p = numpy.minimum(( b * featLen ) // numBins + 1, featLen + 1 )
+   while True:
+      back = ( p > 1 ) & ( b < numBins )
+      back[ back ] = objListUtility_indicesToPos( p[ back ] - 1, featLen, numBins ) >= b[ back ]
+      ahead = ( p <= featLen ) & ( b < numBins )
+      ahead[ ahead ] = objListUtility_indicesToPos( p[ ahead ], featLen, numBins ) < b[ ahead ]
+      if not ( back.any() or ahead.any() ):
+         break
+      p[ back ] -= 1
+      p[ ahead ] += 1
+   p[ numBins ] = featLen + 1
+   return p
+
 def objListUtility_rangeToPos( p1, p2, featLen, numBins ):
    """ Utility function for the MafBlock instance version of 
    libMafGffPlot.objListToBinnedWiggle()
@@ -434,11 +550,230 @@ def objListUtility_rangeToPos( p1, p2, featLen, numBins ):
    # return indices for the mapping
    return ( numpy.floor( z ) ).astype('int')
 
+pyramidCountTracks = [ 'mafCpEdge', 'mafCpError', 'mafCpScafGap', 'blockEdge' ]
+pyramidTopBins = 64
+
+def objListUtility_addPyramid( data, featLen, pyramidBinSize ):
+   """ Utility function for the MafBlock instance version of 
+   libMafGffPlot.objListToBinnedWiggle()
+   If pyramidBinSize is positive, adds to the mafWigDict data a second
+   mafWigDict, 'pyrFine', with bins of about pyramidBinSize bases. The
+   binning functions fill it with raw counts alongside data and
+   objListUtility_buildPyramid() turns it into the pyramid.
+   """
+   from libMafGffPlot import newMafWigDict
+   if pyramidBinSize < 1:
+      return
+   data[ 'pyrFine' ] = newMafWigDict( max( 1, ( featLen + pyramidBinSize - 1 ) // pyramidBinSize ))
+
+def objListUtility_isPyramidKey( k ):
+   return k.startswith( 'pyr' )
+
+def objListUtility_buildPyramid( data, featLen, pyramidBinSize ):
+   """ Utility function for the MafBlock instance version of 
+   libMafGffPlot.objListToBinnedWiggle()
+   Replaces the raw counts in data['pyrFine'], if there are any, by the
+   flat keys of the coverage pyramid:
+   pyramidLevels      number of levels
+   pyramidBinSize     the requested width of a level 0 bin
+   pyr<L>.binStarts   bin boundaries of level L as from objListUtility_binStarts()
+   pyr<L>.<track>     base counts of every track in lmv.coverageTracks
+   pyr<L>.<track>Count  event counts of every track in pyramidCountTracks
+   Level 0 is the fine binning, each level above it sums pairs of bins
+   of the level below, up to the first level with pyramidTopBins bins
+   or fewer. The counts are raw, not normalized, so that they can be 
+   added up into any other binning by pyramidWiggle().
+   """
+   from libMafGffPlot import objListUtility_binStarts
+   import libMafValidation as lmv
+   import numpy
+   if 'pyrFine' not in data:
+      return
+   fine = data.pop( 'pyrFine' )
+   n = len( fine['maf'] )
+   starts = objListUtility_binStarts( featLen, n )
+   tracks = {}
+   for k in lmv.coverageTracks:
+      tracks[ k ] = numpy.round( fine[ k ] ).astype( numpy.int64 )
+   for k in pyramidCountTracks:
+      tracks[ k + 'Count' ] = fine[ k + 'Count' ].astype( numpy.int64 )
+   level = 0
+   while True:
+      data[ 'pyr%d.binStarts' % level ] = starts
+      for k in tracks:
+         data[ 'pyr%d.%s' % ( level, k ) ] = tracks[ k ]
+      n = len( starts ) - 1
+      if n <= pyramidTopBins:
+         break
+      starts = numpy.concatenate(( starts[ :-1:2 ], starts[ -1: ] ))
+      for k in tracks:
+         v = tracks[ k ]
+         if n % 2:
+            v = numpy.concatenate(( v, numpy.zeros( 1, dtype=v.dtype )))
+         tracks[ k ] = v.reshape( -1, 2 ).sum( axis=1 )
+      level += 1
+   data[ 'pyramidLevels' ] = level + 1
+   data[ 'pyramidBinSize' ] = pyramidBinSize
+
+def pyramidLevel( tracks, bounds ):
+   """ the coarsest level of the pyramid in tracks that has a bin edge at
+   every one of the requested bin edges, bounds, so that rebinning from
+   it is exact. Level 0, the finest, if no level does.
+   """
+   import numpy
+   for level in xrange( tracks[ 'pyramidLevels' ] - 1, 0, -1 ):
+      if numpy.in1d( bounds, tracks[ 'pyr%d.binStarts' % level ] ).all():
+         return level
+   return 0
+
+def pyramidTrack( tracks, k, featLen, numBins, start=1, end=None ):
+   """ returns track k of a mafWigDict with numBins bins over the positions
+   [start, end] (default, the whole chromosome) aggregated from the pyramid
+   stored in tracks, a chromosome's dict or MafWigTracks. Only the stored
+   bins that overlap [start, end] are read. The result is exact when every
+   requested bin edge is a stored bin edge, which is always so for a 
+   pyramid built with a --pyramidBinSize of 1. Otherwise level 0 is used
+   and the result is approximate: coverage is taken to be uniform inside
+   a stored bin, so a stored bin that straddles a requested bin edge is
+   split in proportion, and events (edges, errors, gaps) go to the
+   requested bin that holds the start of their stored bin. Coverage 
+   tracks are normalized as objListUtility_normalizeCategories() does.
+   """
+   from libMafGffPlot import objListUtility_binStarts
+   from libMafGffPlot import objListUtility_xAxis
+   import libMafValidation as lmv
+   import math
+   import numpy
+   if end is None:
+      end = featLen
+   length = end - start + 1
+   if k == 'xAxis':
+      return objListUtility_xAxis( length, numBins ) + ( start - 1 )
+   if k == 'columnsInBlocks':
+      return tracks[ k ]
+   bounds = objListUtility_binStarts( length, numBins ) + ( start - 1 )
+   level = pyramidLevel( tracks, bounds )
+   starts = tracks[ 'pyr%d.binStarts' % level ]
+   i0 = numpy.searchsorted( starts, start, side='right' ) - 1
+   i1 = numpy.searchsorted( starts, end + 1, side='left' )
+   s = numpy.asarray( starts[ i0:i1 + 1 ] )
+   if k in lmv.coverageTracks:
+      v = numpy.asarray( tracks[ 'pyr%d.%s' % ( level, k ) ][ i0:i1 ] )
+      cum = numpy.concatenate(( [ 0 ], numpy.cumsum( v ))).astype( numpy.float64 )
+      counts = numpy.diff( numpy.interp( bounds, s, cum ))
+      return counts / float( math.ceil( float( length ) / float( numBins )))
+   if k.endswith( 'Max' ) and k[ :-3 ] in pyramidCountTracks:
+      return pyramidTrack( tracks, k[ :-3 ] + 'Count', featLen, numBins, start, end ).max()
+   if k.endswith( 'Count' ) and k[ :-5 ] in pyramidCountTracks:
+      v = numpy.asarray( tracks[ 'pyr%d.%s' % ( level, k ) ][ i0:i1 ] )
+      cum = numpy.concatenate(( [ 0 ], numpy.cumsum( v )))
+      return numpy.diff( cum[ numpy.searchsorted( s[ :-1 ], bounds, side='left' ) ] )
+   raise KeyError( k )
+
+def pyramidWiggle( tracks, featLen, numBins, start=1, end=None ):
+   """ returns a complete mafWigDict of numBins bins over [start, end]
+   built from the pyramid in tracks, see pyramidTrack().
+   """
+   import libMafValidation as lmv
+   d = {}
+   for k in ( lmv.coverageTracks + [ 'xAxis', 'columnsInBlocks' ] +
+              [ t + 'Count' for t in pyramidCountTracks ] +
+              [ t + 'Max' for t in pyramidCountTracks ] ):
+      d[ k ] = pyramidTrack( tracks, k, featLen, numBins, start, end )
+   return d
+
+class MafPyramidTracks:
+   """ MafPyramidTracks stands in for a MafWigTracks whose tracks are
+   rebinned from the stored pyramid to numBins bins over [start, end].
+   Each track is built the first time it is asked for.
+   """
+   def __init__( self, tracks, featLen, numBins, start=1, end=None ):
+      self.tracks = tracks
+      self.featLen = featLen
+      self.numBins = numBins
+      self.start = start
+      self.end = end
+      self.loaded = {}
+   def __getitem__( self, k ):
+      if k not in self.loaded:
+         self.loaded[ k ] = pyramidTrack( self.tracks, k, self.featLen, self.numBins, 
+                                          self.start, self.end )
+      return self.loaded[ k ]
+   def __setitem__( self, k, v ):
+      self.loaded[ k ] = v
+   def __contains__( self, k ):
+      return k in self.loaded or k in self.tracks
+   def keys( self ):
+      return [ k for k in self.tracks.keys() if not objListUtility_isPyramidKey( k ) ]
+   def sum( self, k ):
+      return self[ k ].sum()
+
+def regionBins( featLen, numBins, start, end ):
+   """ returns the half open range ( i0, i1 ) of the bins of a length
+   numBins wiggle over [1, featLen] that hold positions [start, end]. The
+   range is widened to at least two bins when the wiggle has them.
+   """
+   i0 = int( objListUtility_indexToPos( start, featLen, numBins ))
+   i1 = int( objListUtility_indexToPos( end, featLen, numBins )) + 1
+   if i1 - i0 < 2:
+      i1 = min( i0 + 2, numBins )
+      i0 = max( i1 - 2, 0 )
+   return ( i0, i1 )
+
+class MafRegionTracks:
+   """ MafRegionTracks stands in for a chromosome's dict or MafWigTracks
+   cut down to the stored bins that overlap positions [start, end]. Each
+   track is sliced the first time it is asked for, so a memory-mapped
+   wigStore track is only read inside the window. The xAxis keeps
+   chromosome coordinates and the *Max values are those of the window.
+   """
+   def __init__( self, tracks, featLen, start, end ):
+      self.tracks = tracks
+      self.featLen = featLen
+      self.start = start
+      self.end = end
+      self.bins = None
+      self.loaded = {}
+   def window( self ):
+      if self.bins is None:
+         numBins = len( self.tracks[ 'xAxis' ] )
+         self.bins = regionBins( self.featLen, numBins, self.start, self.end )
+      return self.bins
+   def __getitem__( self, k ):
+      import numpy
+      if k not in self.loaded:
+         if k.endswith( 'Max' ) and k[ :-3 ] + 'Count' in self.tracks:
+            self.loaded[ k ] = self[ k[ :-3 ] + 'Count' ].max()
+         else:
+            v = self.tracks[ k ]
+            if isinstance( v, numpy.ndarray ):
+               i0, i1 = self.window()
+               v = numpy.array( v[ i0:i1 ] )
+            self.loaded[ k ] = v
+      return self.loaded[ k ]
+   def __setitem__( self, k, v ):
+      self.loaded[ k ] = v
+   def __contains__( self, k ):
+      return k in self.loaded or k in self.tracks
+   def keys( self ):
+      return self.tracks.keys()
+   def sum( self, k ):
+      return self[ k ].sum()
+
+wigStoreMagic = 'MAFWIGST'
+wigStoreVersion = 1
+wigStoreAlign = 64
+
 def packData( packMe, filename, options, prot='py23Bin' ):
    """ packData takes some data and a filename and
-   packs it away. prot refers to the protocol to use.
+   packs it away. prot refers to the protocol to use,
+   'wigStore' writes the binary wiggle store, everything
+   else is a pickle protocol.
    """
    import cPickle
+   if prot == 'wigStore':
+      packWigStore( packMe, filename )
+      return
    protocols = { 'ASCII' : 0,
                  'pre23Bin' : 1,
                  'py23Bin'  : 2 }
@@ -446,16 +781,366 @@ def packData( packMe, filename, options, prot='py23Bin' ):
    cPickle.dump( packMe, f, protocol = protocols[ prot ] )
    f.close()
 
+def packWigStore( packMe, filename ):
+   """ packWigStore writes a dict of dicts (chromosome -> key -> value)
+   as a single binary file: the magic string, the length of a JSON
+   manifest, the manifest, and then every array as raw bytes aligned
+   to wigStoreAlign. Arrays are described in the manifest by dtype, shape
+   and offset (relative to the start of the data section) so that any
+   one track can be memory-mapped without reading the rest. Scalars
+   are kept in the manifest along with the sum of every array.
+   """
+   import json
+   import numpy
+   import struct
+   manifest = { 'format' : 'wigStore',
+                'version' : wigStoreVersion,
+                'chroms' : {} }
+   arrays = []
+   offset = 0
+   for c in packMe:
+      m = { 'arrays' : {}, 'sums' : {}, 'values' : {} }
+      for k in packMe[ c ]:
+         v = packMe[ c ][ k ]
+         if isinstance( v, numpy.ndarray ):
+            v = numpy.ascontiguousarray( v )
+            m[ 'arrays' ][ k ] = { 'dtype' : v.dtype.str,
+                                   'shape' : list( v.shape ),
+                                   'offset' : offset }
+            m[ 'sums' ][ k ] = v.sum().item()
+            arrays.append( ( offset, v ) )
+            offset = wigStoreAligned( offset + v.nbytes )
+         else:
+            if isinstance( v, numpy.generic ):
+               v = v.item()
+            m[ 'values' ][ k ] = v
+      manifest[ 'chroms' ][ c ] = m
+   header = json.dumps( manifest, sort_keys = True )
+   dataStart = wigStoreAligned( len( wigStoreMagic ) + 8 + len( header ))
+   f = open( filename, 'wb' )
+   f.write( wigStoreMagic )
+   f.write( struct.pack( '<Q', len( header )))
+   f.write( header )
+   for o, v in arrays:
+      f.write( '\0' * ( dataStart + o - f.tell() ))
+      f.write( v.tostring() )
+   f.close()
+
+def wigStoreAligned( n ):
+   return ( n + wigStoreAlign - 1 ) // wigStoreAlign * wigStoreAlign
+
+def isWigStore( filename ):
+   """ isWigStore returns True if filename starts with the wigStore magic.
+   """
+   f = open( filename, 'rb' )
+   magic = f.read( len( wigStoreMagic ))
+   f.close()
+   return magic == wigStoreMagic
+
+def readWigStoreManifest( filename ):
+   """ readWigStoreManifest reads and checks the manifest of a wigStore
+   file. The manifest gains a 'dataStart' entry, the file offset of the
+   first array.
+   """
+   import json
+   import struct
+   import sys
+   f = open( filename, 'rb' )
+   magic = f.read( len( wigStoreMagic ))
+   if magic != wigStoreMagic:
+      f.close()
+      sys.stderr.write( 'Error, %s is not a wigStore file.\n' % filename )
+      sys.exit(1)
+   n = struct.unpack( '<Q', f.read( 8 ))[0]
+   manifest = json.loads( f.read( n ))
+   f.close()
+   if manifest[ 'version' ] > wigStoreVersion:
+      sys.stderr.write( 'Error, %s is wigStore version %d, this code reads up '
+                        'to version %d.\n' % ( filename, manifest[ 'version' ],
+                                                wigStoreVersion ))
+      sys.exit(1)
+   manifest[ 'dataStart' ] = wigStoreAligned( len( wigStoreMagic ) + 8 + n )
+   return manifest
+
+def readWigStoreTrack( filename, manifest, c, k, mode='c' ):
+   """ readWigStoreTrack memory-maps a single array out of a wigStore file.
+   mode is passed to numpy.memmap, the default 'c' is copy-on-write so
+   callers may modify the result without touching the file. mode=None
+   reads the array into memory instead.
+   """
+   import numpy
+   a = manifest[ 'chroms' ][ c ][ 'arrays' ][ k ]
+   dtype = numpy.dtype( str( a[ 'dtype' ] ))
+   shape = tuple( a[ 'shape' ] )
+   offset = manifest[ 'dataStart' ] + a[ 'offset' ]
+   count = 1
+   for s in shape:
+      count *= s
+   if mode is None or count == 0:
+      f = open( filename, 'rb' )
+      f.seek( offset )
+      arr = numpy.fromfile( f, dtype = dtype, count = count ).reshape( shape )
+      f.close()
+      return arr
+   return numpy.memmap( filename, dtype = dtype, mode = mode,
+                        offset = offset, shape = shape )
+
+def unpackWigStore( filename ):
+   """ unpackWigStore reads a whole wigStore file back into the same
+   dict of dicts that was handed to packWigStore.
+   """
+   manifest = readWigStoreManifest( filename )
+   d = {}
+   for c in manifest[ 'chroms' ]:
+      m = manifest[ 'chroms' ][ c ]
+      c = str( c )
+      d[ c ] = {}
+      for k in m[ 'values' ]:
+         v = m[ 'values' ][ k ]
+         if isinstance( v, unicode ):
+            v = str( v )
+         d[ c ][ str( k ) ] = v
+      for k in m[ 'arrays' ]:
+         d[ c ][ str( k ) ] = readWigStoreTrack( filename, manifest, c, k, mode=None )
+   return d
+
 def unpackData( filename, options, data ):
-   """ unpackData unpacks a pickle object
+   """ unpackData unpacks a pickle object, or a wigStore file
+   written by packData( prot='wigStore' ).
    """
    import cPickle
    import os
+   import sys
    if not os.path.exists( filename ):
       sys.stderr.write( 'Error, %s does not exist.\n' % filename )
       sys.exit(1)
+   if isWigStore( filename ):
+      return unpackWigStore( filename )
    f = open( filename, 'rb' )
    d = cPickle.load( f )
    f.close()
    return d
 
+class MafWigStore:
+   """ a MafWigStore gives lazy access to a file written by packData().
+   Nothing is read until the store is first used. For a wigStore file
+   only the manifest is read up front and each track is memory-mapped
+   (copy-on-write) the first time it is asked for. A pickle has to be
+   read all at once, so it is unpacked on first use and each request
+   for a track returns a copy. In both cases a store can be shared by
+   many views that modify their tracks in place.
+   """
+   def __init__( self, filename ):
+      self.filename = filename
+      self.manifest = None
+      self.pickled = None
+   def open( self ):
+      if self.manifest is not None or self.pickled is not None:
+         return
+      if isWigStore( self.filename ):
+         self.manifest = readWigStoreManifest( self.filename )
+      else:
+         self.pickled = unpackData( self.filename, None, None )
+   def chroms( self ):
+      self.open()
+      if self.manifest is not None:
+         return [ str( c ) for c in self.manifest[ 'chroms' ] ]
+      return self.pickled.keys()
+   def chrom( self, c ):
+      return MafWigTracks( self, c )
+   def keys( self, c ):
+      self.open()
+      if self.manifest is not None:
+         m = self.manifest[ 'chroms' ][ c ]
+         return [ str( k ) for k in m[ 'arrays' ].keys() + m[ 'values' ].keys() ]
+      return self.pickled[ c ].keys()
+   def value( self, c, k ):
+      import numpy
+      self.open()
+      if self.manifest is not None:
+         m = self.manifest[ 'chroms' ][ c ]
+         if k in m[ 'arrays' ]:
+            return readWigStoreTrack( self.filename, self.manifest, c, k )
+         return m[ 'values' ][ k ]
+      v = self.pickled[ c ][ k ]
+      if isinstance( v, numpy.ndarray ):
+         return v.copy()
+      return v
+   def trackSum( self, c, k ):
+      """ the sum of track k as stored in the file.
+      """
+      self.open()
+      if self.manifest is not None:
+         return self.manifest[ 'chroms' ][ c ][ 'sums' ][ k ]
+      return sum( self.pickled[ c ][ k ] )
+
+class MafWigTracks:
+   """ MafWigTracks is the per chromosome view of a MafWigStore. It can
+   be used in place of the dict that unpackData() returns for a 
+   chromosome: values are loaded on first access and kept, and
+   assignments replace the loaded value.
+   """
+   def __init__( self, store, c ):
+      self.store = store
+      self.chrom = c
+      self.loaded = {}
+   def __getitem__( self, k ):
+      if k not in self.loaded:
+         self.loaded[ k ] = self.store.value( self.chrom, k )
+      return self.loaded[ k ]
+   def __setitem__( self, k, v ):
+      self.loaded[ k ] = v
+   def __contains__( self, k ):
+      return k in self.loaded or k in self.store.keys( self.chrom )
+   def keys( self ):
+      return self.store.keys( self.chrom )
+   def sum( self, k ):
+      """ sum of track k as stored in the file, this does not read the
+      track from a wigStore file and does not see later modifications.
+      """
+      return self.store.trackSum( self.chrom, k )
+
+mafSummaryIndexName = 'mafPickleSummary.json'
+mafSummaryVersion = 1
+
+def mafSummaryTrackKeys():
+   """ the tracks whose sums are kept in the summary index, the coverage
+   track and every length threshold track of every stack fill.
+   """
+   keys = [ 'maf' ]
+   for base in [ 'maf', 'mafCpl', 'mafCtg', 'mafSpl' ]:
+      for i in xrange( 2, 8 ):
+         keys.append( base + '1e%d' % i )
+   return keys
+
+def summarizeMafStore( store ):
+   """ summarizeMafStore returns the summary index entry for the file
+   behind a MafWigStore: the file's mtime and size and, per chromosome,
+   columnsInBlocks and the sums of the tracks in mafSummaryTrackKeys().
+   """
+   import os
+   st = os.stat( store.filename )
+   chroms = {}
+   for c in store.chroms():
+      keys = set( store.keys( c ))
+      sums = {}
+      for k in mafSummaryTrackKeys():
+         if k in keys:
+            sums[ k ] = store.trackSum( c, k )
+      chroms[ c ] = { 'columnsInBlocks' : store.value( c, 'columnsInBlocks' ),
+                      'sums' : sums }
+   return { 'mtime' : st.st_mtime, 'size' : st.st_size, 'chroms' : chroms }
+
+def readMafSummaryIndex( mafDir ):
+   """ returns the summary index of mafDir, a dict keyed on pickle
+   basename, or an empty dict if there is no usable index. The index is
+   read under a shared lock so that it is never seen half written.
+   """
+   import fcntl
+   import os
+   p = os.path.join( mafDir, mafSummaryIndexName )
+   if not os.path.exists( p ):
+      return {}
+   f = open( p )
+   fcntl.flock( f, fcntl.LOCK_SH )
+   try:
+      index = parseMafSummaryIndex( f )
+   finally:
+      fcntl.flock( f, fcntl.LOCK_UN )
+      f.close()
+   return index
+
+def parseMafSummaryIndex( f ):
+   """ returns the summary index read from the open file f, or an empty
+   dict if f is empty or does not hold a usable index.
+   """
+   import json
+   try:
+      index = json.load( f )
+   except ValueError:
+      return {}
+   if index.get( 'version' ) != mafSummaryVersion:
+      return {}
+   return index[ 'pickles' ]
+
+def updateMafSummaryIndex( mafDir, stores ):
+   """ updateMafSummaryIndex brings the entries for the MafWigStores in
+   stores up to date, summarizing only the pickles that are new or
+   whose mtime or size has changed, drops entries for pickles that no
+   longer exist and returns the index. updateMafPickleSummary.py calls
+   this once a pickle has been moved into place, so the index, 
+   mafPickleSummary.json, is only written by the pickle rules. The 
+   index file itself is locked while it is read and rewritten, as 
+   several pickles of one directory may be made at once. If the index
+   cannot be written it is brought up to date in memory only.
+   """
+   import fcntl
+   import json
+   import os
+   p = os.path.join( mafDir, mafSummaryIndexName )
+   if os.path.exists( p ):
+      writable = os.access( p, os.W_OK )
+   else:
+      writable = os.access( mafDir, os.W_OK )
+   if not writable:
+      index = readMafSummaryIndex( mafDir )
+      refreshMafSummaryIndex( index, mafDir, stores )
+      return index
+   f = open( p, 'a+' )
+   fcntl.flock( f, fcntl.LOCK_EX )
+   try:
+      f.seek( 0 )
+      index = parseMafSummaryIndex( f )
+      if refreshMafSummaryIndex( index, mafDir, stores ):
+         f.seek( 0 )
+         f.truncate()
+         json.dump( { 'version' : mafSummaryVersion, 'pickles' : index }, f, 
+                    default=mafSummaryEncoderDefault, sort_keys=True )
+         f.flush()
+   finally:
+      fcntl.flock( f, fcntl.LOCK_UN )
+      f.close()
+   return index
+
+def refreshMafSummaryIndex( index, mafDir, stores ):
+   """ updates index in place for updateMafSummaryIndex(), returns True
+   if anything changed. Readers of the index call this on their own to
+   catch pickles the index has not caught up with, without writing it.
+   """
+   import os
+   changed = False
+   for name in index.keys():
+      if not os.path.exists( os.path.join( mafDir, name )):
+         del index[ name ]
+         changed = True
+   for s in stores:
+      name = os.path.basename( s.filename )
+      st = os.stat( s.filename )
+      e = index.get( name )
+      if e is not None and e[ 'mtime' ] == st.st_mtime and e[ 'size' ] == st.st_size:
+         continue
+      index[ name ] = summarizeMafStore( s )
+      changed = True
+   return changed
+
+def mafSummaryEncoderDefault( o ):
+   """ numpy scalars (the sums of pickled tracks) are written as
+   python ints and floats.
+   """
+   if hasattr( o, 'item' ):
+      return o.item()
+   raise TypeError( repr( o ) + ' is not JSON serializable' )
+
+class MafSummaryTracks:
+   """ MafSummaryTracks is the per chromosome view of a summary index
+   entry. It answers the columnsInBlocks and track sum questions that
+   are asked of a MafWigTracks without opening the pickle.
+   """
+   def __init__( self, entry ):
+      self.entry = entry
+   def __getitem__( self, k ):
+      return self.entry[ k ]
+   def __contains__( self, k ):
+      return k in self.entry[ 'sums' ]
+   def sum( self, k ):
+      return self.entry[ 'sums' ][ k ]
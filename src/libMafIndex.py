@@ -0,0 +1,160 @@
+# libMafIndex.py
+# a library for the byte offset sidecar index of maf files
+#
+# The index records, for every maf block, where the block starts in the
+# file, how many bytes it takes up and the genome, chromosome and
+# positive strand interval, [start, end] 1-based, of each of its 's'
+# lines. It is built once per maf and rebuilt automatically if the maf's
+# size or modification time changes. Scripts that only need the blocks
+# of one reference genome can then seek straight to them.
+#
+# Index file format, tab separated:
+# #mafIndex version=1 size=<maf bytes> mtime=<maf mtime>
+# offset  length  genome  chr  start  end
+#
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+indexVersion = 1
+
+def initOptions( parser ):
+   parser.add_option( '--mafIndex', dest='mafIndex', default=False,
+                      action='store_true',
+                      help=('Read the maf through its byte offset index, building the index '
+                            'first if it is missing or out of date. default=%default' ))
+   parser.add_option( '--mafIndexFile', dest='mafIndexFile',
+                      type='string',
+                      help=('Location of the maf index. default=MAF.idx' ))
+
+def checkOptions( options, parser ):
+   if options.mafIndexFile is not None:
+      options.mafIndex = True
+   if options.mafIndex and options.mafIndexFile is None:
+      options.mafIndexFile = options.maf + '.idx'
+
+def indexHeader( maf ):
+   """ the first line of an index that is current for the file maf.
+   """
+   import os
+   st = os.stat( maf )
+   return '#mafIndex version=%d size=%d mtime=%d\n' % ( indexVersion, st.st_size, int( st.st_mtime ))
+
+def indexIsCurrent( maf, indexFile ):
+   import os
+   if not os.path.exists( indexFile ):
+      return False
+   f = open( indexFile, 'r' )
+   header = f.readline()
+   f.close()
+   return header == indexHeader( maf )
+
+def buildIndex( maf, indexFile ):
+   """ scan maf once and write its index to indexFile. A block is
+   a paragraph of lines between blank lines, so the comment lines that
+   belong to a block (e.g. #HPL) are part of its byte range. The index 
+   is written to a temporary file and moved into place so that several
+   processes can share one maf.
+   """
+   import libGeneral as lgn
+   import os
+   import tempfile
+   header = indexHeader( maf )
+   fd, tmp = tempfile.mkstemp( prefix=os.path.basename( indexFile ) + '.', 
+                               dir=os.path.dirname( os.path.abspath( indexFile )))
+   out = os.fdopen( fd, 'w' )
+   out.write( header )
+   f = open( maf, 'rb' )
+   offset = 0
+   blockStart = None
+   rows = []
+   for line in f:
+      if line.strip() == '':
+         if blockStart is not None:
+            writeBlockRows( out, blockStart, offset - blockStart, rows )
+         blockStart = None
+         rows = []
+      else:
+         if blockStart is None:
+            blockStart = offset
+         if line.startswith('s'):
+            rows.append( lineInterval( line ))
+      offset += len( line )
+   if blockStart is not None:
+      writeBlockRows( out, blockStart, offset - blockStart, rows )
+   f.close()
+   out.close()
+   lgn.setDefaultFileMode( tmp )
+   os.rename( tmp, indexFile )
+
+def writeBlockRows( out, offset, length, rows ):
+   for genome, chrom, start, end in rows:
+      out.write( '%d\t%d\t%s\t%s\t%d\t%d\n' % ( offset, length, genome, chrom, start, end ))
+
+def lineInterval( line ):
+   """ returns the genome, chromosome and positive strand interval,
+   1-based, of a maf 's' line.
+   """
+   d = line.split( None, 6 )
+   genome, chrom = d[1].split( '.', 1 )
+   start  = int( d[2] )
+   length = int( d[3] )
+   total  = int( d[5] )
+   if d[4] == '-':
+      start = total - start - length
+   return ( genome, chrom, start + 1, start + length )
+
+def readIndex( indexFile, genome, chroms ):
+   """ returns a sorted list of ( offset, length ) pairs of all blocks
+   containing genome on one of the chromosomes in chroms.
+   """
+   f = open( indexFile, 'r' )
+   f.readline()
+   spans = set()
+   for line in f:
+      d = line.split('\t')
+      if d[2] == genome and d[3] in chroms:
+         spans.add(( int( d[0] ), int( d[1] )))
+   f.close()
+   return sorted( spans )
+
+def indexedLines( options, genome, chroms ):
+   """ yields the lines of every block in options.maf that contains 
+   genome on one of chroms, in file order. Each block is followed by
+   a blank line so that it ends the same way it does in the file.
+   Builds the index first if need be.
+   """
+   import sys
+   if not indexIsCurrent( options.maf, options.mafIndexFile ):
+      sys.stderr.write( 'Building maf index %s\n' % options.mafIndexFile )
+      buildIndex( options.maf, options.mafIndexFile )
+   spans = readIndex( options.mafIndexFile, genome, set( chroms ))
+   f = open( options.maf, 'rb' )
+   for offset, length in spans:
+      f.seek( offset )
+      for line in f.read( length ).splitlines( True ):
+         yield line
+      yield '\n'
+   f.close()
@@ -0,0 +1,102 @@
+# libMafValidation.py
+# a library of checks on the binned wiggles made from maf files
+#
+# Each check takes one chromosome's mafWigDict, stacks the tracks it
+# looks at into a single 2-D array and tests all of them at once. The
+# checks return a description of the first failure, or None, and leave
+# reporting and exiting to the caller.
+#
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+stackTracks = { 'blocks' : [ 'maf', 'maf1e2', 'maf1e3', 'maf1e4',
+                             'maf1e5', 'maf1e6', 'maf1e7' ],
+                'paths'  : [ 'maf', 'mafCpl1e2', 'mafCpl1e3', 'mafCpl1e4',
+                             'mafCpl1e5', 'mafCpl1e6', 'mafCpl1e7' ],
+                'contigs': [ 'maf', 'mafCtg1e2', 'mafCtg1e3', 'mafCtg1e4',
+                             'mafCtg1e5', 'mafCtg1e6', 'mafCtg1e7' ],
+                'scaffolds':[ 'maf', 'mafSpl1e2', 'mafSpl1e3', 'mafSpl1e4',
+                              'mafSpl1e5', 'mafSpl1e6', 'mafSpl1e7' ] }
+stackOrder = [ 'blocks', 'paths', 'contigs', 'scaffolds' ]
+coverageTracks = [ 'maf', 'maf1e2', 'maf1e3', 'maf1e4',
+                   'maf1e5', 'maf1e6', 'maf1e7', 'mafCpl1e2', 
+                   'mafCpl1e3', 'mafCpl1e4', 'mafCpl1e5', 
+                   'mafCpl1e6', 'mafCpl1e7', 'mafCtg1e2', 
+                   'mafCtg1e3', 'mafCtg1e4', 'mafCtg1e5', 
+                   'mafCtg1e6', 'mafCtg1e7', 'mafSpl1e2', 
+                   'mafSpl1e3', 'mafSpl1e4', 'mafSpl1e5', 
+                   'mafSpl1e6', 'mafSpl1e7' ]
+
+def trackMatrix( wig, keys ):
+   """ returns the tracks keys of wig as the rows of one 2-D array.
+   """
+   import numpy
+   return numpy.vstack( [ wig[ k ] for k in keys ] )
+
+def checkStack( wig, keys ):
+   """ the tracks keys of wig must be a proper stack, no track may be
+   larger than the one before it in any bin. Returns None or the pair
+   ( lower, upper ) of the first two tracks where upper is larger.
+   """
+   import numpy
+   m = trackMatrix( wig, keys )
+   bad = numpy.flatnonzero(( m[ :-1 ] < m[ 1: ] ).any( axis=1 ))
+   if len( bad ):
+      return ( keys[ bad[ 0 ]], keys[ bad[ 0 ] + 1 ] )
+   return None
+
+def checkStacks( wig ):
+   """ runs checkStack() on every stack of stackTracks. Returns None or
+   ( stack, lower, upper ) for the first stack that fails.
+   """
+   for t in stackOrder:
+      bad = checkStack( wig, stackTracks[ t ] )
+      if bad is not None:
+         return ( t, bad[ 0 ], bad[ 1 ] )
+   return None
+
+def checkCeiling( wig, keys, ceiling ):
+   """ no element of the tracks keys of wig may be greater than ceiling.
+   Returns None or ( key, i ) for the first track that has one and the
+   index of its first element over the ceiling.
+   """
+   import numpy
+   m = trackMatrix( wig, keys )
+   over = m > ceiling
+   bad = numpy.flatnonzero( over.any( axis=1 ))
+   if len( bad ):
+      r = bad[ 0 ]
+      return ( keys[ r ], int( numpy.flatnonzero( over[ r ] )[ 0 ] ))
+   return None
+
+def checkElements( wig ):
+   """ the normalized coverage tracks of wig must all be <= 1.0.
+   Returns None or the name of the first track that is not.
+   """
+   bad = checkCeiling( wig, coverageTracks, 1.0 )
+   if bad is not None:
+      return bad[ 0 ]
+   return None
@@ -0,0 +1,149 @@
+# libStatsDb.py
+# a library for the sqlite stats database built by importCactusResult.py
+#
+# Every numeric attribute of every imported stats xml is stored as one
+# row of the stats table, and every whitespace separated list of numbers
+# (e.g. insertionErrorSizeDistribution) as one row per entry of the
+# distributions table. Rows are indexed on assembly, alignment type
+# (scaffold or contig) and haplotype (0 when not haplotype specific).
+#
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+import re
+
+schema = [ ( 'CREATE TABLE IF NOT EXISTS stats ( assembly TEXT, alignment TEXT, '
+             'haplotype INTEGER, source TEXT, element TEXT, elementIndex INTEGER, '
+             'label TEXT, attribute TEXT, value REAL )' ),
+           ( 'CREATE TABLE IF NOT EXISTS distributions ( assembly TEXT, alignment TEXT, '
+             'haplotype INTEGER, source TEXT, element TEXT, elementIndex INTEGER, '
+             'label TEXT, attribute TEXT, position INTEGER, value REAL )' ),
+           ( 'CREATE INDEX IF NOT EXISTS statsIndex ON stats '
+             '( assembly, alignment, haplotype, source )' ),
+           ( 'CREATE INDEX IF NOT EXISTS distributionsIndex ON distributions '
+             '( assembly, alignment, haplotype, source )' ) ]
+hapPat = re.compile( r'hap(\d+)' )
+
+def openStatsDb( filename ):
+   """ opens (creating if need be) the stats database at filename
+   and returns the connection.
+   """
+   import sqlite3
+   db = sqlite3.connect( filename )
+   for s in schema:
+      db.execute( s )
+   db.commit()
+   return db
+
+def parseNumber( s ):
+   try:
+      return float( s )
+   except ValueError:
+      return None
+
+def parseNumbers( s ):
+   """ returns a list of floats if s is a whitespace separated list
+   of two or more numbers, None otherwise.
+   """
+   values = s.split()
+   if len( values ) < 2:
+      return None
+   values = [ parseNumber( v ) for v in values ]
+   if None in values:
+      return None
+   return values
+
+def elementRows( attrib ):
+   """ splits the attributes of one element into the label (the non
+   numeric attributes, sorted, as key=value pairs), the numeric
+   attributes and the distributions.
+   """
+   labels = []
+   numbers = []
+   distributions = []
+   for k in sorted( attrib ):
+      v = parseNumber( attrib[ k ] )
+      if v is not None:
+         numbers.append( ( k, v ))
+         continue
+      vs = parseNumbers( attrib[ k ] )
+      if vs is not None:
+         distributions.append( ( k, vs ))
+         continue
+      labels.append( '%s=%s' % ( k, attrib[ k ] ))
+   return ( ' '.join( labels ), numbers, distributions )
+
+def importStatsXml( db, filename, assembly, alignment, source, haplotype=0 ):
+   """ importStatsXml loads the root and root children attributes of the
+   stats xml filename into db, replacing any rows already present for
+   ( assembly, alignment, source ). The root element has elementIndex 0,
+   its children 1, 2, ... in document order. A child whose label names a
+   haplotype (e.g. a featureFile in .../hap2/...) is stored under that
+   haplotype. Returns False if the xml is broken, True otherwise.
+   """
+   import libStatsXml as lsx
+   record = lsx.parseStatsXml( filename )
+   db.execute( 'DELETE FROM stats WHERE assembly=? AND alignment=? AND source=?',
+               ( assembly, alignment, source ))
+   db.execute( 'DELETE FROM distributions WHERE assembly=? AND alignment=? AND source=?',
+               ( assembly, alignment, source ))
+   if record is None:
+      return False
+   elements = [ ( record.tag, record.attrib ) ] + record.children
+   for i, ( tag, attrib ) in enumerate( elements ):
+      label, numbers, distributions = elementRows( attrib )
+      hap = haplotype
+      m = re.search( hapPat, label )
+      if i > 0 and m is not None:
+         hap = int( m.group( 1 ))
+      key = ( assembly, alignment, hap, source, tag, i, label )
+      db.executemany( 'INSERT INTO stats VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ? )',
+                      [ key + n for n in numbers ] )
+      for k, vs in distributions:
+         db.executemany( 'INSERT INTO distributions VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ?, ? )',
+                         [ key + ( k, j, v ) for j, v in enumerate( vs ) ] )
+   db.commit()
+   return True
+
+def rootValues( db, alignment, source, haplotype=0 ):
+   """ returns a dict keyed on assembly of dicts keyed on attribute
+   holding the numeric root attributes of source, i.e. what the table
+   and plot scripts read from root.attrib.
+   """
+   result = {}
+   for a, k, v in db.execute( 'SELECT assembly, attribute, value FROM stats WHERE '
+                              'alignment=? AND source=? AND haplotype=? AND elementIndex=0',
+                              ( alignment, source, haplotype )):
+      result.setdefault( a, {} )[ k ] = v
+   return result
+
+def distribution( db, assembly, alignment, source, attribute, haplotype=0 ):
+   """ returns the list of values of a root distribution attribute.
+   """
+   return [ v for ( v, ) in db.execute( 'SELECT value FROM distributions WHERE assembly=? AND '
+                                        'alignment=? AND source=? AND haplotype=? AND '
+                                        'elementIndex=0 AND attribute=? ORDER BY position',
+                                        ( assembly, alignment, source, haplotype, attribute )) ]
@@ -0,0 +1,226 @@
+# libStatsXml.py
+# a library for reading the stats xml files produced by Cactus
+# (pathStats, subStats, copyNumber, contiguity, feature overlap ...)
+#
+# Each xml is parsed once into a StatsXml record that holds the root
+# tag and attributes and the tag and attributes of each child of the
+# root, which is everything the report scripts use. Records are kept in
+# memory for the life of the process and, with --statsXmlCache, on disk
+# keyed by the xml's path, modification time and size, so a file is only
+# parsed again after it changes.
+# Attribute values are kept as the strings found in the xml, each
+# script still converts them the way it always has.
+#
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+
+cacheVersion = 2
+parsedRecords = {} # keyed on ( path, mtime, size, tags ), values are StatsXml or None
+
+class StatsXml:
+   """ a StatsXml object holds the parts of a stats xml file that
+   are used by the report scripts: the root element's tag and
+   attributes and, in document order, the tag and attributes of
+   each child of the root.
+   """
+   def __init__( self ):
+      self.tag = ''
+      self.attrib = {}
+      self.children = [] # list of ( tag, attrib dict ) tuples
+   def find( self, tag ):
+      """ returns the attributes of the first child with tag, or None.
+      """
+      for t, a in self.children:
+         if t == tag:
+            return a
+      return None
+   def findall( self, tag ):
+      """ returns a list of the attributes of every child with tag.
+      """
+      return [ a for t, a in self.children if t == tag ]
+
+def initOptions( parser ):
+   parser.add_option( '--statsXmlCache', dest='statsXmlCache',
+                      type='string',
+                      help=( 'Directory where parsed stats xml files are cached. Entries are '
+                             'keyed on the path, modification time and size of the xml.' ))
+   parser.add_option( '--jobs', dest='jobs', default=1,
+                      type='int',
+                      help=( 'Number of worker processes used to parse the stats xml '
+                             'files. default=%default' ))
+
+def checkOptions( options, parser ):
+   import os
+   if options.jobs < 1:
+      parser.error( '--jobs must be at least 1, not %d.\n' % options.jobs )
+   if options.statsXmlCache is None:
+      return
+   if os.path.exists( options.statsXmlCache ) and not os.path.isdir( options.statsXmlCache ):
+      parser.error( '--statsXmlCache %s is not a directory.\n' % options.statsXmlCache )
+   if not os.path.exists( options.statsXmlCache ):
+      os.makedirs( options.statsXmlCache )
+
+def recordKey( filename, tags ):
+   import os
+   path = os.path.abspath( filename )
+   st = os.stat( path )
+   if tags is not None:
+      tags = tuple( sorted( set( tags )))
+   return ( path, st.st_mtime, st.st_size, tags )
+
+def statsXmlCacheDir( options ):
+   if options is None:
+      return None
+   return getattr( options, 'statsXmlCache', None )
+
+def readStatsXml( filename, options, tags=None ):
+   """ readStatsXml returns the StatsXml record for filename, or None if
+   the file is not well formed xml (e.g. an empty file). tags, if not None,
+   is a sequence of the child tags to keep, all other children are skipped
+   while streaming through the file. options may be None, otherwise
+   options.statsXmlCache, if set, is used as the on disk cache. filename
+   is recorded as an input of this run in libBuildManifest.
+   """
+   import libBuildManifest as lbm
+   lbm.addInput( filename )
+   return readStatsXmls( [ filename ], options, tags )[ 0 ]
+
+def readStatsXmls( filenames, options, tags=None ):
+   """ readStatsXmls returns a list of the StatsXml records (or None) for
+   filenames, in order. Files that are not already cached are parsed across
+   options.jobs worker processes. The records are stored in the in
+   memory cache, so directory readers call this once on their globbed
+   files and the readStatsXml calls that follow return without parsing.
+   """
+   keys = [ recordKey( f, tags ) for f in filenames ]
+   cacheDir = statsXmlCacheDir( options )
+   todo = []
+   for key in keys:
+      if key in parsedRecords or key in todo:
+         continue
+      if cacheDir is not None:
+         found, record = readCacheEntry( cacheDir, key )
+         if found:
+            parsedRecords[ key ] = record
+            continue
+      todo.append( key )
+   jobs = 1
+   if options is not None:
+      jobs = getattr( options, 'jobs', 1 )
+   if jobs > 1 and len( todo ) > 1:
+      import multiprocessing
+      pool = multiprocessing.Pool( processes=min( jobs, len( todo )))
+      records = pool.map( parseStatsXmlJob, [ ( k[0], k[3] ) for k in todo ] )
+      pool.close()
+      pool.join()
+   else:
+      records = [ parseStatsXml( k[0], k[3] ) for k in todo ]
+   for key, record in zip( todo, records ):
+      if cacheDir is not None:
+         writeCacheEntry( cacheDir, key, record )
+      parsedRecords[ key ] = record
+   return [ parsedRecords[ k ] for k in keys ]
+
+def parseStatsXmlJob( job ):
+   """ pool worker, job is a ( filename, tags ) tuple.
+   """
+   return parseStatsXml( job[0], job[1] )
+
+def parseStatsXml( filename, tags=None ):
+   """ parseStatsXml streams through filename and returns a StatsXml
+   record, or None if the file is not well formed. Only the root and
+   its children are looked at, and each child is cleared as soon as
+   its attributes are copied so the full tree is never held in memory.
+   """
+   import xml.etree.ElementTree as ET
+   import xml.parsers.expat as expat # exception handling for empty xml
+   record = StatsXml()
+   depth = 0
+   root = None
+   f = open( filename, 'rb' )
+   try:
+      for event, elm in ET.iterparse( f, events=( 'start', 'end' )):
+         if event == 'start':
+            depth += 1
+            if depth == 1:
+               root = elm
+               record.tag = elm.tag
+               record.attrib = dict( elm.attrib )
+            continue
+         depth -= 1
+         if depth == 1:
+            if tags is None or elm.tag in tags:
+               record.children.append( ( elm.tag, dict( elm.attrib )))
+            root.clear()
+   except ( expat.ExpatError, ET.ParseError ): # broken xml file
+      return None
+   finally:
+      f.close()
+   return record
+
+def cacheEntryPath( cacheDir, key ):
+   import hashlib
+   import os
+   return os.path.join( cacheDir, hashlib.md5( repr( ( key[0], key[3] ))).hexdigest() + '.pickle' )
+
+def readCacheEntry( cacheDir, key ):
+   """ returns ( True, record ) if the cache holds an entry for key,
+   ( False, None ) otherwise.
+   """
+   import cPickle
+   import os
+   p = cacheEntryPath( cacheDir, key )
+   if not os.path.exists( p ):
+      return ( False, None )
+   f = open( p, 'rb' )
+   try:
+      entry = cPickle.load( f )
+   except ( EOFError, cPickle.UnpicklingError ):
+      f.close()
+      return ( False, None )
+   f.close()
+   if entry[ 'version' ] != cacheVersion or entry[ 'key' ] != key:
+      return ( False, None )
+   return ( True, entry[ 'record' ] )
+
+def writeCacheEntry( cacheDir, key, record ):
+   """ the entry is written to a temporary file and renamed into place
+   so that concurrent jobs never see half an entry.
+   """
+   import cPickle
+   import libGeneral as lgn
+   import os
+   import tempfile
+   p = cacheEntryPath( cacheDir, key )
+   fd, tmp = tempfile.mkstemp( dir=cacheDir, suffix='.tmp' )
+   f = os.fdopen( fd, 'wb' )
+   cPickle.dump( { 'version' : cacheVersion,
+                   'key'     : key,
+                   'record'  : record }, f, 2 )
+   f.close()
+   lgn.setDefaultFileMode( tmp )
+   os.rename( tmp, p )
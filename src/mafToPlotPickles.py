@@ -15,6 +15,11 @@ the reference genome. Maf files whose '--reference'
 genome contain multiple chromosomes are split into
 a single pickle per chromosome.
 
+With --streaming the maf blocks are binned as they
+are read instead of being stored for the whole file,
+so memory use depends on the number of bins and on
+--streamWindow rather than on the size of the maf.
+
 """
 ##############################
 # Copyright (C) 2009-2011 by 
@@ -43,19 +48,31 @@ a single pickle per chromosome.
 # THE SOFTWARE.
 ##############################
 import cPickle
+import heapq
 from libMafGffPlot import Data
 from libMafGffPlot import MafBlock
+from libMafGffPlot import MafBlockTable
 from libMafGffPlot import MafLine
 from libMafGffPlot import newMafWigDict
 from libMafGffPlot import objListToBinnedWiggle
+from libMafGffPlot import objListUtility_addPyramid
+from libMafGffPlot import objListUtility_binMafBlockTable
+from libMafGffPlot import objListUtility_buildPyramid
+from libMafGffPlot import objListUtility_isPyramidKey
+from libMafGffPlot import objListUtility_normalizeCategories
 from libMafGffPlot import objListUtility_xAxis
 from libMafGffPlot import packData
+import libMafIndex as lmi
+import libMafValidation as lmv
 import math
+import multiprocessing
 import numpy
 from optparse import OptionParser
 import os
+import shutil
 import sys
 import re
+import tempfile
 
 def initOptions( parser ):
    parser.add_option( '-a', '--referenceGenome', dest='ref',
@@ -85,6 +102,34 @@ def initOptions( parser ):
                       action='store_true',
                       help=('Enables extra checks to verify the data structure is accurate. '
                             'Not necessary unless the output plots look odd. default=%default' ))
+   parser.add_option( '--skipSequences', dest='skipSequences', default=False,
+                      action='store_true',
+                      help=('Only measure the sequence field of maf lines, never copy it. '
+                            'The sequences themselves are not used. default=%default' ))
+   parser.add_option( '--jobs', dest='jobs', default=1,
+                      type='int',
+                      help=('Number of processes used to sort, trim and bin the chromosomes '
+                            'once the maf has been read. default=%default' ))
+   parser.add_option( '--streaming', dest='streaming', default=False,
+                      action='store_true',
+                      help=('Bin maf blocks as they are read instead of storing every block '
+                            'in memory. Blocks on a chromosome must appear in reference order, '
+                            'give or take --streamWindow blocks. default=%default' ))
+   parser.add_option( '--streamWindow', dest='streamWindow', default=10000,
+                      type='int',
+                      help=('Number of blocks per chromosome held back in --streaming mode to '
+                            'restore reference order before binning. default=%default' ))
+   parser.add_option( '--storeFormat', dest='storeFormat', default='pickle',
+                      type='choice', choices=[ 'pickle', 'wigStore' ],
+                      help=('Format of the output file. wigStore is a binary store whose '
+                            'tracks can be memory-mapped one at a time, it is read by '
+                            'unpackData() just like a pickle. default=%default' ))
+   parser.add_option( '--pyramidBinSize', dest='pyramidBinSize', default=0,
+                      type='int',
+                      help=('Also store a coverage pyramid whose finest level has bins of about '
+                            'this many bases, from which plotPicklesToPlot.py can draw any '
+                            'number of bins or a zoomed region without re-reading the maf. '
+                            '0 for no pyramid. default=%default' ))
 
 def checkOptions( options, parser, data ):
    if options.maf is None:
@@ -105,6 +150,14 @@ def checkOptions( options, parser, data ):
                         options.other : True }
    if options.numBins < 1:
       parser.error('number of bins (%d) must be >= 1.' % options.numBins )
+   if options.pyramidBinSize < 0:
+      parser.error('--pyramidBinSize (%d) must be >= 0.' % options.pyramidBinSize )
+   if options.streamWindow < 1:
+      parser.error('--streamWindow (%d) must be >= 1.' % options.streamWindow )
+   if options.jobs < 1:
+      parser.error('--jobs (%d) must be >= 1.' % options.jobs )
+   if options.jobs > 1 and options.streaming:
+      parser.error('specify either --jobs or --streaming not both.\n')
    opts = { 'chrLengths' : options.chrLengths,
             'chrNames'   : options.chrNames }
    for a in opts:
@@ -135,8 +188,13 @@ def checkOptions( options, parser, data ):
 def extractMafLine( line, order, pat, options, data ):
    """ parse a given line from a maf file into a 
    MafLine object.
+   pat only matches the six header fields of the line, the sequence 
+   field is never run through a regex or walked in python, it is
+   measured from the end of the header match and searched for gaps
+   with str.find(). With --skipSequences it is not copied either and
+   ml.sequence is left empty.
    """
-   m = re.match( pat, line )
+   m = pat.match( line )
    if m is None:
       return ( None, order )
    ml = MafLine()
@@ -150,7 +208,7 @@ def extractMafLine( line, order, pat, options, data ):
    if ml.genome == options.ref:
       if ml.chr not in data.chroms:
          data.chroms[ ml.chr ] = True
-         data.mafBlocksByChrom[ ml.chr ] = []
+         data.mafBlocksByChrom[ ml.chr ] = MafBlockTable()
 
    ml.start  = int( m.group( 3 ) )
    ml.length = int( m.group( 4 ) )
@@ -161,14 +219,19 @@ def extractMafLine( line, order, pat, options, data ):
          sys.stderr.write( 'file %s: maf block on chromosome "%s" has sequence length (%d) '
                            'that does not equal the corresponding input from --chrLengths (%d). '
                            'Line below:\n%s\n' % ( options.maf, ml.chr, ml.totalLength,
-                                                   data.chrLengthsByChrom[ ml.chr ], line ))
-         sys.exit( 1 )
-   ml.sequence = m.group( 7 )
-   for b in ml.sequence:
-      if b == '-':
-         sys.stderr.write( 'file %s: maf line contains \'-\' character. Mafs are assumed '
-                           'to be gapless. Bad line:\n%s\n' % ( options.maf, line ) )
+                                                   data.chrLengthsByChrom[ ml.chr ], line.rstrip() ))
          sys.exit( 1 )
+   seqStart = m.end()
+   seqEnd = len( line )
+   while seqEnd > seqStart and line[ seqEnd - 1 ].isspace():
+      seqEnd -= 1
+   ml.sequenceLength = seqEnd - seqStart
+   if not options.skipSequences:
+      ml.sequence = line[ seqStart:seqEnd ]
+   if line.find( '-', seqStart, seqEnd ) != -1:
+      sys.stderr.write( 'file %s: maf line contains \'-\' character. Mafs are assumed '
+                        'to be gapless. Bad line:\n%s\n' % ( options.maf, line.rstrip() ) )
+      sys.exit( 1 )
    return ( ml, order )
 
 def createMafBlockFromPair( iLine, jLine, hplList, options, data ):
@@ -229,7 +292,10 @@ def createMafBlockFromPair( iLine, jLine, hplList, options, data ):
       sys.stderr.write( 'creating mafBlock but pair start is greater than total length! %d > %d %s\n' 
                         % ( mb.pairStart, mb.pairTotalLength, mb.pairChr ))
       sys.exit(1)
-   data.mafBlocksByChrom[ mb.refChr ].append( mb )
+   if options.streaming:
+      streamMafBlock( mb, options, data )
+   else:
+      data.mafBlocksByChrom[ mb.refChr ].append( mb )
 
 def extractBlockPairs( mafLineList, hplList, options, data ):
    """ loop through all pairs in the block list, store
@@ -250,10 +316,20 @@ def readMaf( options, data ):
    """ read the maf, populate the mafLineList, then
    eventually things get stuffed in data.mafBlocksByChrom
    by way of extractBlockPairs() -> createMafBlockFromPair()
+   With --mafIndex only the blocks containing the reference 
+   are read.
    """
-   regex = 's\s+([\w\d\-]+?)\.([\w\d\.\+\-]+?)\s+(\d+)\s+(\d+)\s+([-+])\s+(\d+)\s+([\-actgurykmswbdhvnACTGURYKMSWBDHVN]+)'
+   if options.mafIndex:
+      mf = lmi.indexedLines( options, options.ref, data.chrNames )
+   else:
+      mf = open( options.maf )
+   readMafLines( mf, options, data )
+
+def readMafLines( mf, options, data ):
+   """ the parser behind readMaf(), mf is an iterable of lines.
+   """
+   regex = 's\s+([\w\d\-]+?)\.([\w\d\.\+\-]+?)\s+(\d+)\s+(\d+)\s+([-+])\s+(\d+)\s+(?=\S)'
    pat = re.compile( regex )
-   mf = open( options.maf )
    mafLineList = []
    order = -1
    hplList = []
@@ -274,19 +350,18 @@ def readMaf( options, data ):
                            'hThree': hThree, 'spl': spl } )
          continue
       if line.startswith('s'):
-         line = line.strip()
          ml, order = extractMafLine( line, order, pat, options, data )
          if ml is None:
             sys.stderr.write( 'regexp fail on file %s line: \'%s\'\n'
-                              'Regex: \'%s\'\n' % ( options.maf, line, regex ) )
+                              'Regex: \'%s\'\n' % ( options.maf, line.strip(), regex ) )
             sys.exit( 1 )
          if ml == 'notOurGenome':
             continue
-         if ml.length != len( ml.sequence ):
+         if ml.length != ml.sequenceLength:
             sys.stderr.write( 'Error while working on file %s :\n   '
                               'printed sequence length (%d) not equal to actual sequence '
                               'length (%d) ref genome:%s other genome:%s line below:\n%s\n' % 
-                              ( options.maf, ml.length, len( ml.sequence ), options.ref, options.other, line ) )
+                              ( options.maf, ml.length, ml.sequenceLength, options.ref, options.other, line.strip() ) )
             sys.exit( 1 )
          mafLineList.append( ml )
       else:
@@ -314,6 +389,14 @@ def mafDataOrNone( mafBlocksByChrom, c ):
       return None
    return mafBlocksByChrom[ c ]
 
+def chrNumBins( c, options, data ):
+   """ return the number of bins chromosome c gets out of
+   the options.numBins spread across the whole genome.
+   """
+   return int( math.floor( ( float( data.chrLengthsByChrom[ c ] ) / 
+                             data.genomeLength ) * 
+                           options.numBins ))
+
 def convertDataToWiggle( options, data ):
    """ the mafWigDict is keyed on chromosome and then
    on either maf or xAxis. The dict will be pulled apart
@@ -321,17 +404,20 @@ def convertDataToWiggle( options, data ):
    """
    mafWigDict = {}
    for c in data.chrNames:
-      thisChrNumBins = int( math.floor( ( float( data.chrLengthsByChrom[ c ] ) / 
-                                          data.genomeLength ) * 
-                                        options.numBins ))
+      thisChrNumBins = chrNumBins( c, options, data )
       mafWigDict[ c ] = {}
       d = mafDataOrNone( data.mafBlocksByChrom, c )
       if d is None:
          mafWigDict[ c ] = newMafWigDict( thisChrNumBins )
          mafWigDict[ c ] ['xAxis'] = objListUtility_xAxis( data.chrLengthsByChrom[c], thisChrNumBins )
+         objListUtility_addPyramid( mafWigDict[ c ], data.chrLengthsByChrom[ c ], 
+                                    options.pyramidBinSize )
+         objListUtility_buildPyramid( mafWigDict[ c ], data.chrLengthsByChrom[ c ], 
+                                      options.pyramidBinSize )
       else:
          mafWigDict[ c ] = objListToBinnedWiggle( d, data.chrLengthsByChrom[ c ], 
-                                                  thisChrNumBins, options.maf )
+                                                  thisChrNumBins, options.maf, 
+                                                  options.pyramidBinSize )
    data.mafWigDict = mafWigDict
 
 def switchToPositiveStrandCoordinates( options, data ): 
@@ -342,17 +428,33 @@ def switchToPositiveStrandCoordinates( options, data ):
    a positive strand only coordinate system.
    """
    for c in data.mafBlocksByChrom:
-      for m in data.mafBlocksByChrom[ c ]:
-         if m.refStart > m.refEnd:
-            m.refStart, m.refEnd = m.refEnd, m.refStart
-            m.refStrand *= -1
-            m.hplStart, m.hplEnd = m.hplStart, m.hplEnd # this is now left-right draw order
-         # sanity check
-         if m.refStart > data.chrLengthsByChrom[ c ] or m.refEnd > data.chrLengthsByChrom[ c ]:
-            sys.stderr.write( 'file %s has maf block on chr %s with '
-                              'bounds [%d - %d] which are beyond featLen (%d)\n' %
-                              ( options.maf, m.refChr, m.refStart, m.refEnd, data.chrLengthsByChrom[ c ] ))
-            sys.exit( 1 )
+      b = data.mafBlocksByChrom[ c ].blocks()
+      swap = b['refStart'] > b['refEnd']
+      b['refStart'][ swap ], b['refEnd'][ swap ] = b['refEnd'][ swap ], b['refStart'][ swap ]
+      b['refStrand'][ swap ] *= -1
+      # hplStart and hplEnd are now left-right draw order
+      # sanity check
+      beyond = ( b['refStart'] > data.chrLengthsByChrom[ c ] ) | ( b['refEnd'] > data.chrLengthsByChrom[ c ] )
+      if beyond.any():
+         m = b[ beyond ][ 0 ]
+         sys.stderr.write( 'file %s has maf block on chr %s with '
+                           'bounds [%d - %d] which are beyond featLen (%d)\n' %
+                           ( options.maf, c, m['refStart'], m['refEnd'], data.chrLengthsByChrom[ c ] ))
+         sys.exit( 1 )
+
+def switchBlockToPositiveStrand( m, c, options, data ):
+   """ single block version of switchToPositiveStrandCoordinates().
+   """
+   if m.refStart > m.refEnd:
+      m.refStart, m.refEnd = m.refEnd, m.refStart
+      m.refStrand *= -1
+      m.hplStart, m.hplEnd = m.hplStart, m.hplEnd # this is now left-right draw order
+   # sanity check
+   if m.refStart > data.chrLengthsByChrom[ c ] or m.refEnd > data.chrLengthsByChrom[ c ]:
+      sys.stderr.write( 'file %s has maf block on chr %s with '
+                        'bounds [%d - %d] which are beyond featLen (%d)\n' %
+                        ( options.maf, m.refChr, m.refStart, m.refEnd, data.chrLengthsByChrom[ c ] ))
+      sys.exit( 1 )
       
 def trimDups( options, data ):
    """ Walk the data.mafBlockByChrom structure and 
@@ -365,24 +467,23 @@ def trimDups( options, data ):
    you could just have the same maf block in your maf 10
    times and you'd get a higher score than just having it
    in once.
+   Blocks must already be sorted on refStart. A block keeps
+   only the bases past the furthest refEnd of all the blocks
+   before it, and is removed if there are none.
    """
    for c in data.chrNames:
-      prevBlock = MafBlock()
-      replacement = []
       if c not in data.mafBlocksByChrom:
-         data.mafBlocksByChrom[ c ] = replacement
+         data.mafBlocksByChrom[ c ] = MafBlockTable()
          continue
-      for m in data.mafBlocksByChrom[ c ]:
-         if m.refStart <= prevBlock.refEnd:
-            if m.refEnd > prevBlock.refEnd:
-               # only add in the new, distinct, bases
-               m.refStart = prevBlock.refEnd + 1
-            else:
-               # this block is totally covered by the previous block
-               continue
-         replacement.append( m )
-         prevBlock = m
-      data.mafBlocksByChrom[ c ] = replacement
+      b = data.mafBlocksByChrom[ c ].blocks()
+      if len( b ) < 1:
+         continue
+      prevEnd = numpy.concatenate(( [ MafBlock().refEnd ], 
+                                    numpy.maximum.accumulate( b['refEnd'][ :-1 ] )))
+      keep = b['refEnd'] > prevEnd
+      # only add in the new, distinct, bases
+      b['refStart'] = numpy.maximum( b['refStart'], prevEnd + 1 )
+      data.mafBlocksByChrom[ c ].setBlocks( b[ keep ] )
 
 def recordCoverage( options, data ):
    """ walks the mafWigDict and figures out out of the 
@@ -390,12 +491,166 @@ def recordCoverage( options, data ):
    by alignments. Stores this under the key 'coverage'.
    """
    for c in data.chrNames:
-      data.mafWigDict[ c ]['columnsInBlocks'] = 0
-      for m in data.mafBlocksByChrom[ c ]:
-         if m.refEnd > m.refStart:
-            data.mafWigDict[ c ]['columnsInBlocks'] += ( m.refEnd + 1 ) - m.refStart
-         else:
-            data.mafWigDict[ c ]['columnsInBlocks'] += ( m.refStart + 1 ) - m.refEnd
+      b = data.mafBlocksByChrom[ c ].blocks()
+      data.mafWigDict[ c ]['columnsInBlocks'] = int( numpy.sum( numpy.abs( b['refEnd'] - b['refStart'] ) + 1 ))
+
+def initStreaming( options, data ):
+   """ set up the empty wiggles and the per chromosome reorder
+   heaps used by --streaming. The heaps hold at most 
+   options.streamWindow blocks each, that is the only place 
+   MafBlock objects are kept in --streaming mode. Trimmed 
+   blocks wait in batches of up to options.streamWindow
+   before being binned.
+   """
+   data.mafWigDict = {}
+   data.streamHeaps = {}
+   data.streamPrevEnd = {}
+   data.streamLastStart = {}
+   data.streamBatches = {}
+   data.streamCount = 0
+   for c in data.chrNames:
+      thisChrNumBins = chrNumBins( c, options, data )
+      data.mafWigDict[ c ] = newMafWigDict( thisChrNumBins )
+      data.mafWigDict[ c ]['xAxis'] = objListUtility_xAxis( data.chrLengthsByChrom[ c ], thisChrNumBins )
+      objListUtility_addPyramid( data.mafWigDict[ c ], data.chrLengthsByChrom[ c ], 
+                                 options.pyramidBinSize )
+      data.streamHeaps[ c ] = []
+      data.streamPrevEnd[ c ] = MafBlock().refEnd
+      data.streamLastStart[ c ] = None
+      data.streamBatches[ c ] = MafBlockTable( chunkSize=options.streamWindow )
+
+def streamMafBlock( mb, options, data ):
+   """ --streaming replacement for storing mb in data.mafBlocksByChrom.
+   The block is pushed onto its chromosome's heap, keyed on refStart 
+   and then arrival order so that blocks come back out in the same order
+   as the stable sort in main(). Once the heap holds more than 
+   options.streamWindow blocks the leftmost one is binned.
+   """
+   c = mb.refChr
+   switchBlockToPositiveStrand( mb, c, options, data )
+   data.streamCount += 1
+   heapq.heappush( data.streamHeaps[ c ], ( mb.refStart, data.streamCount, mb ))
+   if len( data.streamHeaps[ c ] ) > options.streamWindow:
+      binStreamedBlock( heapq.heappop( data.streamHeaps[ c ] )[ 2 ], options, data )
+
+def binStreamedBlock( mb, options, data ):
+   """ trim mb against the blocks already binned on its chromosome,
+   exactly as trimDups() does, and then add it to the batch of blocks
+   waiting to be binned and to the columnsInBlocks count, as 
+   recordCoverage() does.
+   """
+   c = mb.refChr
+   if data.streamLastStart[ c ] is not None and mb.refStart < data.streamLastStart[ c ]:
+      sys.stderr.write( 'file %s: --streaming found a block on chr %s starting at %d after a '
+                        'block starting at %d had already been binned. Increase --streamWindow '
+                        '(%d) or sort the maf on the reference.\n' 
+                        % ( options.maf, c, mb.refStart, data.streamLastStart[ c ], 
+                            options.streamWindow ))
+      sys.exit( 1 )
+   data.streamLastStart[ c ] = mb.refStart
+   if mb.refStart <= data.streamPrevEnd[ c ]:
+      if mb.refEnd > data.streamPrevEnd[ c ]:
+         # only add in the new, distinct, bases
+         mb.refStart = data.streamPrevEnd[ c ] + 1
+      else:
+         # this block is totally covered by the previous block
+         return
+   data.streamPrevEnd[ c ] = mb.refEnd
+   if mb.refEnd > mb.refStart:
+      data.mafWigDict[ c ]['columnsInBlocks'] += ( mb.refEnd + 1 ) - mb.refStart
+   else:
+      data.mafWigDict[ c ]['columnsInBlocks'] += ( mb.refStart + 1 ) - mb.refEnd
+   data.streamBatches[ c ].append( mb )
+   if len( data.streamBatches[ c ] ) >= options.streamWindow:
+      binStreamedBatch( c, options, data )
+
+def binStreamedBatch( c, options, data ):
+   """ add the trimmed blocks waiting in data.streamBatches[ c ]
+   to the wiggles of chromosome c.
+   """
+   if len( data.streamBatches[ c ] ) < 1:
+      return
+   objListUtility_binMafBlockTable( data.mafWigDict[ c ], data.streamBatches[ c ],
+                                    data.chrLengthsByChrom[ c ], 
+                                    len( data.mafWigDict[ c ]['maf'] ))
+   data.streamBatches[ c ] = MafBlockTable( chunkSize=options.streamWindow )
+
+def finishStreaming( options, data ):
+   """ bin whatever is left in the reorder heaps and batches, then normalize.
+   """
+   for c in data.chrNames:
+      heap = data.streamHeaps[ c ]
+      while len( heap ) > 0:
+         binStreamedBlock( heapq.heappop( heap )[ 2 ], options, data )
+      binStreamedBatch( c, options, data )
+      objListUtility_normalizeCategories( data.mafWigDict[ c ], data.chrLengthsByChrom[ c ], 
+                                          len( data.mafWigDict[ c ]['maf'] ))
+      objListUtility_buildPyramid( data.mafWigDict[ c ], data.chrLengthsByChrom[ c ], 
+                                   options.pyramidBinSize )
+
+def processChromosomesInParallel( options, data ):
+   """ --jobs version of the sort, trim, bin and count steps of
+   main(). Each chromosome's blocks are written to a .npy file which
+   the worker memory-maps, so the blocks are never pickled. The 
+   workers only send back the binned wiggles.
+   """
+   tempDir = tempfile.mkdtemp( prefix='mafToPlotPickles.', dir=options.outDir )
+   try:
+      jobs = []
+      for c in data.chrNames:
+         blocksFile = None
+         d = mafDataOrNone( data.mafBlocksByChrom, c )
+         if d is not None:
+            blocksFile = os.path.join( tempDir, '%d.npy' % len( jobs ))
+            numpy.save( blocksFile, d.blocks() )
+            # free the parent's copy
+            data.mafBlocksByChrom[ c ] = MafBlockTable()
+         jobs.append(( c, blocksFile, options, data.chrLengthsByChrom, data.genomeLength ))
+      pool = multiprocessing.Pool( processes=options.jobs )
+      results = pool.map( processChromosomeJob, jobs )
+      pool.close()
+      pool.join()
+   finally:
+      shutil.rmtree( tempDir )
+   data.mafWigDict = {}
+   tot = 0
+   for c, wig, distinct in results:
+      if wig is None:
+         # the worker has already written the reason to stderr
+         sys.exit( 1 )
+      data.mafWigDict[ c ] = wig
+      if options.verify:
+         tot += distinct
+   if options.verify:
+      reportDistinct( tot )
+
+def processChromosomeJob( job ):
+   """ worker for processChromosomesInParallel(). job is a tuple of
+   the chromosome name, the .npy file holding its blocks (or None), 
+   options, chrLengthsByChrom and genomeLength. The file is mapped
+   copy-on-write so sorting and trimming never touch it. Returns the name, the
+   mafWigDict for the chromosome and, with --verify, the number of 
+   distinct bases. The mafWigDict is None if the worker hit an error.
+   """
+   c, blocksFile, options, chrLengthsByChrom, genomeLength = job
+   data = Data()
+   data.chrNames = [ c ]
+   data.chrLengthsByChrom = chrLengthsByChrom
+   data.genomeLength = genomeLength
+   data.mafBlocksByChrom[ c ] = MafBlockTable()
+   distinct = None
+   try:
+      if blocksFile is not None:
+         data.mafBlocksByChrom[ c ].setBlocks( numpy.load( blocksFile, mmap_mode='c' ))
+      data.mafBlocksByChrom[ c ].sortOn( 'refStart' )
+      trimDups( options, data )
+      if options.verify:
+         distinct = countDistinctBases( options, data )
+      convertDataToWiggle( options, data )
+      recordCoverage( options, data )
+   except SystemExit:
+      return ( c, None, None )
+   return ( c, data.mafWigDict[ c ], distinct )
 
 def verifyStacks( options, data ):
    """ For both blocks and paths, the stacked data structure must be a proper stack.
@@ -404,65 +659,66 @@ def verifyStacks( options, data ):
    whenever we see a weird spike on the plot and say 'this is due to a visual artifact
    of the plotting library we're using.'
    """
-   tests = { 'blocks' : [ 'maf', 'maf1e2', 'maf1e3', 'maf1e4',
-                         'maf1e5', 'maf1e6', 'maf1e7' ],
-             'paths'  : [ 'maf', 'mafCpl1e2', 'mafCpl1e3', 'mafCpl1e4',
-                         'mafCpl1e5', 'mafCpl1e6', 'mafCpl1e7' ],
-             'contigs': [ 'maf', 'mafCtg1e2', 'mafCtg1e3', 'mafCtg1e4',
-                          'mafCtg1e5', 'mafCtg1e6', 'mafCtg1e7' ],
-             'scaffolds':[ 'maf', 'mafSpl1e2', 'mafSpl1e3', 'mafSpl1e4',
-                           'mafSpl1e5', 'mafSpl1e6', 'mafSpl1e7' ] }
    for c in data.chrNames:
-      for t in tests:
-         for i in xrange( 0, len( tests[t] ) - 1):
-            if sum( data.mafWigDict[ c ][ tests[t][ i ]] < 
-                    data.mafWigDict[ c ][ tests[t][ i + 1]] ):
-               sys.stderr.write('stack validation failed on file:%s '
-                                'chr:%s %s %s > %s !\n' 
-                                % ( options.maf, c, tests[ t ][ i + 1 ], tests[ t ][ i ] ))
-               sys.exit( 1 )
+      bad = lmv.checkStacks( data.mafWigDict[ c ] )
+      if bad is not None:
+         sys.stderr.write('stack validation failed on file:%s '
+                          'chr:%s %s %s > %s !\n' 
+                          % ( options.maf, c, bad[ 0 ], bad[ 2 ], bad[ 1 ] ))
+         sys.exit( 1 )
    sys.stderr.write('Verify monotonically decreasing property for all categories: OK.\n')
 
 def verifyElements( options, data ):
    """ The largest value in any of the arrays should never be greater than 1.0.
    """
    for c in data.chrNames:
-      for t in [ 'maf', 'maf1e2', 'maf1e3', 'maf1e4',
-                 'maf1e5', 'maf1e6', 'maf1e7', 'mafCpl1e2', 
-                 'mafCpl1e3', 'mafCpl1e4', 'mafCpl1e5', 
-                 'mafCpl1e6', 'mafCpl1e7', 'mafCtg1e2', 
-                 'mafCtg1e3', 'mafCtg1e4', 'mafCtg1e5', 
-                 'mafCtg1e6', 'mafCtg1e7', 'mafSpl1e2', 
-                 'mafSpl1e3', 'mafSpl1e4', 'mafSpl1e5', 
-                 'mafSpl1e6', 'mafSpl1e7' ]:
-         if sum( data.mafWigDict[ c ][ t ] > 1.0 ) > 0:
-            sys.stderr.write('element validation failed on file:%s '
-                             'chr:%s type:%s contains values '
-                             'greater than 1.0\n' % ( options.maf, c, t ))
-            sys.exit( 1 )
+      t = lmv.checkElements( data.mafWigDict[ c ] )
+      if t is not None:
+         sys.stderr.write('element validation failed on file:%s '
+                          'chr:%s type:%s contains values '
+                          'greater than 1.0\n' % ( options.maf, c, t ))
+         sys.exit( 1 )
    sys.stderr.write('Verify Elements <= 1.0: OK\n')
 
 def verifyDistinct( options, data ):
    """ There should be no duplicate bases in any of the maf blocks.
    They should have all been trimed out by trimDups().
    """
+   tot = countDistinctBases( options, data )
+   reportDistinct( tot )
+
+def reportDistinct( tot ):
+   sys.stderr.write( 'Verify all bases sent to be binned are distinct: Found %s distinct bases in the alignment to the reference genome, no duplicates, OK.\n' % tot)
+
+def countDistinctBases( options, data ):
+   """ count the bases in the maf blocks, exits if any base
+   appears twice. The blocks are treated as intervals [refStart, refEnd]:
+   sorted on their starts, a block shares a base with an earlier one
+   exactly when its start is not past the largest end seen before it.
+   If no block does, the distinct bases are the sum of the block lengths.
+   """
    tot = 0
    for c in data.chrNames:
-      s = set()
       d = mafDataOrNone( data.mafBlocksByChrom, c )
       if d is None:
          continue
-      for mb in d:
-         for i in xrange( mb.refStart, mb.refEnd + 1):
-            if i in s:
-               sys.stderr.write('duplicate base found! %s %d [%d-%d], %s [%d-%d]\n'
-                                % (mb.refChr, i, mb.refStart, mb.refEnd, 
-                                   mb.pairChr, mb.pairStart, mb.pairEnd ))
-               sys.exit( 1 )
-            else:
-               s.add( i )
-      tot += len( s )
-   sys.stderr.write( 'Verify all bases sent to be binned are distinct: Found %s distinct bases in the alignment to the reference genome, no duplicates, OK.\n' % tot)
+      blocks = d.blocks()
+      blocks = blocks[ blocks[ 'refEnd' ] >= blocks[ 'refStart' ]]
+      if len( blocks ) == 0:
+         continue
+      order = numpy.lexsort(( blocks[ 'refEnd' ], blocks[ 'refStart' ] ))
+      starts = blocks[ 'refStart' ][ order ].astype( numpy.int64 )
+      ends = blocks[ 'refEnd' ][ order ].astype( numpy.int64 )
+      reach = numpy.maximum.accumulate( ends )
+      overlaps = numpy.flatnonzero( starts[ 1: ] <= reach[ :-1 ] ) + 1
+      if len( overlaps ):
+         mb = blocks[ order[ overlaps[ 0 ]]]
+         sys.stderr.write('duplicate base found! %s %d [%d-%d], pair [%d-%d]\n'
+                          % ( c, mb['refStart'], mb['refStart'], mb['refEnd'],
+                              mb['pairStart'], mb['pairEnd'] ))
+         sys.exit( 1 )
+      tot += int(( ends - starts + 1 ).sum() )
+   return tot
 
 def verifyLengths( options, data ):
    """ The lengths of the arrays should all be the same.
@@ -483,10 +739,12 @@ def verifyLengths( options, data ):
                        % ( len( data.chrNames ), len( data.mafWigDict )))
       sys.exit( 1 )
    for c in data.chrNames:
-      if len( types ) + 5 != len( data.mafWigDict[c] ): # extra 5 are from the *Max records
+      # the pyramid, if any, is checked by verifyPyramid()
+      keys = [ k for k in data.mafWigDict[c] if not objListUtility_isPyramidKey( k ) ]
+      if len( types ) + 5 != len( keys ): # extra 5 are from the *Max records
          sys.stderr.write('the expected length of the data wig '
                           'dictionary for %s is %d, but actual is %d\n' 
-                          % ( c, len( types ) + 5, len( data.mafWigDict[c] )))
+                          % ( c, len( types ) + 5, len( keys )))
          sys.stderr.write( '%s\n' % str( data.mafWigDict[ c ].keys() ))
          sys.exit( 1 )
    sys.stderr.write('Verify number of records in data structure = %d, OK.\n' % (len(types) + 4))
@@ -502,6 +760,29 @@ def verifyLengths( options, data ):
                        % ( c, len(data.mafWigDict[c][ types[0] ])))
    sys.stderr.write('Verify lengths of arrays inside data structure, OK.\n')
 
+def verifyPyramid( options, data ):
+   """ With --pyramidBinSize, every level of the pyramid must hold the same
+   total for every track, and the total coverage must be columnsInBlocks.
+   """
+   if options.pyramidBinSize < 1:
+      return
+   for c in data.chrNames:
+      d = data.mafWigDict[ c ]
+      keys = [ k[ len( 'pyr0.' ): ] for k in d if k.startswith( 'pyr0.' ) and k != 'pyr0.binStarts' ]
+      for k in keys:
+         tot = d[ 'pyr0.' + k ].sum()
+         for level in xrange( 1, d[ 'pyramidLevels' ] ):
+            if d[ 'pyr%d.%s' % ( level, k ) ].sum() != tot:
+               sys.stderr.write('pyramid validation failed on file:%s chr:%s level %d of %s '
+                                'does not add up to level 0\n' % ( options.maf, c, level, k ))
+               sys.exit( 1 )
+      if d[ 'pyr0.maf' ].sum() != d[ 'columnsInBlocks' ]:
+         sys.stderr.write('pyramid validation failed on file:%s chr:%s coverage %d != '
+                          'columnsInBlocks %d\n' % ( options.maf, c, d[ 'pyr0.maf' ].sum(), 
+                                                      d[ 'columnsInBlocks' ] ))
+         sys.exit( 1 )
+   sys.stderr.write('Verify pyramid levels add up: OK.\n')
+
 def main():
    usage = ( 'usage: %prog --maf=file.maf --referenceGenome=A --comparisonGenome=B --chrNames=c0,c1,... --chrLengths=N1,N2,... --outDir=path/to/dir/\n\n'
              '%prog takes in a maf filename ( --maf ), a reference genome name as\n'
@@ -513,27 +794,40 @@ def main():
    data = Data()
    parser = OptionParser( usage=usage )
    initOptions( parser )
+   lmi.initOptions( parser )
    options, args = parser.parse_args()
    checkOptions( options, parser, data )
+   lmi.checkOptions( options, parser )
 
-   readMaf( options, data )
-   switchToPositiveStrandCoordinates( options, data )
-   
-   for c in data.chroms:
-      data.mafBlocksByChrom[ c ].sort( key = lambda x: x.refStart, reverse=False )
-   trimDups( options, data )
-   if options.verify:
-      verifyDistinct( options, data )
-   
-   convertDataToWiggle( options, data )
-   recordCoverage( options, data )
+   if options.streaming:
+      initStreaming( options, data )
+      readMaf( options, data )
+      finishStreaming( options, data )
+   else:
+      readMaf( options, data )
+      switchToPositiveStrandCoordinates( options, data )
+      if options.jobs > 1:
+         processChromosomesInParallel( options, data )
+      else:
+         for c in data.chroms:
+            data.mafBlocksByChrom[ c ].sortOn( 'refStart' )
+         trimDups( options, data )
+         if options.verify:
+            verifyDistinct( options, data )
+         
+         convertDataToWiggle( options, data )
+         recordCoverage( options, data )
    
    if options.verify:
       verifyStacks( options, data )
       verifyElements( options, data )
       verifyLengths( options, data )
+      verifyPyramid( options, data )
    
-   packData( data.mafWigDict, options.filename, options )
+   if options.storeFormat == 'wigStore':
+      packData( data.mafWigDict, options.filename, options, prot='wigStore' )
+   else:
+      packData( data.mafWigDict, options.filename, options )
 
 if __name__ == '__main__':
    main()
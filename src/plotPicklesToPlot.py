@@ -31,14 +31,22 @@ dent earl, dearl@soe.ucsc.edu
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 ##############################
+import copy
 import glob
 import libAssemblySubset as las
 import libGeneral as lgn
 import libPlotting as lpt
 from libMafGffPlot import Data
 from libMafGffPlot import MafBlock
+from libMafGffPlot import MafPyramidTracks
+from libMafGffPlot import MafRegionTracks
 from libMafGffPlot import GffRecord
+from libMafGffPlot import MafSummaryTracks
+from libMafGffPlot import MafWigStore
+from libMafGffPlot import readMafSummaryIndex
+from libMafGffPlot import refreshMafSummaryIndex
 from libMafGffPlot import unpackData
+import math
 import matplotlib.lines as lines
 import matplotlib.patches as patches
 import matplotlib.pylab  as pylab
@@ -48,6 +56,7 @@ from optparse import OptionParser
 import os
 import sys
 import re
+import shlex
 
 def initOptions( parser ):
    parser.add_option( '--annotPickleDir', dest='annotDir',
@@ -55,7 +64,9 @@ def initOptions( parser ):
                       help='Directory where annotation pickles will be read from.' )
    parser.add_option( '--mafPickleDir', dest='mafDir',
                       type='string',
-                      help='Directory where maf pickles will be read from.' )
+                      help=('Directory where maf pickles will be read from. The summary index '
+                            'of the pickles there, mafPickleSummary.json, written by '
+                            'updateMafPickleSummary.py, is used if it exists.' ))
    parser.add_option( '-a', '--referenceGenome', dest='ref',
                       type='string',
                       help='Establishes the genome in the maf that will be used as the reference.' )
@@ -147,6 +158,32 @@ def initOptions( parser ):
    parser.add_option( '--printCoverageNumbers', dest='printCoverageNumbers', default=False,
                       action='store_true',
                       help='Print the coverage values to the left of the assembly ID. default=%default' )
+   parser.add_option( '--jobs', dest='jobs', default=1,
+                      type='int',
+                      help=( 'Number of processes used to draw the assembly rows. With more than one, '
+                             'each row is rendered separately at --dpi and placed on the figure as an '
+                             'image, so in pdf and eps output the rows are raster. default=%default' ))
+   parser.add_option( '--numBins', dest='numBins',
+                      type='int',
+                      help=( 'Rebin the maf wiggles to this many bins across the genome, using the '
+                             'coverage pyramid stored by mafToPlotPickles.py --pyramidBinSize. '
+                             'The rebinning is exact when every new bin edge is a pyramid bin edge, '
+                             'e.g. with --pyramidBinSize 1, otherwise stored bins are split '
+                             'across new bin edges in proportion and the events of a stored bin '
+                             'go to the new bin that holds its start. '
+                             'default is to plot the bins stored in the pickles.' ))
+   parser.add_option( '--region', dest='region',
+                      type='string',
+                      help=( 'Draw only the window chr:start-end of one chromosome, '
+                             'e.g. chr0:1000000-2000000, positions are 1-based and inclusive. '
+                             'Only the bins that overlap the window are read. With --numBins '
+                             'the window is rebinned to that many bins.' ))
+   parser.add_option( '--batch', dest='batch',
+                      type='string',
+                      help=( 'File of figure specs, one figure per line. Each line holds the options '
+                             'for one figure, e.g. "--out hap1Fill --fill", which are added to the '
+                             'options given on the command line. Pickles are loaded once and shared '
+                             'by all of the figures.' ))
 
 def checkOptions( options, parser, data ):
    if options.ref is None:
@@ -193,6 +230,9 @@ def checkOptions( options, parser, data ):
       data.chrLengths[ i ] = int( data.chrLengths[ i ] )
       data.chrLengthsByChrom[ data.chrNames[ i ] ] = data.chrLengths[ i ]
       data.chrLabelsByChrom[ data.chrNames[ i ] ] = data.chrLabels[ i ]
+   data.region = None
+   if options.region is not None:
+      checkRegion( options, parser, data )
 
    data.genomeLength = 0
    for c in data.chrLengths:
@@ -239,23 +279,98 @@ def checkOptions( options, parser, data ):
    data.annotationClippingDict = {} 
    # annotationClippingDict is keyed first on chromosomes, 
    # then on the data type, i.e. CDS, or maf, or whatever
+   if options.jobs < 1:
+      parser.error('--jobs (%d) must be >= 1.' % options.jobs )
+   if options.numBins is not None and options.numBins < 1:
+      parser.error('--numBins (%d) must be >= 1.' % options.numBins )
    options.sortOn = options.sortOn.lower()
    if options.sortOn not in ('c', 'l'):
       parser.error('Unrecognized selection --sortOn %s, choose from "c" for coverage or "l" for length' % options.sortOn )
    
+def checkRegion( options, parser, data ):
+   """ parses --region chr:start-end and cuts the figure down to that
+   one chromosome. data.region holds ( chr, start, end ).
+   """
+   m = re.match( r'^(\S+):([0-9,]+)-([0-9,]+)$', options.region )
+   if m is None:
+      parser.error( '--region %s is not of the form chr:start-end.\n' % options.region )
+   c = m.group( 1 )
+   start = int( m.group( 2 ).replace( ',', '' ))
+   end = int( m.group( 3 ).replace( ',', '' ))
+   if c not in data.chrLengthsByChrom:
+      parser.error( '--region chromosome %s is not in --chrNames.\n' % c )
+   if not 1 <= start <= end <= data.chrLengthsByChrom[ c ]:
+      parser.error( '--region %s must have 1 <= start <= end <= %d.\n' 
+                    % ( options.region, data.chrLengthsByChrom[ c ] ))
+   data.region = ( c, start, end )
+   data.chrNames = [ c ]
+   data.chrLengths = [ data.chrLengthsByChrom[ c ] ]
+
+def chrExtent( c, data ):
+   """ returns the x limits of chromosome c's axes, the whole chromosome 
+   or the --region window.
+   """
+   if data.region is not None and data.region[ 0 ] == c:
+      return ( data.region[ 1 ] - 1, data.region[ 2 ] )
+   return ( 0, data.chrLengthsByChrom[ c ] )
+
+def chrExtentLabel( c, data ):
+   if data.region is not None and data.region[ 0 ] == c:
+      return '(%d-%d)' % ( data.region[ 1 ], data.region[ 2 ] )
+   return '(%s)' % prettyPrintLength( data.chrLengthsByChrom[ c ] )
+
 def loadAnnots( options, data ):
    data.annotWigDict = {}
    f = os.path.join( options.annotDir, '%s.annots.pickle' % ( options.ref ))
-   data.annotWigDict = unpackData( f, options, data )
+   if f not in data.pickleCache:
+      data.pickleCache[ f ] = unpackData( f, options, data )
+   if data.region is not None:
+      c, start, end = data.region
+      data.annotWigDict[ c ] = MafRegionTracks( data.pickleCache[ f ][ c ], 
+                                                data.chrLengthsByChrom[ c ], start, end )
+      return
+   # normalizeAnnotations() may modify the arrays, keep the cached copy clean
+   data.annotWigDict = copy.deepcopy( data.pickleCache[ f ] )
    
+def chromTracks( store, c, options, data ):
+   # with --numBins the tracks of chromosome c are rebinned from the
+   # pyramid stored in the pickle, otherwise they are the stored tracks.
+   # Either is cut down to the --region window when there is one.
+   tracks = store.chrom( c )
+   region = None
+   if data.region is not None and data.region[ 0 ] == c:
+      region = data.region
+   if options.numBins is None or c not in data.chrLengthsByChrom:
+      if region is not None:
+         return MafRegionTracks( tracks, data.chrLengthsByChrom[ c ], region[ 1 ], region[ 2 ] )
+      return tracks
+   if 'pyramidLevels' not in tracks:
+      sys.stderr.write( 'Error, --numBins needs a coverage pyramid and %s has none, '
+                        'rerun mafToPlotPickles.py with --pyramidBinSize.\n' % store.filename )
+      sys.exit( 1 )
+   chrLen = data.chrLengthsByChrom[ c ]
+   if region is not None:
+      return MafPyramidTracks( tracks, chrLen, options.numBins, region[ 1 ], region[ 2 ] )
+   numBins = int( math.floor( float( chrLen ) / data.genomeLength * options.numBins ))
+   return MafPyramidTracks( tracks, chrLen, max( numBins, 1 ))
+
 def loadMafs( options, data ):
    # sort of like loadAnnots, but needs an added loop that pulls 
    # from a glob of all the mafs in the maf directory.
+   # Each chromosome of each maf is a MafWigTracks object, tracks are only
+   # read from disk when something asks for them. The sort weights and the
+   # length threshold flags come from the directory's summary index, which
+   # only opens pickles that are new or have changed since the index,
+   # mafPickleSummary.json, was last written by updateMafPickleSummary.py.
+   # The index is brought up to date in memory only, --mafPickleDir is
+   # never written. With --region they are those of the region's whole 
+   # chromosome.
    data.mafWigDict = {}
    data.mafNamesDict = {}
    patStr = '\S+\.(\S+)\.maf.pickle'
    pat = re.compile( patStr )
    mafFiles = glob.glob( os.path.join( options.mafDir, '%s*maf.pickle' % ( options.ref )))
+   stores = []
    for f in mafFiles:
       m = re.search( pat, f )
       if m is None:
@@ -268,18 +383,28 @@ def loadMafs( options, data ):
       if name not in data.mafNamesDict:
          data.mafNamesDict[ name ] = 0 # this serves the duel purpose of storing 
                                        # all seen names and the count of bases aligned
-      dataByChrom = unpackData( f, options, data )
-      for c in dataByChrom:
+      if f not in data.pickleCache:
+         data.pickleCache[ f ] = MafWigStore( f )
+      stores.append( ( name, data.pickleCache[ f ] ))
+   index = readMafSummaryIndex( options.mafDir )
+   refreshMafSummaryIndex( index, options.mafDir, [ s for n, s in stores ] )
+   summaries = {}
+   for name, store in stores:
+      entry = index[ os.path.basename( store.filename ) ]
+      for c in entry[ 'chroms' ]:
+         c = str( c )
          if c not in data.mafWigDict:
             data.mafWigDict[ c ] = {}
-         data.mafWigDict[ c ][ name ] = dataByChrom[ c ]
+            summaries[ c ] = {}
+         data.mafWigDict[ c ][ name ] = chromTracks( store, c, options, data )
+         summaries[ c ][ name ] = MafSummaryTracks( entry[ 'chroms' ][ c ] )
    # calculate data used for sorting
    for c in data.chrNames:
       for n in data.mafNamesDict:
          if options.sortOn == 'c':
-            data.mafNamesDict[ n ] += data.mafWigDict[ c ][ n ]['columnsInBlocks']
+            data.mafNamesDict[ n ] += summaries[ c ][ n ]['columnsInBlocks']
          else:
-            data.mafNamesDict[ n ] += lengthData( data.mafWigDict[ c ][ n ], options, data )
+            data.mafNamesDict[ n ] += lengthData( summaries[ c ][ n ], options, data )
    if not options.forceOrder:
       data.orderedMafs = sorted( data.mafNamesDict, key=lambda key: data.mafNamesDict[ key ], reverse=True )
    else:
@@ -298,27 +423,43 @@ def loadMafs( options, data ):
    labs = [ '1e2', '1e3', '1e4',
             '1e5', '1e6', '1e7' ]
    data.lengthThresholdPresent = {}
+   base = stackFillBase( options )
+   if base is None:
+      return
    for c in data.chrNames:
-      for n in data.mafWigDict[ c ]:
+      for n in summaries[ c ]:
          for l in labs:
             if l in data.lengthThresholdPresent:
                continue
-            if options.stackFillBlocks:
-               key = 'maf' + l
-            elif options.stackFillContigPaths:
-               key = 'mafCpl' + l
-            elif options.stackFillContigs:
-               key = 'mafCtg' + l
-            elif options.stackFillScaffPaths:
-               key = 'mafSpl' + l
-            else:
-               continue
-            if key not in data.mafWigDict[ c ][ n ]:
+            key = base + l
+            if key not in summaries[ c ][ n ]:
                print 'thats weird, this key: %s is not in file: %s chr: %s' % ( key, n, c )
                continue
-            if sum( data.mafWigDict[ c ][ n ][ key ] ) > 0:
+            if summaries[ c ][ n ].sum( key ) > 0:
                data.lengthThresholdPresent[ l ] = True
 
+def stackFillBase( options ):
+   """ returns the prefix of the length threshold tracks used by
+   the chosen stack fill, or None when there is no stack fill.
+   """
+   if options.stackFillBlocks:
+      return 'maf'
+   if options.stackFillContigPaths:
+      return 'mafCpl'
+   if options.stackFillContigs:
+      return 'mafCtg'
+   if options.stackFillScaffPaths:
+      return 'mafSpl'
+   return None
+
+def coverageTracks( options ):
+   """ returns the names of the coverage tracks that drawMafs() will draw.
+   """
+   base = stackFillBase( options )
+   if base is None:
+      return [ 'maf' ]
+   return [ 'maf' ] + [ base + '1e%d' % i for i in xrange( 2, 8 ) ]
+
 def lengthData( maf, options, data ):
    """ lengthData() takes a mafWigPic object and needs to return an int.
    the int is calculated as the sum of the coverage array and, for 
@@ -327,21 +468,13 @@ def lengthData( maf, options, data ):
    labs = {} # keys are labels, values are scaling factors
    for i in xrange( 2, 7 ):
       labs[ '1e%d' % i ] = 10 ** i
-   v = sum( maf['maf'] )
-   if not ( options.stackFillBlocks or options.stackFillContigs or 
-            options.stackFillContigPaths or options.stackFillScaffPaths ):
+   base = stackFillBase( options )
+   if base is None:
       return maf['columnsInBlocks'] # default
-   if options.stackFillBlocks:
-      base = 'maf'
-   if options.stackFillContigs:
-      base = 'mafCtg'
-   if options.stackFillContigPaths:
-      base = 'mafCpl'
-   if options.stackFillScaffPaths:
-      base = 'mafSpl'
+   v = maf.sum( 'maf' )
    for l in labs:
       key = base + l
-      v += sum( maf[ key ] ) * labs[l]
+      v += maf.sum( key ) * labs[l]
    return v
 
 def establishAxes( fig, options, data ):
@@ -389,20 +522,24 @@ def setAxisLimits( axDict, options, data ):
       for a in data.annotationOrder:
          i += 1
          axDict[ c + a ].set_ylim( 0.0, data.annotationCeilings[ i ] )
-         axDict[ c + a ].set_xlim( 0.0, data.chrLengthsByChrom[ c ] )
+         axDict[ c + a ].set_xlim( *chrExtent( c, data ))
          axDict[ c + a ].xaxis.set_major_locator( pylab.NullLocator() )
          axDict[ c + a ].yaxis.set_major_locator( pylab.NullLocator() )
-      for n in data.orderedMafs:
-         if c + n not in axDict:
-            continue
-         axDict[ c + n ].set_ylim( 0.0, data.axCeilings[ n ] )
-         axDict[ c + n ].set_xlim( 0.0, data.chrLengthsByChrom[ c ] )
-         axDict[ c + n ].xaxis.set_major_locator( pylab.NullLocator() )
-         axDict[ c + n ].yaxis.set_major_locator( pylab.NullLocator() )
       axDict[ c ].set_ylim( 0.0, 1.01 )
-      axDict[ c ].set_xlim( 0.0, data.chrLengthsByChrom[ c ] )
+      axDict[ c ].set_xlim( *chrExtent( c, data ))
       axDict[ c ].xaxis.set_major_locator( pylab.NullLocator() )
       axDict[ c ].yaxis.set_major_locator( pylab.NullLocator() )
+   for n in data.orderedMafs:
+      setMafRowLimits( axDict, n, options, data )
+
+def setMafRowLimits( axDict, n, options, data ):
+   for c in data.chrNames:
+      if c + n not in axDict:
+         continue
+      axDict[ c + n ].set_ylim( 0.0, data.axCeilings[ n ] )
+      axDict[ c + n ].set_xlim( *chrExtent( c, data ))
+      axDict[ c + n ].xaxis.set_major_locator( pylab.NullLocator() )
+      axDict[ c + n ].yaxis.set_major_locator( pylab.NullLocator() )
 
 def drawChrLines( ax, options, data):
    for c in data.chrNames:
@@ -423,7 +560,7 @@ def labelAxes( fig, axDict, options, data ):
       fig.text( x=xPos, y=options.axTop + 0.005, s = data.chrLabelsByChrom[ c ], horizontalalignment='center',
                   verticalalignment='bottom', fontsize=fs )
       fig.text( x=xPos + 0.025, y=options.axTop + 0.005, 
-                s = '(%s)' % prettyPrintLength( data.chrLengthsByChrom[ c ] ), 
+                s = chrExtentLabel( c, data ), 
                 horizontalalignment='left',
                 verticalalignment='bottom', 
                 color= (0.5, 0.5, 0.5,), fontsize=6 )
@@ -523,7 +660,7 @@ def drawAnnotations( axDict, options, data ):
       for a in data.annotationOrder:
          i += 1
          # baseline
-         axDict[ c + a ].add_line( lines.Line2D( xdata=[0, data.chrLengthsByChrom[ c ]],
+         axDict[ c + a ].add_line( lines.Line2D( xdata=chrExtent( c, data ),
                                              ydata=[ 0, 0 ],
                                              color= options.annotColors[ a ],
                                              linewidth=0.3))
@@ -543,7 +680,7 @@ def drawClippedAnnotationRegions( axDict, c, a, j, options, data ):
    if a not in data.annotationClippingDict[ c ]:
       return
    for i in xrange( 0, len( data.annotationClippingDict[ c ][ a ] )):
-      nudge = data.annotWigDict[ c ][ 'xAxis' ][ 1 ]
+      nudge = data.annotWigDict[ c ][ 'xAxis' ][ 1 ] - data.annotWigDict[ c ][ 'xAxis' ][ 0 ]
       axDict[ c + a ].add_line( lines.Line2D( xdata=[ data.annotWigDict[ c ][ 'xAxis' ][ data.annotationClippingDict[ c ][ a ][ i ][ 0 ]] - nudge,
                                                       data.annotWigDict[ c ][ 'xAxis' ][ data.annotationClippingDict[ c ][ a ][ i ][ 1 ]] + nudge],
                                               ydata=[ data.annotationCeilings[j], data.annotationCeilings[j] ],
@@ -551,98 +688,186 @@ def drawClippedAnnotationRegions( axDict, c, a, j, options, data ):
                                               color='r'))
 
 def drawMafs( axDict, options, data ):
+   if options.jobs > 1:
+      drawMafsInParallel( axDict, options, data )
+      return
+   j = 0
+   for n in data.orderedMafs:
+      drawMafRow( axDict, n, j, options, data )
+      j += 1
+
+def drawMafRow( axDict, n, j, options, data ):
+   """ draws the row for assembly n, the j-th assembly in data.orderedMafs,
+   on to the axes of every chromosome.
+   """
    alternatingColors = { True: ( 0.2, 0.2, 0.2 ),
                          False: ( 0.2, 0.2, 0.2 ) }
    myGray = ( 0.8, 0.8, 0.8 )
-
+   col = ( j % 2 == 0 )
    for c in data.chrNames:
-      col = True
-      j = 0
-      for n in data.orderedMafs:
-         # draw the baseline
-         axDict[ c + n ].add_line( lines.Line2D( xdata=[0, data.chrLengthsByChrom[ c ]],
-                                                 ydata=[ 0, 0 ],
-                                                 color= myGray,
-                                                 linewidth=0.3))
-         # Basic fills
-         if options.fill:
+      # draw the baseline
+      axDict[ c + n ].add_line( lines.Line2D( xdata=chrExtent( c, data ),
+                                              ydata=[ 0, 0 ],
+                                              color= myGray,
+                                              linewidth=0.3))
+      # Basic fills
+      if options.fill:
+         axDict[ c + n ].fill_between( x=data.mafWigDict[ c ][ n ]['xAxis'], 
+                                       y1=data.mafWigDict[ c ][ n ]['maf'],
+                                       y2=0,
+                                       facecolor = myGray,
+                                       linewidth = 0.0 )
+      # Stack Fills
+      elif options.stackFillBlocks:
+         k = -1
+         for r in [ 'maf', 'maf1e2', 'maf1e3', 'maf1e4', 
+                    'maf1e5', 'maf1e6', 'maf1e7' ]:
+            k += 1
             axDict[ c + n ].fill_between( x=data.mafWigDict[ c ][ n ]['xAxis'], 
-                                          y1=data.mafWigDict[ c ][ n ]['maf'],
-                                          y2=0,
-                                          facecolor = myGray,
+                                          y1=data.mafWigDict[ c ][ n ][ r ],
+                                          y2=data.mafYPos[ j ],
+                                          facecolor = data.stackFillColors[ k ],
                                           linewidth = 0.0 )
-         # Stack Fills
-         elif options.stackFillBlocks:
-            k = -1
-            for r in [ 'maf', 'maf1e2', 'maf1e3', 'maf1e4', 
-                       'maf1e5', 'maf1e6', 'maf1e7' ]:
-               k += 1
-               axDict[ c + n ].fill_between( x=data.mafWigDict[ c ][ n ]['xAxis'], 
-                                             y1=data.mafWigDict[ c ][ n ][ r ],
-                                             y2=data.mafYPos[ j ],
-                                             facecolor = data.stackFillColors[ k ],
-                                             linewidth = 0.0 )
-         elif options.stackFillContigPaths:
-            k = -1
-            for r in [ 'maf', 'mafCpl1e2', 'mafCpl1e3', 'mafCpl1e4', 
-                       'mafCpl1e5', 'mafCpl1e6', 'mafCpl1e7' ]:
-               k += 1
-               axDict[ c + n ].fill_between( x=data.mafWigDict[ c ][ n ]['xAxis'], 
-                                             y1=data.mafWigDict[ c ][ n ][ r ],
-                                             y2=data.mafYPos[ j ],
-                                             facecolor = data.stackFillColors[ k ],
-                                             linewidth = 0.0 )
-         elif options.stackFillContigs:
-            k = -1
-            for r in [ 'maf', 'mafCtg1e2', 'mafCtg1e3', 'mafCtg1e4', 
-                       'mafCtg1e5', 'mafCtg1e6', 'mafCtg1e7' ]:
-               k += 1
-               axDict[ c + n ].fill_between( x=data.mafWigDict[ c ][ n ]['xAxis'], 
-                                             y1=data.mafWigDict[ c ][ n ][ r ],
-                                             y2=data.mafYPos[ j ],
-                                             facecolor = data.stackFillColors[ k ],
-                                             linewidth = 0.0 )
-         elif options.stackFillScaffPaths:
-            k = -1
-            for r in [ 'maf', 'mafSpl1e2', 'mafSpl1e3', 'mafSpl1e4', 
-                       'mafSpl1e5', 'mafSpl1e6', 'mafSpl1e7' ]:
-               k += 1
-               axDict[ c + n ].fill_between( x=data.mafWigDict[ c ][ n ]['xAxis'], 
-                                             y1=data.mafWigDict[ c ][ n ][ r ],
-                                             y2=data.mafYPos[ j ],
-                                             facecolor = data.stackFillColors[ k ],
-                                             linewidth = 0.0 )
-         myRed  = '#FA9AAB'
-         myBlue = '#C5C3E2'
-         # --blockEdgeDensity track
-         if options.blockEdgeDensity:
-            axDict[ c + n ].add_line( lines.Line2D( xdata = data.mafWigDict[ c ][ n ]['xAxis'], 
-                                                    ydata = data.mafWigDict[ c ][ n ]['blockEdgeCount'], 
-                                                    c = myRed, linewidth=0.3)) # , linestyle='None',
-                                                    # marker='o', markerfacecolor=myRed, mec='None',
-                                                    # markersize=0.3) )
-         # --contigPathEdgeDensity track
-         if options.contigPathEdgeDensity:
-            axDict[ c + n ].add_line( lines.Line2D( xdata = data.mafWigDict[ c ][ n ]['xAxis'], 
-                                                    ydata = data.mafWigDict[ c ][ n ]['mafCpEdgeCount'], 
-                                                    c = myBlue, linewidth=0.3)) #linestyle='None', linewidth=0.0, 
-                                                    # marker='.', markerfacecolor='b', markersize=1.0) )
-         # --contigPathErrorDensity track
-         if options.contigPathErrorDensity:
-            axDict[ c + n ].add_line( lines.Line2D( xdata = data.mafWigDict[ c ][ n ]['xAxis'], 
-                                                    ydata = data.mafWigDict[ c ][ n ]['mafCpErrorCount'], 
-                                                    c = myRed, linewidth=0.3))# ,linestyle='None',
-                                                    # marker='o', markerfacecolor=myRed, mec='None', 
-                                                    # markersize=0.3) )
-
-         if (( not options.stackFillBlocks ) and ( not options.stackFillContigPaths ) and ( not options.fill )
-             and ( not options.stackFillContigs ) and ( not  options.stackFillScaffPaths )):
-            # No Fills, basic wiggle
-            axDict[ c + n ].add_line( lines.Line2D( xdata = data.mafWigDict[ c ][ n ]['xAxis'], 
-                                                    ydata = data.mafWigDict[ c ][ n ]['maf'], 
-                                                    c = alternatingColors[ col ], linewidth = 0.3 ))
-         j +=1
-         col = not col
+      elif options.stackFillContigPaths:
+         k = -1
+         for r in [ 'maf', 'mafCpl1e2', 'mafCpl1e3', 'mafCpl1e4', 
+                    'mafCpl1e5', 'mafCpl1e6', 'mafCpl1e7' ]:
+            k += 1
+            axDict[ c + n ].fill_between( x=data.mafWigDict[ c ][ n ]['xAxis'], 
+                                          y1=data.mafWigDict[ c ][ n ][ r ],
+                                          y2=data.mafYPos[ j ],
+                                          facecolor = data.stackFillColors[ k ],
+                                          linewidth = 0.0 )
+      elif options.stackFillContigs:
+         k = -1
+         for r in [ 'maf', 'mafCtg1e2', 'mafCtg1e3', 'mafCtg1e4', 
+                    'mafCtg1e5', 'mafCtg1e6', 'mafCtg1e7' ]:
+            k += 1
+            axDict[ c + n ].fill_between( x=data.mafWigDict[ c ][ n ]['xAxis'], 
+                                          y1=data.mafWigDict[ c ][ n ][ r ],
+                                          y2=data.mafYPos[ j ],
+                                          facecolor = data.stackFillColors[ k ],
+                                          linewidth = 0.0 )
+      elif options.stackFillScaffPaths:
+         k = -1
+         for r in [ 'maf', 'mafSpl1e2', 'mafSpl1e3', 'mafSpl1e4', 
+                    'mafSpl1e5', 'mafSpl1e6', 'mafSpl1e7' ]:
+            k += 1
+            axDict[ c + n ].fill_between( x=data.mafWigDict[ c ][ n ]['xAxis'], 
+                                          y1=data.mafWigDict[ c ][ n ][ r ],
+                                          y2=data.mafYPos[ j ],
+                                          facecolor = data.stackFillColors[ k ],
+                                          linewidth = 0.0 )
+      myRed  = '#FA9AAB'
+      myBlue = '#C5C3E2'
+      # --blockEdgeDensity track
+      if options.blockEdgeDensity:
+         axDict[ c + n ].add_line( lines.Line2D( xdata = data.mafWigDict[ c ][ n ]['xAxis'], 
+                                                 ydata = data.mafWigDict[ c ][ n ]['blockEdgeCount'], 
+                                                 c = myRed, linewidth=0.3)) # , linestyle='None',
+                                                 # marker='o', markerfacecolor=myRed, mec='None',
+                                                 # markersize=0.3) )
+      # --contigPathEdgeDensity track
+      if options.contigPathEdgeDensity:
+         axDict[ c + n ].add_line( lines.Line2D( xdata = data.mafWigDict[ c ][ n ]['xAxis'], 
+                                                 ydata = data.mafWigDict[ c ][ n ]['mafCpEdgeCount'], 
+                                                 c = myBlue, linewidth=0.3)) #linestyle='None', linewidth=0.0, 
+                                                 # marker='.', markerfacecolor='b', markersize=1.0) )
+      # --contigPathErrorDensity track
+      if options.contigPathErrorDensity:
+         axDict[ c + n ].add_line( lines.Line2D( xdata = data.mafWigDict[ c ][ n ]['xAxis'], 
+                                                 ydata = data.mafWigDict[ c ][ n ]['mafCpErrorCount'], 
+                                                 c = myRed, linewidth=0.3))# ,linestyle='None',
+                                                 # marker='o', markerfacecolor=myRed, mec='None', 
+                                                 # markersize=0.3) )
+
+      if (( not options.stackFillBlocks ) and ( not options.stackFillContigPaths ) and ( not options.fill )
+          and ( not options.stackFillContigs ) and ( not  options.stackFillScaffPaths )):
+         # No Fills, basic wiggle
+         axDict[ c + n ].add_line( lines.Line2D( xdata = data.mafWigDict[ c ][ n ]['xAxis'], 
+                                                 ydata = data.mafWigDict[ c ][ n ]['maf'], 
+                                                 c = alternatingColors[ col ], linewidth = 0.3 ))
+
+def rowTracks( options ):
+   """ returns the names of the tracks drawMafRow() reads.
+   """
+   keys = [ 'xAxis' ] + coverageTracks( options )
+   if options.blockEdgeDensity:
+      keys.append( 'blockEdgeCount' )
+   if options.contigPathEdgeDensity:
+      keys.append( 'mafCpEdgeCount' )
+   if options.contigPathErrorDensity:
+      keys.append( 'mafCpErrorCount' )
+   return keys
+
+def drawMafsInParallel( axDict, options, data ):
+   """ each assembly row is drawn and rasterized by renderMafRowJob() in a
+   pool of --jobs processes, and the resulting images are placed on the
+   figure where the row's axes are. The row axes are then hidden.
+   """
+   import multiprocessing
+   size = tuple( data.fig.get_size_inches() )
+   jobs = []
+   j = 0
+   for n in data.orderedMafs:
+      rowData = Data()
+      rowData.chrNames = data.chrNames
+      rowData.chrLengthsByChrom = data.chrLengthsByChrom
+      rowData.region = data.region
+      rowData.mafYPos = data.mafYPos
+      rowData.axCeilings = data.axCeilings
+      rowData.stackFillColors = data.stackFillColors
+      rowData.mafWigDict = {}
+      positions = {}
+      for c in data.chrNames:
+         positions[ c ] = axDict[ c + n ].get_position().bounds
+         rowData.mafWigDict[ c ] = { n : {} }
+         for k in rowTracks( options ):
+            rowData.mafWigDict[ c ][ n ][ k ] = numpy.array( data.mafWigDict[ c ][ n ][ k ] )
+      jobs.append( ( options, rowData, n, j, positions, size ))
+      j += 1
+   pool = multiprocessing.Pool( processes = options.jobs )
+   results = pool.map( renderMafRowJob, jobs )
+   pool.close()
+   pool.join()
+   for n, xo, yo, rgba in results:
+      for c in data.chrNames:
+         axDict[ c + n ].set_visible( False )
+      if rgba is not None:
+         data.fig.figimage( rgba, xo=xo, yo=yo, origin='upper' )
+
+def renderMafRowJob( job ):
+   """ renderMafRowJob draws one assembly row on a white figure of the
+   same size and dpi as the real one, and returns the pixel offsets and
+   the RGBA pixels of the area covered by the row's axes.
+   """
+   from matplotlib.backends.backend_agg import FigureCanvasAgg
+   from matplotlib.figure import Figure
+   import math
+   options, data, n, j, positions, size = job
+   fig = Figure( figsize=size, dpi=options.dpi, facecolor='w' )
+   canvas = FigureCanvasAgg( fig )
+   axDict = {}
+   for c in data.chrNames:
+      axDict[ c + n ] = fig.add_axes( positions[ c ] )
+      if not options.frames:
+         axDict[ c + n ].set_frame_on( False )
+   drawMafRow( axDict, n, j, options, data )
+   setMafRowLimits( axDict, n, options, data )
+   canvas.draw()
+   w, h = canvas.get_width_height()
+   rgba = numpy.frombuffer( canvas.buffer_rgba(), dtype=numpy.uint8 ).reshape( h, w, 4 )
+   x0, y0, x1, y1 = w, h, 0, 0
+   for c in data.chrNames:
+      e = axDict[ c + n ].bbox.extents
+      x0 = min( x0, max( 0, int( math.floor( e[0] ))))
+      y0 = min( y0, max( 0, int( math.floor( e[1] ))))
+      x1 = max( x1, min( w, int( math.ceil( e[2] ))))
+      y1 = max( y1, min( h, int( math.ceil( e[3] ))))
+   if x1 <= x0 or y1 <= y0:
+      return ( n, 0, 0, None )
+   # buffer rows run from the top of the figure, display y from the bottom
+   return ( n, x0, y0, rgba[ h - y1:h - y0, x0:x1 ].copy() )
 
 def prettyPrintLength( n ):
     """ takes an integer with a number of bases,
@@ -703,9 +928,11 @@ def normalizeEdgeErrorDensities( options, data ):
          else:
             data.axCeilings[ n ] = max( globalErrorMax, globalEdgeMax )
             
+   if not ( options.contigPathErrorDensity or options.contigPathEdgeDensity ):
+      return
    for c in data.chrNames:
       for n in data.orderedMafs:
-         if options.zerosToNan:
+         if options.zerosToNan and options.contigPathErrorDensity:
             whereZeros = data.mafWigDict[ c ][ n ]['mafCpErrorCount'] == 0
             data.mafWigDict[ c ][ n ]['mafCpErrorCount'][ whereZeros ] = float( 'nan' )
          if options.edgeErrorCeiling:
@@ -736,6 +963,8 @@ def normalizeBlockEdgeDensities( options, data ):
          else:
             data.axCeilings[ n ] = ultimateMax
    # record clipping
+   if not options.blockEdgeDensity:
+      return
    for c in data.chrNames:
       for n in data.orderedMafs:
          if options.zerosToNan:
@@ -792,26 +1021,24 @@ def normalizeAnnotations( options, data ):
 
 def normalizeCoverages( options, data ):
    """ the numpy arrays come in the range [0,1], we remap them here to [0, 0.98]
+   only the tracks that will be drawn are touched, so the rest are never read.
    """
    for c in data.chrNames:
       for n in data.orderedMafs:
-         for r in [ 'maf', 'maf1e2', 'maf1e3', 'maf1e4', 
-                    'maf1e5', 'maf1e6', 'maf1e7',
-                    'mafCpl1e2', 'mafCpl1e3', 'mafCpl1e4', 
-                    'mafCpl1e5', 'mafCpl1e6', 'mafCpl1e7',
-                    'mafCtg1e2', 'mafCtg1e3', 'mafCtg1e4', 
-                    'mafCtg1e5', 'mafCtg1e6', 'mafCtg1e7',
-                    'mafSpl1e2', 'mafSpl1e3', 'mafSpl1e4', 
-                    'mafSpl1e5', 'mafSpl1e6', 'mafSpl1e7' ] :
+         for r in coverageTracks( options ):
             data.mafWigDict[ c ][ n ][ r ] *= data.axCeilings[ n ] * 0.98
 
 def transformErrorDensities( options, data ):
    for c in data.chrNames:
       for n in data.orderedMafs:
-         data.mafWigDict[ c ][ n ]['mafCpErrorCount'] = data.mafWigDict[ c ][ n ]['mafCpErrorCount'] ** 0.25
-         data.mafWigDict[ c ][ n ]['mafCpEdgeCount']  = data.mafWigDict[ c ][ n ]['mafCpEdgeCount']  ** 0.25
+         if options.contigPathErrorDensity:
+            data.mafWigDict[ c ][ n ]['mafCpErrorCount'] = data.mafWigDict[ c ][ n ]['mafCpErrorCount'] ** 0.25
+         if options.contigPathEdgeDensity:
+            data.mafWigDict[ c ][ n ]['mafCpEdgeCount']  = data.mafWigDict[ c ][ n ]['mafCpEdgeCount']  ** 0.25
 
 def transformBlockEdgeDensities( options, data ):
+   if not options.contigPathEdgeDensity:
+      return
    for c in data.chrNames:
       for n in data.orderedMafs:
          data.mafWigDict[ c ][ n ]['mafCpEdgeCount'] = data.mafWigDict[ c ][ n ]['mafCpEdgeCount'] ** 0.25
@@ -828,19 +1055,28 @@ def transformData( options, data ):
       transformErrorDensities( options, data )
       transformBlockEdgeDensities( options, data )
 
-def main():
-   usage = ( 'usage: %prog [options]\n\n'
-             '%prog takes in a reference genome name ( --referenceGenome ),\n'
-             'optionally a directory where annotation wig pickles are stored ( --annotPickleDir [optional] ),\n'
-             'a directory where maf wig pickles are stored ( --mafPickleDir ), a paired set of chromosome names\n'
-             '( --chrNames comma separated ) and chromosome lengths ( --chrLengths comma separated ) and \n'
-             'then various other options specifed below to draw a figure.')
-   data = Data()
-   parser = OptionParser( usage=usage )
-   initOptions( parser )
-   las.initOptions( parser )
-   lpt.initOptions( parser )
-   options, args = parser.parse_args()
+def readBatchFile( options, parser ):
+   """ readBatchFile returns one list of arguments per figure spec
+   in the --batch file. Blank lines and lines starting with # are skipped.
+   """
+   if not os.path.exists( options.batch ):
+      parser.error( '--batch %s does not exist.\n' % options.batch )
+   specs = []
+   f = open( options.batch, 'r' )
+   for line in f:
+      line = line.strip()
+      if line.startswith('#'):
+         continue
+      if line == '':
+         continue
+      specs.append( shlex.split( line ))
+   f.close()
+   return specs
+
+def drawFigure( options, parser, data ):
+   """ drawFigure checks the options, loads the pickles (reusing any
+   already in data.pickleCache) and draws and writes one figure.
+   """
    checkOptions( options, parser, data )
    las.checkOptions( options, parser )
    lpt.checkOptions( options, parser )
@@ -860,6 +1096,33 @@ def main():
 
    setAxisLimits( axDict, options, data )
    lpt.writeImage( fig, pdf, options )
+   plt.close( fig )
+
+def main():
+   usage = ( 'usage: %prog [options]\n\n'
+             '%prog takes in a reference genome name ( --referenceGenome ),\n'
+             'optionally a directory where annotation wig pickles are stored ( --annotPickleDir [optional] ),\n'
+             'a directory where maf wig pickles are stored ( --mafPickleDir ), a paired set of chromosome names\n'
+             '( --chrNames comma separated ) and chromosome lengths ( --chrLengths comma separated ) and \n'
+             'then various other options specifed below to draw a figure.')
+   data = Data()
+   parser = OptionParser( usage=usage )
+   initOptions( parser )
+   las.initOptions( parser )
+   lpt.initOptions( parser )
+   options, args = parser.parse_args()
+   pickleCache = {}
+   if options.batch is None:
+      data.pickleCache = pickleCache
+      drawFigure( options, parser, data )
+      return
+   for spec in readBatchFile( options, parser ):
+      figOptions, args = parser.parse_args( spec, values=copy.deepcopy( options ))
+      if figOptions.batch != options.batch:
+         parser.error( '--batch may not appear inside the batch file %s.\n' % options.batch )
+      data = Data()
+      data.pickleCache = pickleCache
+      drawFigure( figOptions, parser, data )
 
 if __name__ == '__main__':
    main()
@@ -50,31 +50,63 @@ ACGTACGTACGTACGTACGTACGT
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 ##############################
+import cStringIO
+import libFasta as lfa
 from optparse import OptionParser
 import sys
 
+def initOptions( parser ):
+   parser.add_option( '--jobs', dest='jobs',
+                      type='int', default=1,
+                      help=( 'Number of processes used to filter the sequences. The input '
+                             'is split into shards of whole records which are worked on in '
+                             'parallel. default=%default' ))
+
+def checkOptions( options, parser ):
+   if options.jobs < 1:
+      parser.error( '--jobs must be at least 1.\n' )
+
+def keepNonEmpty( events ):
+   """ yields the ( header, chunk ) pairs of events, see libFasta, 
+   dropping every header that is not followed straight away by 
+   sequence. A blank line, a chunk of '', drops the header before it.
+   """
+   header = None
+   current = None
+   for h, chunk in events:
+      if chunk is None:
+         header = h
+         continue
+      if chunk == '':
+         header = None
+         continue
+      if header is not None:
+         current = header
+         yield ( current, None )
+         header = None
+      yield ( current, chunk )
+
+def removeShardJob( shard ):
+   """ --jobs worker, returns the output for one shard of the input.
+   """
+   out = cStringIO.StringIO()
+   lfa.writeLines( keepNonEmpty( lfa.lineEvents( lfa.readLines( cStringIO.StringIO( shard )))), 
+                   out )
+   return out.getvalue()
+
 def main():
    usage = ( 'usage: %prog < fasta.fa\n\n'
              '%prog takes in via STDIN a fasta formated file writes to\n'
              'STDOUT all of the non-empty sequences.' )
    parser = OptionParser( usage=usage )
+   initOptions( parser )
    options, args = parser.parse_args()
+   checkOptions( options, parser )
    
-   header = ''
-   for line in sys.stdin:
-      line = line.strip()
-      if line != '':
-         if line.startswith('>'):
-            header = line
-            continue
-         if header != '':
-            print header
-            print line
-            header = ''
-         else:
-            print line
-      else:
-         header = ''
+   if options.jobs > 1:
+      lfa.writeShards( removeShardJob, lfa.readShards( lfa.openFasta() ), options.jobs )
+      return
+   lfa.writeLines( keepNonEmpty( lfa.lineEvents( lfa.readLines( lfa.openFasta() ))))
 
 if __name__ == '__main__':
     main()
@@ -29,7 +29,9 @@ of repeats of that character in the STDIN file (fasta).
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 ##############################
+import libFasta as lfa
 from optparse import OptionParser
+import re
 import splitSequenceAtNs as ssan
 import signal # deal with broken pipes
 import sys
@@ -50,20 +52,26 @@ def checkOptions( options, parser ):
    options.lChar = options.char.lower()
 
 def processStream( options ):
+   # runs of --char carry on across line breaks and headers
+   run = re.compile( '[%s]+' % re.escape( options.uChar + options.lChar ))
    count = 0
-   for line in sys.stdin:
-      line = line.strip()
-      if line == '':
+   for header, chunk in lfa.readRecords( lfa.openFasta() ):
+      if chunk is None:
          continue
-      if line.startswith('>'):
-         continue
-      for c in line:
-         if c == options.uChar or c == options.lChar:
-            count += 1
-         else:
+      counts = []
+      j = 0
+      for m in run.finditer( chunk ):
+         if m.start() > j:
             if count > 0:
-               print count
+               counts.append( '%d\n' % count )
             count = 0
+         count += m.end() - m.start()
+         j = m.end()
+      if j < len( chunk ):
+         if count > 0:
+            counts.append( '%d\n' % count )
+         count = 0
+      sys.stdout.write( ''.join( counts ))
    if count > 0:
       print count
 
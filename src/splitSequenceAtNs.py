@@ -29,7 +29,10 @@ if a split did not occur.
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 ##############################
+import cStringIO
+import libFasta as lfa
 from optparse import OptionParser
+import re
 import signal # deal with broken pipes
 import standardizeNumNs as snn
 import sys
@@ -46,50 +49,107 @@ def initOptions( parser ):
    parser.add_option( '--label', dest='label',
                        type='string', default='contig',
                        help='Will result in headers like: >prexif.LABEL001 . default=%default')
+   parser.add_option( '--jobs', dest='jobs',
+                      type='int', default=1,
+                      help=( 'Number of processes used to split the sequences. The input '
+                             'is split into shards of whole records which are worked on in '
+                             'parallel. default=%default' ))
 
 def checkOptions( options, parser ):
    if options.n is None:
       parser.error( 'specify --splitAt.\n' )
    if options.n < 1:
       parser.error( '--splitAt must be greater than 0.\n' )
+   if options.jobs < 1:
+      parser.error( '--jobs must be at least 1.\n' )
 
-def processStream( options ):
-   register = 0
-   header=''
-   for line in sys.stdin:
-      line = line.strip()
-      if line == '':
+def splitRecords( events, options, last=True ):
+   """ yields the ( header, chunk ) pairs of events, see libFasta, with
+   every record split at runs of --splitAt or more Ns. The sequence of
+   each record is collected into one buffer and handed to splitRecord()
+   when the next header, or the end of the input, is reached. last is
+   False if the final record of events is not the last of the input.
+   """
+   splitAt = re.compile( '[nN]{%d,}' % options.n )
+   header = None
+   seq = []
+   for h, chunk in events:
+      if chunk is None:
+         if header is not None:
+            for e in splitRecord( header, ''.join( seq ), False, splitAt, options ):
+               yield e
+         header = h
+         seq = []
          continue
-      if line.startswith('>'):
-         if header != '' and register != 0:
-            sys.stdout.write('\n')
-         header = line
-         splitCount = 1
-         sys.stdout.write('%s.%s%03d\n' % ( header, options.label, splitCount ))
-         register = 0
-         nCount = 0
+      if chunk == '':
          continue
-      for c in line:
-         if c == 'N' or c == 'n':
-            nCount += 1
-            # we buffer the Ns in case we need to split the sequence
-         else:
-            if nCount < options.n:
-               for j in xrange( 0, nCount ):
-                  register = snn.myPrint( 'N', register, options )
-            else:
-               splitCount += 1
-               if register !=0:
-                  sys.stdout.write('\n')
-               print '%s.%s%03d' % ( header, options.label, splitCount )
-               register = 0
-            nCount = 0
-            register = snn.myPrint( c, register, options )
-   if 0 < nCount < options.n:
-      for j in xrange( 0, nCount ):
-         register = snn.myPrint( 'N', register, options )
-   if register != 0:
-      sys.stdout.write( '\n' )
+      if header is None:
+         sys.stderr.write( 'Error, sequence found before the first header.\n' )
+         sys.exit( 1 )
+      seq.append( chunk )
+   if header is not None:
+      for e in splitRecord( header, ''.join( seq ), last, splitAt, options ):
+         yield e
+
+def splitRecord( header, seq, last, splitAt, options ):
+   """ yields the pieces of the record with the given header and 
+   sequence, split at every run of --splitAt or more Ns, which are found
+   with one pass of the regular expression splitAt. A run only splits 
+   the sequence if something follows it, so runs at the end of a record
+   are dropped, as are shorter runs at the end of any record but the 
+   last one. Ns that are kept are written in upper case.
+   """
+   splitCount = 1
+   name = '%s.%s%03d' % ( header, options.label, splitCount )
+   yield ( name, None )
+   j = 0
+   for m in splitAt.finditer( seq ):
+      if m.end() == len( seq ):
+         break
+      piece = seq[ j:m.start() ].replace( 'n', 'N' )
+      if piece != '':
+         yield ( name, piece )
+      splitCount += 1
+      name = '%s.%s%03d' % ( header, options.label, splitCount )
+      yield ( name, None )
+      j = m.end()
+   tail = seq[ j: ]
+   trimmed = tail.rstrip( 'nN' )
+   if not last or len( tail ) - len( trimmed ) >= options.n:
+      tail = trimmed
+   if tail != '':
+      yield ( name, tail.replace( 'n', 'N' ))
+
+def shardJobs( options ):
+   """ yields a ( shard, last, options ) job for every shard of stdin,
+   where last is True for the final shard.
+   """
+   shard = None
+   for s in lfa.readShards( lfa.openFasta() ):
+      if shard is not None:
+         yield ( shard, False, options )
+      shard = s
+   if shard is not None:
+      yield ( shard, True, options )
+
+def splitShardJob( job ):
+   """ --jobs worker, returns the output for one job from shardJobs(),
+   or None if the shard could not be split.
+   """
+   shard, last, options = job
+   out = cStringIO.StringIO()
+   try:
+      snn.writeWrapped( splitRecords( lfa.readRecords( cStringIO.StringIO( shard )), 
+                                      options, last ), options, out )
+   except SystemExit:
+      return None
+   return out.getvalue()
+
+def processStream( options ):
+   if options.jobs > 1:
+      lfa.writeShards( splitShardJob, shardJobs( options ), options.jobs )
+      return
+   snn.writeWrapped( splitRecords( lfa.readRecords( lfa.openFasta() ), options ), options )
 
 def main():
    usage = ( 'usage: %prog --splitAt [options] < fasta.fa\n\n'
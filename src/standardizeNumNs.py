@@ -49,7 +49,10 @@ ACGTACGTNNNNNNNNNNNNNNNNNNNNNNNNNACGTACGT
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 ##############################
+import libFasta as lfa
 from optparse import OptionParser
+import cStringIO
+import re
 import signal # deal with broken pipes
 import sys
 
@@ -62,6 +65,11 @@ def initOptions( parser ):
    parser.add_option( '-l', '--lineLength', dest='lineLength',
                       type='int', default=50,
                       help='Changes the length of the output lines. default=%default' )
+   parser.add_option( '--jobs', dest='jobs',
+                      type='int', default=1,
+                      help=( 'Number of processes used to standardize the sequences. The input '
+                             'is split into shards of whole records which are worked on in '
+                             'parallel. default=%default' ))
 
 def checkOptions( options, parser ):
    if options.n is None:
@@ -70,6 +78,8 @@ def checkOptions( options, parser ):
       parser.error( '--expandAt must be greater than 0.\n' )
    if options.n > 25:
       parser.error( '--expandAt must be less than 26.\n' )
+   if options.jobs < 1:
+      parser.error( '--jobs must be at least 1.\n' )
 
 def myPrint( c, register, options ):
    """ my print takes a charater, c and a 
@@ -85,39 +95,160 @@ def myPrint( c, register, options ):
       register += 1
    return register
 
-def processStream( options ):
-   count = 0
-   i = 0
-   lineNumber = -1
-   expanded = False
-   for line in sys.stdin:
-      lineNumber += 1
-      line = line.strip()
-      if line == '':
+class LineWriter:
+   """ LineWriter writes sequence text to a stream wrapped at
+   options.lineLength characters, giving the same output as one call 
+   to myPrint() per character. Output is collected and written to the
+   stream in blocks of about bufferSize characters.
+   """
+   def __init__( self, options, stream=None, bufferSize=1 << 20 ):
+      if stream is None:
+         stream = sys.stdout
+      self.lineLength = options.lineLength
+      self.stream = stream
+      self.bufferSize = bufferSize
+      self.buffer = []
+      self.buffered = 0
+      self.register = 0
+   def add( self, s ):
+      self.buffer.append( s )
+      self.buffered += len( s )
+      if self.buffered >= self.bufferSize:
+         self.flush()
+   def write( self, s ):
+      """ write the sequence characters in s, ending the line after
+      every lineLength of them.
+      """
+      first = self.lineLength - self.register
+      if len( s ) < first:
+         if s:
+            self.add( s )
+            self.register += len( s )
+         return
+      end = len( s ) - ( len( s ) - first ) % self.lineLength
+      lines = [ s[ :first ]]
+      lines.extend([ s[ j:j + self.lineLength ] for j in xrange( first, end, self.lineLength ) ])
+      lines.append( s[ end: ] )
+      self.add( '\n'.join( lines ))
+      self.register = len( s ) - end
+   def writeLine( self, s ):
+      """ end the current line, if it has anything on it, and write s
+      on a line of its own, unwrapped.
+      """
+      self.endLine()
+      self.add( '%s\n' % s )
+   def endLine( self ):
+      if self.register != 0:
+         self.add( '\n' )
+         self.register = 0
+   def flush( self ):
+      self.stream.write( ''.join( self.buffer ))
+      self.buffer = []
+      self.buffered = 0
+
+def expandRun( count, length, options ):
+   """ takes the length of the run of Ns seen so far, count, and the 
+   length of the next piece of the run. Returns the new count and the
+   number of Ns to write for the piece: Ns up to the --expandAt-th are
+   written as they are, the --expandAt-th is expanded so the run has
+   25 and Ns after it are dropped.
+   """
+   kept = max( 0, min( count + length, options.n - 1 ) - count )
+   if count < options.n <= count + length:
+      kept += 26 - options.n
+   return ( count + length, kept )
+
+def standardizeRecords( events, options, count=0 ):
+   """ yields the ( header, chunk ) pairs of events, see libFasta, with
+   the runs of Ns in the sequence standardized. Runs are found with a 
+   regular expression one chunk at a time. A run carries on across 
+   chunks, and across headers, just as it did when the sequence was read
+   one character at a time. count is the length of the run of Ns that 
+   came before events.
+   """
+   nRun = re.compile( '[nN]+' )
+   for header, chunk in events:
+      if chunk is None:
+         yield ( header, None )
          continue
-      if line.startswith('>'):
-         if i == 0:
-            print '%s' % line
+      pieces = []
+      j = 0
+      for m in nRun.finditer( chunk ):
+         if m.start() > j:
+            pieces.append( chunk[ j:m.start() ] )
+            count = 0
+         count, kept = expandRun( count, m.end() - m.start(), options )
+         pieces.append( 'N' * kept )
+         j = m.end()
+      if j < len( chunk ):
+         pieces.append( chunk[ j: ] )
+         count = 0
+      chunk = ''.join( pieces )
+      if chunk != '':
+         yield ( header, chunk )
+
+def writeWrapped( events, options, stream=None ):
+   """ writes ( header, chunk ) pairs to stream, stdout by default, each
+   header on a line of its own and the sequence wrapped at 
+   options.lineLength.
+   """
+   out = LineWriter( options, stream )
+   try:
+      for header, chunk in events:
+         if chunk is None:
+            out.writeLine( header )
          else:
-            print '\n%s' % line
-         i = 0
+            out.write( chunk )
+      out.endLine()
+   finally:
+      out.flush()
+
+def trailingNs( shard ):
+   """ returns the length of the run of Ns at the end of the sequence 
+   in the fasta text shard, and whether the run is all of its sequence,
+   in which case the run carries on from the one before shard.
+   """
+   count = 0
+   end = len( shard )
+   while end > 0:
+      start = shard.rfind( '\n', 0, end ) + 1
+      line = shard[ start:end ].strip()
+      end = start - 1
+      if line.startswith( '>' ):
          continue
-      for c in line:
-         if c == 'n' or c == 'N':
-            count += 1
-            if count == options.n:
-               expanded = True
-               for j in xrange( count, 26 ):
-                  # expand to 25 Ns.
-                  i = myPrint( 'N', i, options )
-            elif not expanded:
-               i = myPrint( 'N', i, options )
-         else:
-            count = 0
-            expanded = False
-            i = myPrint( c, i, options )
-   if i != 0:
-      sys.stdout.write('\n')
+      run = len( line ) - len( line.rstrip( 'nN' ))
+      count += run
+      if run < len( line ):
+         return ( count, False )
+   return ( count, True )
+
+def shardJobs( options ):
+   """ yields a ( shard, count, options ) job for every shard of stdin,
+   where count is the length of the run of Ns before the shard.
+   """
+   count = 0
+   for shard in lfa.readShards( lfa.openFasta() ):
+      yield ( shard, count, options )
+      run, whole = trailingNs( shard )
+      if whole:
+         count += run
+      else:
+         count = run
+
+def standardizeShardJob( job ):
+   """ --jobs worker, returns the output for one job from shardJobs().
+   """
+   shard, count, options = job
+   out = cStringIO.StringIO()
+   writeWrapped( standardizeRecords( lfa.readRecords( cStringIO.StringIO( shard )), 
+                                     options, count ), options, out )
+   return out.getvalue()
+
+def processStream( options ):
+   if options.jobs > 1:
+      lfa.writeShards( standardizeShardJob, shardJobs( options ), options.jobs )
+      return
+   writeWrapped( standardizeRecords( lfa.readRecords( lfa.openFasta() ), options ), options )
 
 def main():
    usage = ( 'usage: %prog --expandAt=N [options] < fasta.fa\n\n'
@@ -0,0 +1,82 @@
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+import unittest
+import os
+import sys
+myBinDir = os.path.abspath( os.path.dirname( sys.argv[0] ))
+
+class MatchesChainedTools( unittest.TestCase ):
+   fastas = ( '''>sequence1
+ACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTAC
+ACGTACGTACGTACNNNGTACGTACGTACGTACGTACGTACGTACGTACG
+>emptySequence
+
+>sequenceB
+ACGTACGTACGTACGTACGTACGTnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnnn
+NNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNACGTACGTACGT
+>anotherEmptySequence
+>sequence3
+NNNNNNNNNNACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGT
+ACGTACGTNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNN
+''', 
+               '''>sequence4
+ACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTAC
+GTACGTNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNN
+''' )
+   stages = ( [ ( 'removeEmptyContigs', None ) ],
+              [ ( 'standardizeNumNs', '--expandAt=10 --lineLength=60' ) ],
+              [ ( 'removeEmptyContigs', None ),
+                ( 'standardizeNumNs', '--expandAt=10' ),
+                ( 'splitSequenceAtNs', '--splitAt=25 --label=split' ) ],
+              [ ( 'splitSequenceAtNs', '--splitAt=5 --lineLength=40' ),
+                ( 'removeEmptyContigs', None ),
+                ( 'standardizeNumNs', '--expandAt=3 --lineLength=30' ) ] )
+
+   def runCommand( self, cmd, IN ):
+      import subprocess
+      p = subprocess.Popen( cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT )
+      return p.communicate( IN )[0]
+   def test_chainedTools( self ):
+      """fastaPipeline should give the same output as the tools piped together
+      """
+      import os
+      for IN in self.fastas:
+         for stages in self.stages:
+            cmd = [ os.path.join( myBinDir, 'fastaPipeline.py' ) ]
+            expectedOut = IN
+            for name, opts in stages:
+               cmd.append( '--%s' % name )
+               stageCmd = [ os.path.join( myBinDir, '%s.py' % name ) ]
+               if opts is not None:
+                  cmd.append( opts )
+                  stageCmd.extend( opts.split() )
+               expectedOut = self.runCommand( stageCmd, expectedOut )
+            self.assertEqual( self.runCommand( cmd, IN ), expectedOut )
+
+if __name__ == '__main__':
+   unittest.main()
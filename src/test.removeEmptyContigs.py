@@ -0,0 +1,96 @@
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+import unittest
+import os
+import sys
+myBinDir = os.path.abspath( os.path.dirname( sys.argv[0] ))
+
+class VerifyKnownInputOutput( unittest.TestCase ):   
+   knownValues = (('''>sequence1
+ACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTAC
+>emptySequence
+>sequence2
+ACGTACGTACGTACNNNGTACGTACGTACGTACGTACGTACGTACGTACG
+''', '''>sequence1
+ACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTACGTAC
+>sequence2
+ACGTACGTACGTACNNNGTACGTACGTACGTACGTACGTACGTACGTACG
+'''),('''>blankLine
+
+>sequence3
+ACGTACGTACGT
+>emptyAtEnd
+''','''>sequence3
+ACGTACGTACGT
+'''))
+   
+   def test_knownValues( self ):
+      """removeEmptyContigs should drop headers that have no sequence
+      """
+      import os
+      import subprocess
+      cmd = [ os.path.join( myBinDir, 'removeEmptyContigs.py' ) ]
+      for IN, expectedOut in self.knownValues:
+         p = subprocess.Popen( cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT )
+         ( streamOut ) = p.communicate( IN )[0]
+         self.assertEqual( streamOut, expectedOut )
+   def test_longLine( self ):
+      """ A sequence line longer than a read block should come out whole.
+      """
+      import os
+      import subprocess
+      # libFasta reads 4MB blocks, this line is 10MB
+      seq = 'ACGT' * ( 10 << 18 )
+      IN = '>empty\n>long\n%s\n>empty\n\n>short\nACGT\n' % seq
+      expectedOut = '>long\n%s\n>short\nACGT\n' % seq
+      cmd = [ os.path.join( myBinDir, 'removeEmptyContigs.py' ) ]
+      p = subprocess.Popen( cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT )
+      ( streamOut ) = p.communicate( IN )[0]
+      self.assertEqual( streamOut, expectedOut )
+   def test_jobsSetting( self ):
+      """ Output with --jobs should match the output without it.
+      """
+      import os
+      import subprocess
+      # long enough to be cut into several shards, with empty records,
+      # blank lines and records whose sequence is broken by a blank line
+      # falling at the ends of shards.
+      IN = ''.join([ '>seq%d\n%s' % ( i, ( '', '\n', 'ACGT\n', 'ACGT\n\nACGT\n' )[ i % 4 ] )
+                     for i in xrange( 300000 ) ])
+      outs = []
+      for jobs in ( 1, 3 ):
+         cmd = [ os.path.join( myBinDir, 'removeEmptyContigs.py' ), 
+                 '--jobs=%d' % jobs ]
+         p = subprocess.Popen( cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT )
+         outs.append( p.communicate( IN )[0] )
+      self.assertEqual( outs[0], outs[1] )
+
+if __name__ == '__main__':
+   unittest.main()
@@ -131,6 +131,26 @@ GTACGTNNNNNNNNNNNNNNNNNNNNNNNN
             if s.startswith('>'):
                continue
             self.assertTrue( len( s ) <= i )
+   def test_jobsSetting( self ):
+      """ Output with --jobs should match the output without it.
+      """
+      import os
+      import subprocess
+      # long enough to be cut into several shards. Every record ends in
+      # a run of Ns shorter than --splitAt, which is only trimmed from
+      # the last record of the input.
+      IN = ''.join([ '>seq%d\nACGTACGT%s\n' % ( i, 'N' * ( i % 25 ))
+                     for i in xrange( 300000 ) ])
+      outs = []
+      for jobs in ( 1, 3 ):
+         cmd = [ os.path.join( myBinDir, 'splitSequenceAtNs.py' ), 
+                 '--splitAt=%d' % 25, '--lineLength=%d' % 50,
+                 '--label=%s' % 'split',
+                 '--jobs=%d' % jobs ]
+         p = subprocess.Popen( cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT )
+         outs.append( p.communicate( IN )[0] )
+      self.assertEqual( outs[0], outs[1] )
 
 if __name__ == '__main__':
    unittest.main()
@@ -85,6 +85,24 @@ GTACGTACGTACGTNNNNNNNNNNNNNNNNNNNNNNNNN
                                stderr=subprocess.STDOUT )
          ( streamOut ) = p.communicate( IN )[0]
          self.assertEqual( streamOut, expectedOut )
+   def test_longLine( self ):
+      """ A sequence line longer than a read block should be read whole.
+      """
+      import os
+      import subprocess
+      # libFasta reads 4MB blocks, this line is 10MB
+      half = 'ACGT' * ( 5 << 18 )
+      IN = '>long\n%sNNNN%s\n>short\nACGT\n' % ( half, half )
+      seq = half + 'N' * 25 + half
+      expectedOut = ( '>long\n' + 
+                      ''.join([ seq[ i:i + 50 ] + '\n' for i in xrange( 0, len( seq ), 50 ) ]) +
+                      '>short\nACGT\n' )
+      cmd = [ os.path.join( myBinDir, 'standardizeNumNs.py' ), 
+              '--expandAt=%d' % 3, '--lineLength=%d' % 50 ]
+      p = subprocess.Popen( cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT )
+      ( streamOut ) = p.communicate( IN )[0]
+      self.assertEqual( streamOut, expectedOut )
    def test_lineLengthSetting( self ):
       """ Length of output lines should be <= --lineLength.
       """
@@ -101,6 +119,25 @@ GTACGTACGTACGTNNNNNNNNNNNNNNNNNNNNNNNNN
             if s.startswith('>'):
                continue
             self.assertTrue( len( s ) <= i )
+   def test_jobsSetting( self ):
+      """ Output with --jobs should match the output without it.
+      """
+      import os
+      import subprocess
+      # long enough to be cut into several shards. Runs of Ns carry on
+      # across the ends of records, and every other record is all Ns,
+      # so the run before a shard can reach back past several records.
+      IN = ''.join([ '>seq%d\n%s%s\n' % ( i, 'ACGT' * ( i % 2 ), 'N' * ( i % 30 ))
+                     for i in xrange( 300000 ) ])
+      outs = []
+      for jobs in ( 1, 3 ):
+         cmd = [ os.path.join( myBinDir, 'standardizeNumNs.py' ), 
+                 '--expandAt=%d' % 3, '--lineLength=%d' % 50,
+                 '--jobs=%d' % jobs ]
+         p = subprocess.Popen( cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT )
+         outs.append( p.communicate( IN )[0] )
+      self.assertEqual( outs[0], outs[1] )
 
 if __name__ == '__main__':
    unittest.main()
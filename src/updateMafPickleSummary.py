@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+updateMafPickleSummary.py
+
+Brings the summary index, mafPickleSummary.json, of a directory of
+maf wiggle pickles up to date for the pickles given on the command
+line. Only pickles that are new, or whose size or modification time
+has changed, are opened. Entries for pickles that are no longer in the
+directory are dropped. Run it after a pickle is moved into place; 
+plotPicklesToPlot.py reads the index but never writes it.
+
+"""
+##############################
+# Copyright (C) 2009-2011 by 
+# Dent Earl (dearl@soe.ucsc.edu, dent.earl@gmail.com)
+# Benedict Paten (benedict@soe.ucsc.edu, benedict.paten@gmail.com)
+# Mark Diekhans (markd@soe.ucsc.edu)
+# ... and other members of the Reconstruction Team of David Haussler's 
+# lab (BME Dept. UCSC).
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+##############################
+from libMafGffPlot import MafWigStore
+from libMafGffPlot import updateMafSummaryIndex
+from optparse import OptionParser
+import os
+
+def checkOptions( args, options, parser ):
+   if len( args ) < 1:
+      parser.error( 'please specify at least one pickle as a positional argument.\n' )
+   dirs = set()
+   for f in args:
+      if not os.path.exists( f ):
+         parser.error( 'file "%s" does not exist.\n' % f )
+      if not f.endswith( '.maf.pickle' ):
+         parser.error( 'file "%s" does not end in ".maf.pickle".\n' % f )
+      dirs.add( os.path.dirname( os.path.abspath( f )))
+   if len( dirs ) != 1:
+      parser.error( 'all of the pickles must be in the same directory.\n' )
+   options.mafDir = dirs.pop()
+
+def main():
+   usage = ( 'usage: %prog file1.maf.pickle file2.maf.pickle ...\n\n'
+             '%prog updates the summary index of the directory holding the\n'
+             'maf wiggle pickles for each of the pickles given.' )
+   parser = OptionParser( usage=usage )
+   options, args = parser.parse_args()
+   checkOptions( args, options, parser )
+   
+   updateMafSummaryIndex( options.mafDir, [ MafWigStore( os.path.abspath( f )) for f in args ])
+
+if __name__ == '__main__':
+   main()